@@ -0,0 +1,268 @@
+""" Throughput and latency benchmarks with baseline comparison
+
+Every benchmark times a callable with timeit: the number of calls per timing is grown
+until one timing takes at least min_time seconds, then the best of repeat timings is kept.
+Results are written as JSON: ops/s, ns/op, bytes/s and an estimated cycles/byte (from the
+CPU clock in /proc/cpuinfo or --cpu-ghz) per benchmark, plus the Python and NumPy versions.
+
+With --baseline the results are compared against a stored JSON file and the run fails
+(exit status 1) if any benchmark lost more than --threshold of its ops/s.
+
+USAGE EXAMPLE:
+---------------
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --output current.json --baseline baseline.json --threshold 0.1
+    python -m benchmarks.suite --filter 'present\.bulk'
+    python -m benchmarks.suite --filter 'keysetup\.Present'
+"""
+import argparse
+import json
+import platform
+import random
+import re
+import sys
+import timeit
+
+from gmac.batch import gmac_batch
+from gmac.pyGMAC import GMAC
+from gmac.util.galue_fields import getGF2, i2P
+from present._compat import numpy
+from present.miniPresent import MiniPresent, generateRoundkeys16
+from present.pyPresent import Present, ENGINES, generateRoundkeys80, generateRoundkeys128
+
+__author__ = 'Iurii Sergiichuk'
+
+DEFAULT_THRESHOLD = 0.1
+BULK_BLOCKS = 1024
+
+
+class Benchmark(object):
+    def __init__(self, name, setup, ops=1, op_bytes=0):
+        """A timed callable, built only when the benchmark runs
+
+        setup:    callable without arguments returning the timed callable (also without
+                  arguments), so the fixtures of benchmarks left out by a filter are never built
+        ops:      operations done by one call (e.g. blocks encrypted)
+        op_bytes: bytes processed by one operation, 0 for operations without a byte size
+        """
+        self.name = name
+        self.setup = setup
+        self.ops = ops
+        self.op_bytes = op_bytes
+
+
+def timed(function):
+    """setup of a benchmark without fixtures"""
+    return lambda: function
+
+
+def benchmarks():
+    """Every benchmark of the suite, in report order"""
+    rng = random.Random(0)
+    key80 = ''.join(chr(rng.getrandbits(8)) for _ in xrange(10))
+    key128 = ''.join(chr(rng.getrandbits(8)) for _ in xrange(16))
+    block = ''.join(chr(rng.getrandbits(8)) for _ in xrange(8))
+    blocks = [''.join(chr(rng.getrandbits(8)) for _ in xrange(8)) for _ in xrange(BULK_BLOCKS)]
+    data = ''.join(blocks)
+
+    suite = [
+        Benchmark('keysetup.generateRoundkeys80', timed(lambda: generateRoundkeys80(0x0123456789abcdef0123, 32))),
+        Benchmark('keysetup.generateRoundkeys128',
+                  timed(lambda: generateRoundkeys128(0x0123456789abcdef0123456789abcdef, 32))),
+        Benchmark('keysetup.generateRoundkeys16', timed(lambda: generateRoundkeys16(0xBEEF, 4))),
+    ]
+    for engine in sorted(ENGINES):
+        # construction with the schedule and its prepared forms in the key schedule cache
+        suite.append(Benchmark('keysetup.Present.%s' % engine,
+                               timed(lambda engine=engine: Present(key80, engine=engine))))
+
+        # construction building the schedule and every prepared form
+        def uncached(engine=engine):
+            cipher = Present.from_roundkeys(generateRoundkeys80(0x0123456789abcdef0123, 32), engine)
+            cipher._prepare_decryption()
+        suite.append(Benchmark('keysetup.Present.%s.uncached' % engine, timed(uncached)))
+
+    for engine in sorted(ENGINES):
+        def encrypt(engine=engine):
+            cipher = Present(key80, engine=engine)
+            return lambda: cipher.encrypt(block)
+
+        def decrypt(engine=engine):
+            cipher = Present(key80, engine=engine)
+            return lambda: cipher.decrypt(block)
+
+        def bulk(engine=engine):
+            cipher = Present(key80, engine=engine)
+            return lambda: [cipher.encrypt(b) for b in blocks]
+        suite.append(Benchmark('present.encrypt.%s' % engine, encrypt, 1, 8))
+        suite.append(Benchmark('present.decrypt.%s' % engine, decrypt, 1, 8))
+        suite.append(Benchmark('present.bulk.%s' % engine, bulk, BULK_BLOCKS, 8))
+
+    def encrypt128():
+        cipher = Present(key128)
+        return lambda: cipher.encrypt(block)
+
+    def bitslice():
+        cipher = Present(key80)
+        return lambda: cipher.encrypt_blocks(blocks)
+    suite.append(Benchmark('present.encrypt.table.128', encrypt128, 1, 8))
+    suite.append(Benchmark('present.bulk.bitslice', bitslice, BULK_BLOCKS, 8))
+    if numpy is not None:
+        def bulk_numpy():
+            cipher = Present(key80)
+            return lambda: cipher.encrypt_array(data)
+        suite.append(Benchmark('present.bulk.numpy', bulk_numpy, BULK_BLOCKS, 8))
+
+    def mini_encrypt():
+        mini = MiniPresent(0xBEEF)
+        return lambda: mini.encrypt(42)
+
+    def mini_codebook():
+        mini = MiniPresent(0xBEEF, codebook=True)
+        return lambda: mini.encrypt(42)
+
+    def mini_bytes():
+        mini, mini_data = MiniPresent(0xBEEF, codebook=True), data[:BULK_BLOCKS]
+        return lambda: mini.encrypt_bytes(mini_data)
+    suite += [
+        Benchmark('minipresent.encrypt', mini_encrypt, 1, 1),
+        Benchmark('minipresent.encrypt.codebook', mini_codebook, 1, 1),
+        Benchmark('minipresent.encrypt_bytes', mini_bytes, BULK_BLOCKS, 1),
+    ]
+
+    def field16(operation, *args):
+        def setup():
+            function = getattr(getGF2(16, i2P(0b10001000000001011)), operation)
+            return lambda: function(*args)
+        return setup
+    a571, b571 = rng.getrandbits(571), rng.getrandbits(571)
+
+    def field571(operation, *args):
+        def setup():
+            function = getattr(getGF2(571, [571, 10, 5, 2, 0]), operation)
+            return lambda: function(*args)
+        return setup
+    suite += [
+        Benchmark('gf2.multGF2', field16('multGF2', 0xBEEF, 0x1234)),
+        Benchmark('gf2.multGF2.loop', field16('_multGF2Loop', 0xBEEF, 0x1234)),
+        Benchmark('gf2.invGF2', field16('invGF2', 0xBEEF)),
+        Benchmark('gf2.571.multGF2', field571('multGF2', a571, b571)),
+        Benchmark('gf2.571.multGF2.loop', field571('_multGF2Loop', a571, b571)),
+        Benchmark('gf2.571.invGF2', field571('invGF2', a571)),
+    ]
+
+    # generate only processes the top block of the message, message sizes are swept through GMACStream
+    def generate(message=rng.getrandbits(16) | 1 << 15):
+        gmac = GMAC(235)
+        return lambda: gmac.generate(message, 21313)
+    suite.append(Benchmark('gmac.generate', generate, 1, 2))
+    for size in (64, 1024, 16384):
+        message = data[:size]
+        suite.append(Benchmark('gmac.stream.%dB' % size,
+                               timed(lambda message=message: GMAC.new(235, 21313, message).digest()), 1, size))
+    keys = range(BULK_BLOCKS)
+    messages = [rng.getrandbits(16) | 1 for _ in keys]
+    IVs = [rng.getrandbits(16) for _ in keys]
+    suite.append(Benchmark('gmac.batch', timed(lambda: gmac_batch(keys, messages, IVs)), BULK_BLOCKS, 2))
+    return suite
+
+
+def cpu_hz():
+    """CPU clock from /proc/cpuinfo, None if unknown"""
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith('cpu MHz'):
+                    return float(line.split(':')[1]) * 1e6
+    except (IOError, ValueError, IndexError):
+        pass
+    return None
+
+
+def measure(benchmark, min_time=0.2, repeat=3):
+    """Time a benchmark
+
+    Output: dict with ops_per_s, ns_per_op, bytes_per_s (None without op_bytes)"""
+    timer = timeit.Timer(benchmark.setup())
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    best = min([elapsed] + timer.repeat(repeat - 1, number))
+    ops_per_s = number * benchmark.ops / best
+    return {
+        'ops_per_s': ops_per_s,
+        'ns_per_op': 1e9 / ops_per_s,
+        'bytes_per_s': ops_per_s * benchmark.op_bytes if benchmark.op_bytes else None,
+    }
+
+
+def run(pattern=None, min_time=0.2, repeat=3, hz=None, progress=sys.stderr):
+    """Run every benchmark whose name matches pattern
+
+    Output: report as a JSON-serializable dict"""
+    hz = hz or cpu_hz()
+    results = {}
+    for benchmark in benchmarks():
+        if pattern and not re.search(pattern, benchmark.name):
+            continue
+        result = measure(benchmark, min_time, repeat)
+        result['cycles_per_byte'] = hz / result['bytes_per_s'] if hz and result['bytes_per_s'] else None
+        results[benchmark.name] = result
+        if progress is not None:
+            progress.write("%-36s %14.1f ops/s %12.1f ns/op\n" %
+                           (benchmark.name, result['ops_per_s'], result['ns_per_op']))
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'numpy': numpy.__version__ if numpy is not None else None,
+        'machine': platform.machine(),
+        'cpu_hz': hz,
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """Benchmarks of report that lost more than threshold of their baseline ops/s
+
+    Output: sorted list of (name, baseline ops/s, current ops/s, ratio)"""
+    regressions = []
+    for name, result in sorted(report['results'].items()):
+        if name not in baseline['results']:
+            continue
+        expected = baseline['results'][name]['ops_per_s']
+        ratio = result['ops_per_s'] / expected
+        if ratio < 1 - threshold:
+            regressions.append((name, expected, result['ops_per_s'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PRESENT / GMAC benchmark suite")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--baseline', help="JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative ops/s loss against the baseline")
+    parser.add_argument('--filter', help="only run benchmarks matching this regular expression")
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds per timing")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--cpu-ghz', type=float, help="CPU clock for the cycles/byte estimate")
+    args = parser.parse_args(argv)
+    report = run(args.filter, args.min_time, args.repeat, args.cpu_ghz and args.cpu_ghz * 1e9)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.threshold)
+        for name, expected, current, ratio in regressions:
+            sys.stderr.write("REGRESSION %s: %.1f -> %.1f ops/s (%.0f%%)\n" % (name, expected, current, 100 * ratio))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
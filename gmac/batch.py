@@ -0,0 +1,73 @@
+""" Batched GMAC over parallel arrays of (key, message, IV)
+
+gmac_batch(keys, messages, IVs) gives the same tags and GHASH states as calling
+GMAC(key).generate(message, IV) and get_state() on a fresh GMAC for every triple. With NumPy
+all triples are processed together:
+    - the MiniPresent subkeys and GCTR(IV) come from the vectorized keyspace engine
+    - gHash of a block is the XOR of H^(j + 1) over its set bits j (see GMAC._get_ghash_tables),
+      with the powers of H read from the log/antilog tables of the field
+Without NumPy (or for messages of 63 bits and more) every triple goes through GMAC.
+
+USAGE EXAMPLE:
+---------------
+>>> tags, states = gmac_batch([235, 235], [17927, 1], [21313, 21313])
+>>> [int(tag) for tag in tags] == [GMAC(235).generate(17927, 21313), GMAC(235).generate(1, 21313)]
+True
+"""
+from gmac.pyGMAC import GMAC, GHASH_BLOCK_BITS
+from gmac.util.galue_fields import getGF2, i2P
+from present import keyspace
+from present._compat import numpy
+
+__author__ = 'Iurii Sergiichuk'
+
+DEFAULT_FIELD_POLYNOM = 0b10001000000001011
+
+
+def gmac_batch(keys, messages, IVs, field_degree=16, field_polynom=DEFAULT_FIELD_POLYNOM):
+    """Compute GMAC tags and GHASH states for parallel sequences of keys, messages and IVs
+
+    Input:  sequences of equal length: MiniPresent keys, messages and IVs as integers
+    Output: (tags, states), NumPy int64 arrays or lists without NumPy"""
+    if not len(keys) == len(messages) == len(IVs):
+        raise ValueError("keys, messages and IVs must have the same length")
+    field = getGF2(field_degree, i2P(field_polynom))
+    if numpy is None or field.logTable is None or field_degree > GHASH_BLOCK_BITS or not len(keys) or \
+            max(messages) >> 63 or max(IVs) >> 16 or min(messages) < 0 or min(IVs) < 0:
+        return _gmac_batch_scalar(keys, messages, IVs, field_degree, field_polynom)
+    keys = numpy.asarray(keys, dtype=numpy.int64)
+    messages = numpy.asarray(messages, dtype=numpy.int64)
+    IVs = numpy.asarray(IVs, dtype=numpy.int64)
+
+    roundkeys = keyspace.roundkeys16All(keys)
+    sub_keys = keyspace.encryptPairs(numpy.zeros(len(keys)), roundkeys).astype(numpy.int64)
+    gctr = numpy.where(IVs != 0, keyspace.encryptPairs(IVs & 0xFF, roundkeys), 0).astype(numpy.int64)
+    gctr |= numpy.where(IVs >> 8 != 0, keyspace.encryptPairs(IVs >> 8, roundkeys), 0).astype(numpy.int64) << 8
+
+    # generate() only keeps the result of the most significant non-zero 16-bit block
+    blocks = messages & 0xFFFF
+    for shift in (16, 32, 48):
+        blocks = numpy.where(messages >> shift != 0, (messages >> shift) & 0xFFFF, blocks)
+
+    order = field.mask2
+    logs = numpy.frombuffer(field.logTable, dtype=numpy.uint16).astype(numpy.int64)
+    exps = numpy.frombuffer(field.expTable, dtype=numpy.uint16).astype(numpy.int64)
+    sub_key_logs = logs[sub_keys]
+    states = numpy.zeros(len(keys), dtype=numpy.int64)
+    for j in xrange(GHASH_BLOCK_BITS):
+        power = exps[((j + 1) * sub_key_logs) % order]
+        states ^= numpy.where((blocks >> j) & 1 != 0, power, 0)
+    states[sub_keys == 0] = 0
+    tags = numpy.where(messages > 0, states ^ gctr, 0)
+    states[messages <= 0] = 0
+    return tags, states
+
+
+def _gmac_batch_scalar(keys, messages, IVs, field_degree, field_polynom):
+    tags = []
+    states = []
+    for key, message, IV in zip(keys, messages, IVs):
+        gmac = GMAC(key, field_degree, field_polynom)
+        tags.append(gmac.generate(message, IV))
+        states.append(gmac.get_state())
+    return tags, states
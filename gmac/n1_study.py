@@ -0,0 +1,152 @@
+""" Sharded, resumable runner for the GMAC N1 collision study
+
+The study of tests/GMACTest.test_n1 counts, for tests_amount x tests_amount runs over every
+key, how often two random messages under two random IVs give the same tag (N1) and the same
+GHASH state (N1 ghash). For every outer run the maximum over the inner runs is taken, and the
+maxima are averaged over the outer runs.
+
+Every (outer, inner) run is a shard with its own seed derived from the study seed, so results
+do not depend on how shards are scheduled. Shards run in a process pool, finished shards are
+written to a JSON checkpoint periodically, and a restarted study skips every shard that is
+already in the checkpoint.
+
+USAGE EXAMPLE:
+---------------
+    python -m gmac.n1_study --checkpoint n1_checkpoint.json --processes 8
+"""
+import argparse
+import random
+import sys
+
+from gmac.batch import gmac_batch
+from gmac.pyGMAC import generate_IV
+from present import sharding
+
+__author__ = 'Iurii Sergiichuk'
+
+
+def shard_seed(seed, outer, inner):
+    """Deterministic seed of the (outer, inner) shard"""
+    return (seed * 1000003 + outer) * 1000003 + inner
+
+
+def generate_16_bits(rng):
+    m = rng.getrandbits(16)
+    while m == 0:
+        m = rng.getrandbits(16)
+    return m
+
+
+def run_shard(outer, inner, keys_amount, seed):
+    """Count tag and GHASH collisions over every key for one shard
+
+    The random IVs and messages of every key are drawn first, in the order of the original
+    per-key loop, then all tags are computed together by gmac_batch.
+    Output: (outer, inner, n1, n1_ghash)"""
+    rng = random.Random(shard_seed(seed, outer, inner))
+    IVs1, IVs2, messages1, messages2 = [], [], [], []
+    for key in xrange(keys_amount):
+        IV1 = generate_IV(rng)
+        IV2 = generate_IV(rng)
+        while IV1 == IV2:
+            IV2 = generate_IV(rng)
+        m1 = generate_16_bits(rng)
+        m2 = generate_16_bits(rng)
+        while m1 == m2:
+            m2 = generate_16_bits(rng)
+        IVs1.append(IV1)
+        IVs2.append(IV2)
+        messages1.append(m1)
+        messages2.append(m2)
+    keys = range(keys_amount)
+    C1, ghash_C1 = gmac_batch(keys, messages1, IVs1)
+    C2, ghash_C2 = gmac_batch(keys, messages2, IVs2)
+    n1 = sum(1 for c1, c2 in zip(C1, C2) if c1 == c2)
+    n1_ghash = sum(1 for s1, s2 in zip(ghash_C1, ghash_C2) if s1 == s2)
+    return outer, inner, n1, n1_ghash
+
+
+def _run_shard(args):
+    return run_shard(*args)
+
+
+def merge(results, tests_amount):
+    """Average over the outer runs of the maximum N1 / N1 ghash over the inner runs
+
+    Input:  {(outer, inner): (n1, n1_ghash)} for every shard
+    Output: (n1_max_average, n1_ghash_max_average) as floats"""
+    n1_max_total = 0
+    n1_ghash_max_total = 0
+    for outer in xrange(tests_amount):
+        shards = [results[(outer, inner)] for inner in xrange(tests_amount)]
+        n1_max_total += max(n1 for n1, _ in shards)
+        n1_ghash_max_total += max(n1_ghash for _, n1_ghash in shards)
+    return float(n1_max_total) / tests_amount, float(n1_ghash_max_total) / tests_amount
+
+
+def load_checkpoint(path, parameters):
+    """Finished shards of a checkpoint written for the same parameters"""
+    checkpoint = sharding.load_checkpoint(path, parameters)
+    if checkpoint is None:
+        return {}
+    return dict(((outer, inner), (n1, n1_ghash)) for outer, inner, n1, n1_ghash in checkpoint['shards'])
+
+
+def save_checkpoint(path, parameters, results):
+    """Write the finished shards atomically"""
+    shards = sorted([outer, inner, n1, n1_ghash] for (outer, inner), (n1, n1_ghash) in results.items())
+    sharding.save_checkpoint(path, parameters, {'shards': shards})
+
+
+def run_study(tests_amount=100, keys_amount=2 << 16, seed=0, processes=None, checkpoint=None,
+              checkpoint_interval=60.0, progress=sys.stderr):
+    """Run the whole study, resuming from checkpoint if it exists
+
+    processes:           worker count, multiprocessing.cpu_count() by default, 1 runs in this process
+    checkpoint:          JSON file for finished shards, None to disable checkpointing
+    checkpoint_interval: seconds between checkpoint writes
+    progress:            stream for progress reports, None to disable them
+    Output: (n1_max_average, n1_ghash_max_average)"""
+    parameters = {'tests_amount': tests_amount, 'keys_amount': keys_amount, 'seed': seed}
+    results = load_checkpoint(checkpoint, parameters)
+    total = tests_amount * tests_amount
+    pending = [(outer, inner, keys_amount, seed)
+               for outer in xrange(tests_amount) for inner in xrange(tests_amount)
+               if (outer, inner) not in results]
+    resumed = len(results)
+
+    def record(result):
+        outer, inner, n1, n1_ghash = result
+        results[(outer, inner)] = (n1, n1_ghash)
+
+    def report(elapsed):
+        done = len(results) - resumed
+        return "shard %d/%d, %.1f shards/min, ETA %.0f s" % (
+            len(results), total, 60.0 * done / max(elapsed, 1e-9), sharding.eta(elapsed, done, total - len(results)))
+
+    save = None
+    if checkpoint:
+        save = lambda: save_checkpoint(checkpoint, parameters, results)
+    sharding.run_shards(_run_shard, pending, record, processes, save=save, checkpoint_interval=checkpoint_interval,
+                        progress=progress, report=report)
+    return merge(results, tests_amount)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GMAC N1 collision study")
+    parser.add_argument('--tests', type=int, default=100, help="outer and inner run count")
+    parser.add_argument('--keys', type=int, default=2 << 16, help="keys per run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--checkpoint', default='n1_checkpoint.json')
+    parser.add_argument('--checkpoint-interval', type=float, default=60.0)
+    parser.add_argument('--output', default='n1_result.txt')
+    args = parser.parse_args(argv)
+    result = run_study(args.tests, args.keys, args.seed, args.processes, args.checkpoint, args.checkpoint_interval)
+    with open(args.output, 'w') as n1_result_file:
+        n1_result_file.write(str(result))
+    print result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,91 @@
 import random
+import struct
+from hmac import compare_digest
 
-from gmac.util.galue_fields import setGF2, i2P, ldMultGF2
-from present.miniPresent import MiniPresent
+from gmac.util.galue_fields import getGF2, i2P
+from present.miniPresent import MiniPresent, number2string_N
 
 __author__ = 'Iurii Sergiichuk'
 
 
-def generate_IV():
-    IV = random.getrandbits(16)
+# width of the message blocks processed by generate
+GHASH_BLOCK_BITS = 16
+
+
+def generate_IV(rng=random):
+    IV = rng.getrandbits(16)
     IV = IV & 0xFFF0 | 1
     return IV
 
 
 class GMAC(object):
-    _state_after_gHash = 0
+    __slots__ = ('_initial_field_polynom', '_field_degree', '_key', '_cipher', '_ghash_tables', '_field',
+                 '_state_after_gHash')
 
     def __init__(self, key, field_degree=16, field_polynom=0b10001000000001011):
         self._initial_field_polynom = field_polynom
         self._field_degree = field_degree
         self._key = key
-        setGF2(self._field_degree, i2P(self._initial_field_polynom))
+        self._cipher = MiniPresent(key)
+        self._ghash_tables = None
+        self._field = getGF2(self._field_degree, i2P(self._initial_field_polynom))
+        self._state_after_gHash = 0
+
+    @classmethod
+    def new(cls, key, IV, data=None, field_degree=16, field_polynom=0b10001000000001011):
+        """Create a streaming GMAC over bytes, see GMACStream"""
+        return GMACStream(cls(key, field_degree, field_polynom), IV, data)
 
     def generate(self, open_text, IV):
-        open_text_copy = open_text
-        result = 0
+        if open_text <= 0:
+            return 0
         sub_key = self._get_subkey(self._key)
-        # print "key=" + str(self._key),
-        # print "\tIV=" + str(IV),
-        # print "\tsub_key=" + str(sub_key),
-        while (open_text_copy > 0):
-            open_text_block = open_text_copy & 0xFFFF
-            # print "\topenTextBlock=" + str(open_text_block),
-            gctr = self._GCTR(IV, self._key)
-            # print "\tgctr=" + str(gctr),
-            gHash = self._gHash(open_text_block, sub_key)
-            # print "\tgHash=" + str(gHash),
-            self._state_after_gHash = gHash
-            result = gHash ^ gctr
-            # print "\tresult=" + str(result)
-            open_text_copy >>= 16
-        return result
+        gctr = self._GCTR(IV, self._key)
+        # every 16-bit block overwrites the result of the previous one,
+        # so only the most significant non-zero block determines the tag
+        open_text_block = open_text
+        while open_text_block > 0xFFFF:
+            open_text_block >>= 16
+        gHash = self._gHash(open_text_block, sub_key)
+        self._state_after_gHash = gHash
+        return gHash ^ gctr
 
     def _gHash(self, open_text_block, sub_key):
+        if open_text_block >> GHASH_BLOCK_BITS:
+            return self._gHash_bitwise(open_text_block, sub_key)
+        t0, t1, t2, t3 = self._get_ghash_tables(sub_key)
+        return (t0[open_text_block & 0xF] ^ t1[(open_text_block >> 4) & 0xF] ^
+                t2[(open_text_block >> 8) & 0xF] ^ t3[open_text_block >> 12])
+
+    def _get_ghash_tables(self, sub_key):
+        """4-bit window tables of multiples of the subkey powers, built once per subkey
+
+        _gHash_bitwise computes F = (F ^ bit) * H over the bits of the block, which expands to
+        the XOR of H^(j + 1) over every set bit j. Table w maps a nibble to the XOR of the
+        powers H^(4w + 1) ... H^(4w + 4) selected by its bits."""
+        if self._ghash_tables is None or self._ghash_tables[0] != sub_key:
+            powers = [sub_key]
+            for _ in xrange(GHASH_BLOCK_BITS - 1):
+                powers.append(self._field.multGF2(powers[-1], sub_key))
+            tables = []
+            for window in xrange(GHASH_BLOCK_BITS // 4):
+                table = [0] * 16
+                for nibble in xrange(1, 16):
+                    low_bit = nibble & -nibble
+                    table[nibble] = table[nibble ^ low_bit] ^ powers[4 * window + low_bit.bit_length() - 1]
+                tables.append(table)
+            self._ghash_tables = (sub_key, tables)
+        return self._ghash_tables[1]
+
+    def _gHash_bitwise(self, open_text_block, sub_key):
         text_block = i2P(open_text_block)
-        s_key = i2P(sub_key)
         F = 0
         for i in xrange(len(text_block)):
-            F = ldMultGF2(i2P(F ^ text_block[i]), s_key)
+            F = self._field.multGF2(F ^ text_block[i], sub_key)
         return F
 
     def _GCTR(self, IV, key):
-        cipher = MiniPresent(key)
+        cipher = self._get_cipher(key)
         IV_copy = IV
         encrypted_IV = 0
         shift_amount = 0
@@ -63,13 +98,99 @@ class GMAC(object):
         return encrypted_IV
 
     def _get_subkey(self, key, init=0x0):
-        cipher = MiniPresent(key)
+        cipher = self._get_cipher(key)
         return cipher.encrypt(init)
 
+    def _get_cipher(self, key):
+        if key == self._key:
+            return self._cipher
+        return MiniPresent(key)
+
     def get_state(self):
         return self._state_after_gHash
 
 
+class GMACStream(object):
+    """Incremental GMAC over a byte string, in the style of hashlib
+
+    The message is split into 16-bit big-endian blocks X1 ... Xn, the last one padded with
+    zero bytes, followed by a block holding the message length in bits (mod 2^16):
+        S = 0;  S = gHash(S ^ Xi) for every block;  tag = S ^ GCTR(IV)
+    The subkey, its GHASH tables and GCTR(IV) are computed once, in the constructor.
+
+    USAGE EXAMPLE:
+    ---------------
+    >>> mac = GMAC.new(235, 21313)
+    >>> mac.update("attack ")
+    >>> mac.update(bytearray("at dawn"))
+    >>> mac.hexdigest()
+    '5ee3'
+    >>> GMAC.new(235, 21313, "attack at dawn").verify(mac.digest())
+    """
+    __slots__ = ('digest_size', '_tables', '_gctr', '_state', '_pending', '_length')
+
+    # bytes per GHASH block
+    block_size = GHASH_BLOCK_BITS // 8
+    # bytes hashed per struct.unpack call in update, bounds the memory used per call
+    _UPDATE_CHUNK = 1 << 16
+
+    def __init__(self, gmac, IV, data=None):
+        if gmac._field_degree > GHASH_BLOCK_BITS:
+            raise ValueError("Streaming GMAC supports fields of degree <= %d" % GHASH_BLOCK_BITS)
+        self.digest_size = (gmac._field_degree + 7) // 8
+        self._tables = gmac._get_ghash_tables(gmac._get_subkey(gmac._key))
+        self._gctr = gmac._GCTR(IV, gmac._key)
+        self._state = 0
+        self._pending = ''
+        self._length = 0
+        if data is not None:
+            self.update(data)
+
+    def update(self, data):
+        """Hash more data (str, bytearray or memoryview)"""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        data = str(data)
+        self._length += len(data)
+        if self._pending:
+            data = self._pending + data
+        complete = len(data) - len(data) % self.block_size
+        for start in xrange(0, complete, self._UPDATE_CHUNK):
+            chunk = data[start:min(start + self._UPDATE_CHUNK, complete)]
+            self._state = self._hash_blocks(self._state, struct.unpack('>%dH' % (len(chunk) // 2), chunk))
+        self._pending = data[complete:]
+
+    def _hash_blocks(self, state, blocks):
+        t0, t1, t2, t3 = self._tables
+        for block in blocks:
+            x = state ^ block
+            state = t0[x & 0xF] ^ t1[(x >> 4) & 0xF] ^ t2[(x >> 8) & 0xF] ^ t3[x >> 12]
+        return state
+
+    def digest(self):
+        """Tag of the data hashed so far as a raw string, the stream can still be updated"""
+        blocks = []
+        if self._pending:
+            blocks.append(struct.unpack('>H', self._pending.ljust(self.block_size, '\x00'))[0])
+        blocks.append((self._length * 8) & ((1 << GHASH_BLOCK_BITS) - 1))
+        return number2string_N(self._hash_blocks(self._state, blocks) ^ self._gctr, self.digest_size)
+
+    def hexdigest(self):
+        return self.digest().encode('hex')
+
+    def verify(self, tag):
+        """Check a tag in constant time, raise ValueError if it does not match"""
+        if not compare_digest(self.digest(), str(tag)):
+            raise ValueError("MAC check failed")
+
+    def copy(self):
+        other = GMACStream.__new__(GMACStream)
+        other.digest_size = self.digest_size
+        other._tables, other._gctr = self._tables, self._gctr
+        other._state, other._pending, other._length = self._state, self._pending, self._length
+        return other
+
+
 if __name__ == "__main__":
     subkey = long('235', base=10)
     g = GMAC(subkey)
@@ -7,10 +7,162 @@
 # License: Attribution-NonCommercial-ShareAlike 3.0 Unported
 #          (CC BY-NC-SA 3.0)
 # ===========================================================
+import threading
+from array import array
 from functools import reduce
 
-# constants used in the multGF2 function
+from gmac.util.large_fields import LargeField
+
+# log/antilog tables are only built for fields of degree <= LOG_TABLES_MAX_DEGREE
+LOG_TABLES_MAX_DEGREE = 16
+
+
+class GF2Field(object):
+    """Binary finite field GF(2^m)/g(x)
+
+    Holds everything multiplication needs, so fields with different polynomials can be used
+    side by side and from several threads. Use getGF2 to share identical fields.
+
+    Attributes:
+       - mask1, mask2, polyred: constants used by the shift-and-add multiplication
+       - logTable, expTable: log/antilog tables (array('H')) for degree <= 16, None otherwise;
+         expTable[i] = g^i for a primitive element g, stored twice, so exponents never need a
+         modulo, and logTable[g^i] = i
+       - large: large_fields.LargeField for degree > 16, None otherwise
+    """
+    __slots__ = ('degree', 'mask1', 'mask2', 'polyred', 'logTable', 'expTable', 'large')
+
+    def __init__(self, degree, irPoly):
+        """Define parameters of binary finite field GF(2^m)/g(x)
+           - degree: extension degree of binary field
+           - irPoly: coefficients of irreducible polynomial g(x); for degree > 16 a g(x)
+             without constant term raises ValueError (see LargeField)
+        """
+        self.degree = degree
+        self.mask1 = self.mask2 = 1 << degree
+        self.mask2 -= 1
+        if sum(irPoly) <= len(irPoly):
+            self.polyred = reduce(lambda x, y: (x << 1) + y, irPoly[1:])
+        else:
+            self.polyred = poly2Int(irPoly[1:])
+        self.logTable = self.expTable = self.large = None
+        if degree <= LOG_TABLES_MAX_DEGREE:
+            self.logTable, self.expTable = self._buildLogTables()
+        else:
+            self.large = LargeField(degree, self.polyred)
+
+    def _buildLogTables(self):
+        """Build log/antilog tables of the field
+
+        Output: (logTable, expTable) as array('H'), or (None, None) when no primitive
+                element is found (g(x) is not irreducible)"""
+        order = self.mask2
+        if order < 2 or self._powGF2Loop(2, order) != 1:
+            return None, None
+        for generator in range(2, min(order, 64) + 1):
+            powers = array('H', [0]) * (2 * order)
+            p = 1
+            for i in range(order):
+                powers[i] = p
+                p = self._multGF2Loop(p, generator)
+                if p == 1:
+                    break
+            if p == 1 and i == order - 1:
+                powers[order:] = powers[:order]
+                logs = array('H', [0]) * (order + 1)
+                for i in range(order):
+                    logs[powers[i]] = i
+                return logs, powers
+        return None, None
+
+    def multGF2(self, p1, p2):
+        """Multiply two polynomials in GF(2^m)/g(x)"""
+        if self.logTable is not None and p1 <= self.mask2 and p2 <= self.mask2:
+            if not p1 or not p2:
+                return 0
+            return self.expTable[self.logTable[p1] + self.logTable[p2]]
+        if self.large is not None and 0 <= p1 <= self.mask2 and p2 >= 0:
+            return self.large.multiply(p1, p2)
+        return self._multGF2Loop(p1, p2)
+
+    def _multGF2Loop(self, p1, p2):
+        """Multiply two polynomials in GF(2^m)/g(x) by shift-and-add"""
+        mask1, polyred = self.mask1, self.polyred
+        p = 0
+        while p2:
+            if p2 & 1:
+                p ^= p1
+            p1 <<= 1
+            if p1 & mask1:
+                p1 ^= polyred
+            p2 >>= 1
+        return p & self.mask2
+
+    def _powGF2Loop(self, p, exponent):
+        result = 1
+        while exponent:
+            if exponent & 1:
+                result = self._multGF2Loop(result, p)
+            p = self._multGF2Loop(p, p)
+            exponent >>= 1
+        return result
+
+    def powGF2(self, p, exponent):
+        """Raise a polynomial to an integer power in GF(2^m)/g(x)"""
+        order = self.mask2
+        if self.logTable is not None and 0 < p <= order:
+            return self.expTable[(self.logTable[p] * exponent) % order]
+        if p == 0:
+            if exponent < 0:
+                raise ZeroDivisionError("0 has no inverse in GF(2^m)")
+            return 0 if exponent else 1
+        if self.large is not None and 0 < p <= order:
+            return self.large.power(p, exponent % order)
+        return self._powGF2Loop(p, exponent % order)
+
+    def invGF2(self, p):
+        """Multiplicative inverse of a non-zero polynomial in GF(2^m)/g(x)"""
+        if not p:
+            raise ZeroDivisionError("0 has no inverse in GF(2^m)")
+        if self.logTable is not None and p <= self.mask2:
+            return self.expTable[self.mask2 - self.logTable[p]]
+        if self.large is not None and 0 < p <= self.mask2:
+            return self.large.inverse(p)
+        return self._powGF2Loop(p, self.mask2 - 1)
+
+    def ldMultGF2(self, p1, p2):
+        """Multiply two "low-degree" polynomials in GF(2^n)/g(x)"""
+        return self.multGF2(p2I(p1), p2I(p2))
+
+    def hdMultGF2(self, p1, p2):
+        """Multiply two "high-degree" polynomials in GF(2^n)/g(x)"""
+        return self.multGF2(poly2Int(p1), poly2Int(p2))
+
+
+# fields created by getGF2, by (degree, irPoly)
+_fields = {}
+_fieldsLock = threading.Lock()
+
+
+def getGF2(degree, irPoly):
+    """Shared GF2Field instance of GF(2^m)/g(x), built on first use"""
+    key = (degree, tuple(irPoly))
+    field = _fields.get(key)
+    if field is None:
+        with _fieldsLock:
+            field = _fields.get(key)
+            if field is None:
+                field = _fields[key] = GF2Field(degree, irPoly)
+    return field
+
+
+# =============================================================================
+#          Module-level interface working on the field chosen by setGF2
+# =============================================================================
+# the current field and its constants
+field = None
 mask1 = mask2 = polyred = None
+logTable = expTable = None
 
 
 def setGF2(degree, irPoly):
@@ -18,26 +170,25 @@ def setGF2(degree, irPoly):
        - degree: extension degree of binary field
        - irPoly: coefficients of irreducible polynomial g(x)
     """
-    global mask1, mask2, polyred
-    mask1 = mask2 = 1 << degree
-    mask2 -= 1
-    if sum(irPoly) <= len(irPoly):
-        polyred = reduce(lambda x, y: (x << 1) + y, irPoly[1:])
-    else:
-        polyred = poly2Int(irPoly[1:])
+    global field, mask1, mask2, polyred, logTable, expTable
+    field = getGF2(degree, irPoly)
+    mask1, mask2, polyred = field.mask1, field.mask2, field.polyred
+    logTable, expTable = field.logTable, field.expTable
 
 
 def multGF2(p1, p2):
     """Multiply two polynomials in GF(2^m)/g(x)"""
-    p = 0
-    while p2:
-        if p2 & 1:
-            p ^= p1
-        p1 <<= 1
-        if p1 & mask1:
-            p1 ^= polyred
-        p2 >>= 1
-    return p & mask2
+    return field.multGF2(p1, p2)
+
+
+def powGF2(p, exponent):
+    """Raise a polynomial to an integer power in GF(2^m)/g(x)"""
+    return field.powGF2(p, exponent)
+
+
+def invGF2(p):
+    """Multiplicative inverse of a non-zero polynomial in GF(2^m)/g(x)"""
+    return field.invGF2(p)
 
 
 # =============================================================================
@@ -45,14 +196,9 @@ def multGF2(p1, p2):
 # =============================================================================
 def int2Poly(bInt):
     """Convert a "big" integer into a "high-degree" polynomial"""
-    exp = 0
-    poly = []
-    while bInt:
-        if bInt & 1:
-            poly.append(exp)
-        exp += 1
-        bInt >>= 1
-    return poly[::-1]
+    bits = bin(bInt)[2:]
+    top = len(bits) - 1
+    return [top - i for i, bit in enumerate(bits) if bit == '1']
 
 
 def poly2Int(hdPoly):
@@ -78,12 +224,12 @@ def p2I(ldPoly):
 
 def ldMultGF2(p1, p2):
     """Multiply two "low-degree" polynomials in GF(2^n)/g(x)"""
-    return multGF2(p2I(p1), p2I(p2))
+    return field.ldMultGF2(p1, p2)
 
 
 def hdMultGF2(p1, p2):
     """Multiply two "high-degree" polynomials in GF(2^n)/g(x)"""
-    return multGF2(poly2Int(p1), poly2Int(p2))
+    return field.hdMultGF2(p1, p2)
 
 
 if __name__ == "__main__":
@@ -111,9 +257,9 @@ if __name__ == "__main__":
     # Check if (x + 1)(x^6 + x^5 + x^3 + x^2 + x) == x^7 + x^5 + x^4 + x
     assert ldMultGF2([1, 1], [1, 1, 0, 1, 1, 1, 0]) == p2I([1, 0, 1, 1, 0, 0, 1, 0])
 
-    # Define binary field GF(2^571)/x^571 + x^10 + x^5 + x^2 + x
-    setGF2(571, [571, 10, 5, 2, 1])
+    # Define binary field GF(2^571)/x^571 + x^10 + x^5 + x^2 + 1
+    setGF2(571, [571, 10, 5, 2, 0])
 
-    # Calculate the product of two polynomials in GF(2^571)/x^571 + x^10 + x^5 + x^2 + x,
+    # Calculate the product of two polynomials in GF(2^571)/x^571 + x^10 + x^5 + x^2 + 1,
     # x^518 + x^447 + x^320 + x^209 + x^119 + x + 1 and x^287 + x^145 + x^82 + + x^44
     print(int2Poly(hdMultGF2([518, 447, 320, 209, 119, 1, 0], [287, 145, 82, 44])))
@@ -0,0 +1,118 @@
+# Description: Arithmetic in large binary fields GF(2^m)/g(x), m in the hundreds
+#
+# Polynomials are integers (bit i is the coefficient of x^i), as in galue_fields.
+#   - multiplication: carry-less product by a 4-bit window comb over the hex digits of one
+#     operand, reduced afterwards (Karatsuba splitting is slower than the comb up to 4096-bit
+#     operands on CPython, far above the supported fields)
+#   - reduction: for sparse g(x) (trinomials, pentanomials) the part above x^m is folded back
+#     with one shift-and-XOR per term of g(x), otherwise multiplied by g(x) - x^m
+#   - squaring: spreading every hex digit abcd to 0a0b0c0d with a string table, then reduction
+#   - inversion: Itoh-Tsujii, a^(2^m - 2) = (a^(2^(m-1) - 1))^2 with an addition chain over m - 1
+# GF2Field uses LargeField for fields without log/antilog tables of degree > 16.
+# g(x) must be irreducible, otherwise inverse and power do not give field inverses and powers.
+# ===========================================================
+
+# g(x) with at most this many terms below x^m is reduced term by term
+SPARSE_MAX_TERMS = 8
+
+# hex digit -> its bits spread to every other position (x^i -> x^2i), as two hex digits
+_SPREAD_HEX = dict(('%x' % n, '%02x' % sum(((n >> i) & 1) << (2 * i) for i in range(4))) for n in range(16))
+
+
+class LargeField(object):
+    """Multiplication, squaring, powers and inverses modulo x^m + polyred
+
+    The results equal those of GF2Field's shift-and-add loop for operands of degree < m.
+    g(x) must be irreducible; g(x) without a constant term is divisible by x and rejected."""
+    __slots__ = ('degree', 'mask', 'polyred', 'terms')
+
+    def __init__(self, degree, polyred):
+        """degree: m; polyred: g(x) - x^m as integer"""
+        if not polyred & 1:
+            raise ValueError("x^%d + ... without a constant term is divisible by x, not irreducible" % degree)
+        self.degree = degree
+        self.mask = (1 << degree) - 1
+        self.polyred = polyred
+        terms = [i for i in range(polyred.bit_length()) if polyred >> i & 1]
+        self.terms = terms if len(terms) <= SPARSE_MAX_TERMS else None
+
+    def reduce(self, c):
+        """c mod g(x), for any polynomial c"""
+        degree, mask = self.degree, self.mask
+        if self.terms is not None:
+            terms = self.terms
+            high = c >> degree
+            while high:
+                c &= mask
+                for term in terms:
+                    c ^= high << term
+                high = c >> degree
+            return c
+        while c >> degree:
+            c = (c & mask) ^ clmul(c >> degree, self.polyred)
+        return c
+
+    def multiply(self, a, b):
+        return self.reduce(clmul(a, b))
+
+    def square(self, a):
+        return self.reduce(square(a))
+
+    def power(self, a, exponent):
+        """a^exponent for exponent >= 0, left-to-right square-and-multiply"""
+        result = 1
+        for bit in bin(exponent)[2:]:
+            result = self.square(result)
+            if bit == '1':
+                result = self.multiply(result, a)
+        return result
+
+    def inverse(self, a):
+        """a^(2^m - 2), the inverse of a non-zero a when g(x) is irreducible (Itoh-Tsujii)
+
+        beta(k) = a^(2^k - 1) satisfies beta(i + j) = beta(i)^(2^j) * beta(j), so beta(m - 1)
+        takes m - 2 squarings and one multiplication per bit of m - 1."""
+        if self.degree == 1:
+            return self.reduce(a) and 1
+        n = self.degree - 1
+        beta, k = a, 1
+        for bit in bin(n)[3:]:
+            # beta(2k) = beta(k)^(2^k) * beta(k)
+            powered = beta
+            for _ in range(k):
+                powered = self.square(powered)
+            beta, k = self.multiply(powered, beta), 2 * k
+            if bit == '1':
+                # beta(k + 1) = beta(k)^2 * a
+                beta, k = self.multiply(self.square(beta), a), k + 1
+        return self.square(beta)
+
+
+def square(a):
+    """Carry-less square: every bit x^i moved to x^2i"""
+    if not a:
+        return 0
+    return int(''.join(map(_SPREAD_HEX.__getitem__, '%x' % a)), 16)
+
+
+def clmul(a, b):
+    """Carry-less product of two polynomials"""
+    if a.bit_length() < b.bit_length():
+        a, b = b, a
+    return _comb(a, b)
+
+
+def _comb(a, b):
+    """Carry-less product by 4-bit windows: table of a times every digit, then one shift per hex digit of b"""
+    if not b:
+        return 0
+    a2 = a << 1
+    a4 = a << 2
+    a8 = a << 3
+    table = [0, a, a2, a2 ^ a, a4, a4 ^ a, a4 ^ a2, a4 ^ a2 ^ a,
+             a8, a8 ^ a, a8 ^ a2, a8 ^ a2 ^ a, a8 ^ a4, a8 ^ a4 ^ a, a8 ^ a4 ^ a2, a8 ^ a4 ^ a2 ^ a]
+    windows = dict(zip('0123456789abcdef', table))
+    result = 0
+    for digit in '%x' % b:
+        result = (result << 4) ^ windows[digit]
+    return result
@@ -0,0 +1,18 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Optional dependencies
+
+numpy is the NumPy module, or None when it is not installed; HAVE_NUMPY tells which.
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+HAVE_NUMPY = numpy is not None
+
+
+def require_numpy(feature):
+    """Raise ImportError naming feature when NumPy is not installed"""
+    if numpy is None:
+        raise ImportError("NumPy is required for %s" % feature)
@@ -0,0 +1,178 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" asyncio streams carrying PRESENT-CTR encrypted, optionally GMAC tagged frames
+
+SecureStreamReader/SecureStreamWriter wrap a StreamReader/StreamWriter pair and exchange
+whole frames in the format of present.framing. Frames of at least offload_threshold bytes are
+sealed and opened in an executor (the loop's default thread pool unless one is given), so
+large frames do not hold the event loop for their whole encryption.
+
+Every connection starts with a random nonce (framing.NONCE_SIZE bytes) sent in the clear by the
+client; both ends mix it into the configured IV (framing.session_iv), so sessions sharing a
+key and IV still use different keystreams and GMAC frame numbers. Both directions of a
+connection use the same key with different counter blocks (framing.peer_iv), and every
+direction of every session shares its key schedule through the key schedule cache, so a
+session costs two Present objects and two counters. wrap_streams takes the counter block as
+is: a (key, iv) given to it must never be used for another connection.
+
+The package targets Python 2, where asyncio is provided by the trollius backport.
+
+USAGE EXAMPLE:
+---------------
+    @asyncio.coroutine
+    def echo(reader, writer):
+        while True:
+            frame = yield From(reader.read_frame())
+            if frame is None:
+                break
+            yield From(writer.write_frame(frame))
+        writer.close()
+
+    server = yield From(start_secure_server(echo, key, iv, '127.0.0.1', 8888, mac_key=0xBEEF))
+    reader, writer = yield From(open_secure_connection(key, iv, '127.0.0.1', 8888, mac_key=0xBEEF))
+    yield From(writer.write_frame("attack at dawn"))
+    reply = yield From(reader.read_frame())
+"""
+import trollius as asyncio
+from trollius import From, Return
+
+from present.framing import FrameEncoder, FrameDecoder, HEADER, MAX_FRAME_SIZE, NONCE_SIZE, new_nonce, peer_iv, \
+    session_iv
+
+# frames of at least this many bytes are processed in the executor
+OFFLOAD_THRESHOLD = 1 << 14
+
+
+@asyncio.coroutine
+def _process(loop, executor, offload_threshold, function, *args):
+    """Call function in the loop thread or, for args[-1] of offload_threshold bytes or more, in the executor"""
+    if len(args[-1]) < offload_threshold:
+        raise Return(function(*args))
+    result = yield From(loop.run_in_executor(executor, function, *args))
+    raise Return(result)
+
+
+class SecureStreamWriter(object):
+    def __init__(self, writer, encoder, loop=None, executor=None, offload_threshold=OFFLOAD_THRESHOLD):
+        """Frame writer over an asyncio StreamWriter
+
+        writer:            asyncio StreamWriter
+        encoder:           framing.FrameEncoder of this direction
+        executor:          executor for large frames, the loop's default one by default
+        offload_threshold: frame size from which sealing runs in the executor
+        """
+        self.writer = writer
+        self._encoder = encoder
+        self._loop = loop or asyncio.get_event_loop()
+        self._executor = executor
+        self._offload_threshold = offload_threshold
+        # frames must reach the stream in the order of their counters
+        self._lock = asyncio.Lock(loop=self._loop)
+
+    @asyncio.coroutine
+    def write_frame(self, data):
+        """Encrypt data as one frame, write it and wait until the transport buffer drains"""
+        with (yield From(self._lock)):
+            frame = yield From(_process(self._loop, self._executor, self._offload_threshold,
+                                        self._encoder.seal, data))
+            self.writer.write(frame)
+            yield From(self.writer.drain())
+
+    def close(self):
+        self.writer.close()
+
+    def get_extra_info(self, name, default=None):
+        return self.writer.get_extra_info(name, default)
+
+
+class SecureStreamReader(object):
+    def __init__(self, reader, decoder, loop=None, executor=None, offload_threshold=OFFLOAD_THRESHOLD):
+        """Frame reader over an asyncio StreamReader, see SecureStreamWriter"""
+        self.reader = reader
+        self._decoder = decoder
+        self._loop = loop or asyncio.get_event_loop()
+        self._executor = executor
+        self._offload_threshold = offload_threshold
+        self._lock = asyncio.Lock(loop=self._loop)
+
+    @asyncio.coroutine
+    def read_frame(self):
+        """Read, check and decrypt the next frame
+
+        Output: payload as raw string, None at the end of the stream
+        Raises ValueError for a frame with a wrong tag, IncompleteReadError for a truncated one"""
+        with (yield From(self._lock)):
+            try:
+                header = yield From(self.reader.readexactly(HEADER.size))
+            except asyncio.IncompleteReadError as error:
+                if error.partial:
+                    raise
+                raise Return(None)
+            body = yield From(self.reader.readexactly(self._decoder.body_length(header)))
+            payload = yield From(_process(self._loop, self._executor, self._offload_threshold,
+                                          self._decoder.open, header, body))
+            raise Return(payload)
+
+
+def wrap_streams(reader, writer, key, iv, mac_key=None, server=False, loop=None, executor=None,
+                 offload_threshold=OFFLOAD_THRESHOLD, rounds=32, max_frame_size=MAX_FRAME_SIZE):
+    """Wrap both streams of a connection, without a nonce exchange
+
+    key:     PRESENT key as 80-bit or 128-bit rawstring
+    iv:      8-byte counter block of the client to server direction, unique to this connection
+    mac_key: 16-bit GMAC key as integer, None to send frames without tags
+    server:  True on the accepting side, selects the counter block of each direction
+    Output:  (SecureStreamReader, SecureStreamWriter)"""
+    send_iv, receive_iv = (peer_iv(iv), iv) if server else (iv, peer_iv(iv))
+    encoder = FrameEncoder(key, send_iv, mac_key, rounds, max_frame_size)
+    decoder = FrameDecoder(key, receive_iv, mac_key, rounds, max_frame_size)
+    return (SecureStreamReader(reader, decoder, loop, executor, offload_threshold),
+            SecureStreamWriter(writer, encoder, loop, executor, offload_threshold))
+
+
+@asyncio.coroutine
+def open_secure_connection(key, iv, host=None, port=None, mac_key=None, loop=None, executor=None,
+                           offload_threshold=OFFLOAD_THRESHOLD, **kwds):
+    """asyncio.open_connection with encrypted frames, extra keywords go to open_connection
+
+    Sends a fresh nonce, the session's counter blocks are derived from it and iv.
+    Output: (SecureStreamReader, SecureStreamWriter)"""
+    reader, writer = yield From(asyncio.open_connection(host, port, loop=loop, **kwds))
+    nonce = new_nonce()
+    writer.write(nonce)
+    raise Return(wrap_streams(reader, writer, key, session_iv(iv, nonce), mac_key, False, loop, executor,
+                              offload_threshold))
+
+
+@asyncio.coroutine
+def accept_streams(reader, writer, key, iv, mac_key=None, loop=None, executor=None,
+                   offload_threshold=OFFLOAD_THRESHOLD):
+    """Server side of open_secure_connection: read the client's nonce and wrap both streams
+
+    Output: (SecureStreamReader, SecureStreamWriter), None if the client closed before its nonce"""
+    try:
+        nonce = yield From(reader.readexactly(NONCE_SIZE))
+    except asyncio.IncompleteReadError:
+        writer.close()
+        raise Return(None)
+    raise Return(wrap_streams(reader, writer, key, session_iv(iv, nonce), mac_key, True, loop, executor,
+                              offload_threshold))
+
+
+def start_secure_server(client_connected_cb, key, iv, host=None, port=None, mac_key=None, loop=None,
+                        executor=None, offload_threshold=OFFLOAD_THRESHOLD, **kwds):
+    """asyncio.start_server with encrypted frames
+
+    client_connected_cb is called with (SecureStreamReader, SecureStreamWriter) for every
+    connection and may be a coroutine function. Output: coroutine giving the Server"""
+
+    @asyncio.coroutine
+    def connected(reader, writer):
+        streams = yield From(accept_streams(reader, writer, key, iv, mac_key, loop, executor, offload_threshold))
+        if streams is None:
+            return
+        result = client_connected_cb(*streams)
+        if asyncio.iscoroutine(result):
+            yield From(result)
+
+    return asyncio.start_server(connected, host, port, loop=loop, **kwds)
@@ -0,0 +1,288 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Differential and linear cryptanalysis of PRESENT and MiniPresent
+
+ddt and lat compute the difference distribution and linear approximation tables of a 4-bit
+S-box with NumPy broadcasting. TrailSearch finds the best differential or linear trail over
+a number of S-box layers of an SP network with 4-bit S-boxes and a bit permutation (PRESENT's
+64-bit PBox, MiniPresent's 8-bit PBox). The search is a branch-and-bound in the style of
+Matsui: the best trails of fewer rounds bound the rest of a partial trail, the S-boxes a
+partial round activates in the next round bound it further, and the best (or a proven lower
+bound of the) weight of every (state, remaining rounds) visited is memoised.
+
+Weights are -log2 of probabilities (differential) or of absolute correlations (linear), so
+the weight of a trail is the sum of the weights of its S-box transitions. A round of a
+trail is an S-box layer; PRESENT with r rounds has r S-box layers, MiniPresent with r rounds
+(the number given to MiniPresent) has r - 1.
+
+empirical_ddt counts the output differences of reduced-round MiniPresent for every input
+difference over every plaintext pair and every key, using the whole-keyspace encryption of
+present.keyspace in a process pool. Requires NumPy.
+
+USAGE EXAMPLE:
+---------------
+>>> int(ddt()[0x1, 0x9])
+4
+>>> int(lat()[0x1, 0xf]), int(abs(lat()[1:, 1:]).max())
+(4, 4)
+>>> search = TrailSearch.differential(PBox)
+>>> [search.best(rounds).weight for rounds in (1, 2, 3)]
+[2.0, 4.0, 8.0]
+>>> counts = empirical_ddt(rounds=3, keys=range(16), processes=1)
+>>> int(counts[0x01].sum()) == 16 * 256
+True
+"""
+import collections
+import math
+import multiprocessing
+
+from present._compat import numpy, require_numpy
+from present.miniPresent import PBox as MINI_PBOX
+from present.pyPresent import Sbox, PBox
+from present import keyspace
+
+# keys encrypted at once by an empirical_ddt worker
+SHARD_KEYS = 1024
+# keys whose plaintext pairs are counted in one bincount
+_CHUNK_KEYS = 32
+
+# weight and (input, output) of every S-box layer of a trail, state = S-box layer input
+Trail = collections.namedtuple('Trail', 'weight rounds')
+
+
+def _require_numpy():
+    require_numpy("the analysis tables")
+
+
+def _parity(values, bits):
+    parity = numpy.zeros_like(values)
+    for bit in xrange(bits):
+        parity ^= (values >> bit) & 1
+    return parity
+
+
+def ddt(sbox=Sbox):
+    """Difference distribution table: ddt[a, b] = #{x : S(x) ^ S(x ^ a) = b}"""
+    _require_numpy()
+    s = numpy.array(sbox, dtype=numpy.int64)
+    n = len(s)
+    x = numpy.arange(n, dtype=numpy.int64)
+    a = x.reshape(-1, 1)
+    b = s[x ^ a] ^ s[x]
+    return numpy.bincount((a * n + b).ravel(), minlength=n * n).reshape(n, n)
+
+
+def lat(sbox=Sbox):
+    """Linear approximation table: lat[a, b] = #{x : a.x = b.S(x)} - n/2"""
+    _require_numpy()
+    s = numpy.array(sbox, dtype=numpy.int64)
+    n = len(s)
+    bits = (n - 1).bit_length()
+    x = numpy.arange(n, dtype=numpy.int64)
+    a, b, x = x.reshape(-1, 1, 1), x.reshape(1, -1, 1), x.reshape(1, 1, -1)
+    disagree = _parity(a & x, bits) ^ _parity(b & s[x], bits)
+    return n // 2 - disagree.sum(axis=2)
+
+
+def _transitions(table, weight):
+    """Non-zero input -> [(weight, output)] by increasing weight, for the entries with weight(entry) not None"""
+    transitions = {}
+    for a in xrange(1, len(table)):
+        outputs = [(weight(int(table[a, b])), b) for b in xrange(len(table)) if table[a, b]]
+        transitions[a] = sorted((w, b) for w, b in outputs if w is not None)
+    return transitions
+
+
+class TrailSearch(object):
+    def __init__(self, transitions, pbox):
+        """Best trails of an SP network with 4-bit S-boxes
+
+        transitions: S-box input nibble (1..15) -> [(weight, output nibble)] sorted by weight
+        pbox:        bit permutation, bit i of the S-box layer output moves to bit pbox[i]
+        """
+        self.transitions = transitions
+        self.pbox = pbox
+        self.nibbles = len(pbox) // 4
+        self.min_weight = min(outputs[0][0] for outputs in transitions.itervalues() if outputs)
+        # pLayer image of output nibble v of S-box j
+        self._images = [[sum(((v >> bit) & 1) << pbox[4 * j + bit] for bit in xrange(4)) for v in xrange(16)]
+                        for j in xrange(self.nibbles)]
+        # the first round may start from any input: cheapest (weight, input) of every output
+        first = {}
+        for a, outputs in transitions.iteritems():
+            for w, b in outputs:
+                if b and (b not in first or w < first[b][0]):
+                    first[b] = (w, a)
+        self._first = sorted((w, b, a) for b, (w, a) in first.iteritems())
+        self._nibble_mask = int('1' * self.nibbles, 16)
+        # bounds[k]: weight of the best k-round trail
+        self.bounds = [0.0]
+        self._best = [None]
+        # (state, rounds) -> (weight, rounds of the best trail) or (proven lower bound, None)
+        self._memo = {}
+
+    @classmethod
+    def differential(cls, pbox=PBox, sbox=Sbox):
+        """Differential trails, weights -log2 of the transition probabilities"""
+        n = len(sbox)
+        return cls(_transitions(ddt(sbox), lambda count: math.log(float(n) / count, 2)), pbox)
+
+    @classmethod
+    def linear(cls, pbox=PBox, sbox=Sbox):
+        """Linear trails, weights -log2 of the absolute correlations (bias = correlation / 2)"""
+        n = len(sbox)
+        return cls(_transitions(lat(sbox), lambda bias: math.log(n / (2.0 * abs(bias)), 2)), pbox)
+
+    def _active(self, state):
+        """Number of non-zero nibbles"""
+        state |= state >> 1
+        state |= state >> 2
+        return bin(state & self._nibble_mask).count('1')
+
+    def _rest_bound(self, state, rounds):
+        """Lower bound of a rounds-round trail starting with the active S-boxes of state"""
+        if not rounds:
+            return 0.0
+        return max(self.bounds[rounds], self._active(state) * self.min_weight + self.bounds[rounds - 1])
+
+    def best(self, rounds):
+        """Best trail over rounds S-box layers
+
+        Output: Trail(weight, [(input, output) of every S-box layer])"""
+        while len(self.bounds) <= rounds:
+            k = len(self.bounds)
+            budget = self.bounds[k - 1] + self.min_weight
+            trail = None
+            while trail is None:
+                budget += 1.0
+                trail = self._search_first(k, budget)
+            self.bounds.append(trail.weight)
+            self._best.append(trail)
+        return self._best[rounds]
+
+    def _search_first(self, rounds, budget):
+        """Best trail lighter than budget whose first round input is free, None if there is none"""
+        best = [None, budget]
+        chosen = []
+
+        def extend(j, weight, image):
+            if j == self.nibbles:
+                if not chosen:
+                    return
+                rest = self._search(image, rounds - 1, best[1] - weight)
+                if rest is not None:
+                    state = sum(a << (4 * i) for i, a, b in chosen)
+                    output = sum(b << (4 * i) for i, a, b in chosen)
+                    best[0] = Trail(weight + rest.weight, [(state, output)] + rest.rounds)
+                    best[1] = best[0].weight
+                return
+            extend(j + 1, weight, image)
+            for w, b, a in self._first:
+                next_image = image | self._images[j][b]
+                if weight + w + self._rest_bound(next_image, rounds - 1) >= best[1]:
+                    if weight + w + self.bounds[rounds - 1] >= best[1]:
+                        break
+                    continue
+                chosen.append((j, a, b))
+                extend(j + 1, weight + w, next_image)
+                chosen.pop()
+
+        extend(0, 0.0, 0)
+        return best[0]
+
+    def _search(self, state, rounds, budget):
+        """Best trail from S-box layer input state lighter than budget, None if there is none"""
+        if not rounds:
+            return Trail(0.0, []) if budget > 0 else None
+        key = (state, rounds)
+        known = self._memo.get(key)
+        if known is not None:
+            weight, trail_rounds = known
+            if trail_rounds is not None:
+                return Trail(weight, trail_rounds) if weight < budget else None
+            if weight >= budget:
+                return None
+        active = [(j, (state >> (4 * j)) & 0xF) for j in xrange(self.nibbles) if (state >> (4 * j)) & 0xF]
+        # cheapest weight of the active S-boxes from position i on
+        floor = [0.0] * (len(active) + 1)
+        for i in xrange(len(active) - 1, -1, -1):
+            floor[i] = floor[i + 1] + self.transitions[active[i][1]][0][0]
+        best = [None, budget]
+        chosen = []
+
+        def extend(i, weight, image):
+            if i == len(active):
+                rest = self._search(image, rounds - 1, best[1] - weight)
+                if rest is not None:
+                    output = sum(b << (4 * j) for j, b in chosen)
+                    best[0] = Trail(weight + rest.weight, [(state, output)] + rest.rounds)
+                    best[1] = best[0].weight
+                return
+            j, a = active[i]
+            for w, b in self.transitions[a]:
+                if weight + w + floor[i + 1] + self.bounds[rounds - 1] >= best[1]:
+                    break
+                next_image = image | self._images[j][b]
+                if weight + w + floor[i + 1] + self._rest_bound(next_image, rounds - 1) >= best[1]:
+                    continue
+                chosen.append((j, b))
+                extend(i + 1, weight + w, next_image)
+                chosen.pop()
+
+        if floor[0] + self.bounds[rounds - 1] < budget:
+            extend(0, 0.0, 0)
+        if best[0] is not None:
+            self._memo[key] = (best[0].weight, best[0].rounds)
+        else:
+            self._memo[key] = (max(budget, known[0] if known is not None else 0.0), None)
+        return best[0]
+
+
+def mini_trail_search(kind='differential'):
+    """TrailSearch over the MiniPresent pLayer, kind is 'differential' or 'linear'"""
+    return getattr(TrailSearch, kind)(MINI_PBOX)
+
+
+# =============================================================================
+#                 Empirical differentials of reduced-round MiniPresent
+# =============================================================================
+def _ddt_shard(task):
+    """Output difference counts of every input difference over the given keys"""
+    keys, rounds = task
+    ciphertexts = keyspace.encryptAllKeys(numpy.arange(keyspace.BLOCKS_AMOUNT),
+                                          keyspace.roundkeys16All(keys, rounds))
+    blocks = keyspace.BLOCKS_AMOUNT
+    plaintexts = numpy.arange(blocks, dtype=numpy.int64)
+    # (x ^ x') * 256 for every plaintext pair (x, x')
+    input_differences = ((plaintexts.reshape(-1, 1) ^ plaintexts.reshape(1, -1)) * blocks).reshape(1, blocks, blocks)
+    counts = numpy.zeros(blocks * blocks, dtype=numpy.int64)
+    for first in xrange(0, len(ciphertexts), _CHUNK_KEYS):
+        chunk = ciphertexts[first:first + _CHUNK_KEYS].astype(numpy.int64)
+        pairs = input_differences + (chunk.reshape(-1, blocks, 1) ^ chunk.reshape(-1, 1, blocks))
+        counts += numpy.bincount(pairs.ravel(), minlength=blocks * blocks)
+    return counts.reshape(blocks, blocks)
+
+
+def empirical_ddt(rounds=4, keys=None, processes=None, shard_keys=SHARD_KEYS):
+    """Difference distribution of reduced-round MiniPresent over keys and all plaintexts
+
+    keys:       keys to count over, every 16-bit key by default
+    processes:  worker count, multiprocessing.cpu_count() by default
+    Output:     (256, 256) int64 array, counts[a, b] = #{(key, x) : E_key(x) ^ E_key(x ^ a) = b};
+                counts / (256. * len(keys)) are the differential probabilities"""
+    _require_numpy()
+    keys = keyspace.allKeys() if keys is None else numpy.array(keys, dtype=numpy.int64).reshape(-1)
+    tasks = [(keys[first:first + shard_keys], rounds) for first in xrange(0, len(keys), shard_keys)]
+    counts = numpy.zeros((keyspace.BLOCKS_AMOUNT, keyspace.BLOCKS_AMOUNT), dtype=numpy.int64)
+    if processes == 1 or len(tasks) <= 1:
+        for task in tasks:
+            counts += _ddt_shard(task)
+        return counts
+    pool = multiprocessing.Pool(processes)
+    try:
+        for shard in pool.imap_unordered(_ddt_shard, tasks):
+            counts += shard
+    finally:
+        pool.close()
+        pool.join()
+    return counts
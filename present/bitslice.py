@@ -0,0 +1,135 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Bitsliced PRESENT round function
+
+N blocks are transposed into bit-planes: plane i is a Python integer whose bit j is bit i of
+block j, so one integer operation processes bit i of all N blocks at once. The S-box layer
+becomes a Boolean circuit over groups of four planes and the permutation layer is a plain
+re-indexing of the plane list. Any number of blocks can be processed in one pass, the lanes
+are only limited by the size of Python integers.
+
+USAGE EXAMPLE:
+---------------
+>>> from present.pyPresent import generateRoundkeys80, PBox
+>>> roundkeys = generateRoundkeys80(0, 32)
+>>> ['%016x' % c for c in encryptStates([0, 0], roundkeys, PBox)]
+['5579c1387b228445', '5579c1387b228445']
+"""
+
+
+def sliceStates(states, width=64):
+    """Transpose integer states into bit-planes
+
+    Input:  list of N integers of `width` bits
+    Output: list of `width` N-bit integers, plane i holds bit i of every state"""
+    if not states:
+        return [0] * width
+    bits = ''.join([format(state, '0%db' % width) for state in states])
+    return [int(bits[width - 1 - i::width][::-1], 2) for i in xrange(width)]
+
+
+def unsliceStates(planes, count):
+    """Transpose bit-planes back into integer states
+
+    Input:  list of bit-planes, number of states N
+    Output: list of N integers"""
+    if not count:
+        return []
+    columns = [format(plane, '0%db' % count)[::-1] for plane in reversed(planes)]
+    return [int(''.join(bits), 2) for bits in zip(*columns)]
+
+
+def keyPlanes(roundkey, mask, width=64):
+    """Spread one roundkey over all lanes
+
+    Input:  roundkey as integer, lane mask (2 ** N - 1)
+    Output: list of `width` bit-planes"""
+    return [mask if (roundkey >> i) & 1 else 0 for i in xrange(width)]
+
+
+def sBoxPlanes(planes, mask):
+    """SBox circuit applied to every nibble of every lane"""
+    output = []
+    for i in xrange(0, len(planes), 4):
+        b0, b1, b2, b3 = planes[i:i + 4]
+        t1 = b1 ^ b2
+        t2 = b2 & t1
+        t3 = b3 ^ t2
+        o0 = b0 ^ t3
+        t2 = t1 & t3
+        t1 ^= o0
+        t2 ^= b2
+        o1 = t1 ^ (b0 | t2)
+        t2 ^= b0 ^ mask
+        o3 = o1 ^ t2
+        o2 = t3 ^ (t2 | t1)
+        output.extend((o0, o1, o2, o3))
+    return output
+
+
+def sBoxPlanes_dec(planes, mask):
+    """Inverse SBox circuit applied to every nibble of every lane"""
+    output = []
+    for i in xrange(0, len(planes), 4):
+        b0, b1, b2, b3 = planes[i:i + 4]
+        b01 = b0 & b1
+        b02 = b0 & b2
+        b13 = b1 & b3
+        b012 = b01 & b2
+        b013 = b0 & b13
+        b023 = b02 & b3
+        t = b3 ^ b013 ^ b023
+        u = b012 ^ b02
+        o0 = b0 ^ b2 ^ b13 ^ mask
+        o1 = t ^ u ^ b0 ^ b1 ^ b13 ^ (b2 & b3)
+        o2 = t ^ u ^ b01 ^ (b1 & b2) ^ (b0 & b3) ^ b13 ^ mask
+        o3 = t ^ b013 ^ b012 ^ b01 ^ b0 ^ b1 ^ b2
+        output.extend((o0, o1, o2, o3))
+    return output
+
+
+def encryptPlanes(planes, roundkey_planes, pbox, mask):
+    """Encrypt bit-planes
+
+    Input:  bit-planes, list of per-round key planes (K1 ... Kn), PBox, lane mask
+    Output: bit-planes"""
+    pbox_inv = [pbox.index(x) for x in xrange(len(pbox))]
+    for key in roundkey_planes[:-1]:
+        planes = sBoxPlanes([p ^ k for p, k in zip(planes, key)], mask)
+        planes = [planes[i] for i in pbox_inv]
+    return [p ^ k for p, k in zip(planes, roundkey_planes[-1])]
+
+
+def decryptPlanes(planes, roundkey_planes, pbox, mask):
+    """Decrypt bit-planes
+
+    Input:  bit-planes, list of per-round key planes (K1 ... Kn), PBox, lane mask
+    Output: bit-planes"""
+    for key in reversed(roundkey_planes[1:]):
+        planes = [p ^ k for p, k in zip(planes, key)]
+        planes = sBoxPlanes_dec([planes[i] for i in pbox], mask)
+    return [p ^ k for p, k in zip(planes, roundkey_planes[0])]
+
+
+def encryptStates(states, roundkeys, pbox):
+    """Encrypt many integer states under one key schedule
+
+    Input:  list of integer states, list of roundkeys, PBox of the cipher
+    Output: list of integer states"""
+    width = len(pbox)
+    mask = (1 << len(states)) - 1
+    key_planes = [keyPlanes(roundkey, mask, width) for roundkey in roundkeys]
+    planes = encryptPlanes(sliceStates(states, width), key_planes, pbox, mask)
+    return unsliceStates(planes, len(states))
+
+
+def decryptStates(states, roundkeys, pbox):
+    """Decrypt many integer states under one key schedule
+
+    Input:  list of integer states, list of roundkeys, PBox of the cipher
+    Output: list of integer states"""
+    width = len(pbox)
+    mask = (1 << len(states)) - 1
+    key_planes = [keyPlanes(roundkey, mask, width) for roundkey in roundkeys]
+    planes = decryptPlanes(sliceStates(states, width), key_planes, pbox, mask)
+    return unsliceStates(planes, len(states))
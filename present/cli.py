@@ -0,0 +1,243 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" The present command: encrypt, decrypt or MAC files and streams
+
+Input files are memory-mapped and processed in fixed-size chunks by a three stage pipeline:
+a reader thread slices the input, the main thread runs the cipher and a writer thread writes
+the output. The stages are connected by bounded queues, so at most (2 * queue depth + 1)
+chunks are held in memory whatever the input size, and file I/O overlaps the cipher work.
+'-' (the default) reads stdin or writes stdout.
+
+Without --iv, encryption draws a random IV and writes it in front of the ciphertext, and
+decryption takes the IV from the first block of its input.
+
+USAGE EXAMPLE:
+---------------
+    present encrypt --key 00000000000000000000 --mode ctr archive.tar -o archive.tar.enc
+    present decrypt --key 00000000000000000000 --mode ctr archive.tar.enc -o archive.tar
+    cat archive.tar | present mac --key 0xBEEF --iv 21313
+"""
+import argparse
+import mmap
+import os
+import stat
+import sys
+import threading
+import time
+from Queue import Queue, Empty, Full
+
+from present import modes
+from present.pyPresent import Present
+
+MODES = {'ecb': modes.ECB, 'cbc': modes.CBC, 'ctr': modes.CTR, 'ofb': modes.OFB, 'cfb': modes.CFB}
+
+# bytes per chunk, a multiple of the PRESENT block size
+CHUNK_SIZE = 1 << 20
+# chunks buffered between two pipeline stages
+QUEUE_DEPTH = 4
+
+_DONE = object()
+
+
+def read_chunks(input_file, chunk_size=CHUNK_SIZE):
+    """Yield the contents of an open file from its current position in chunks, through mmap for regular files"""
+    info = os.fstat(input_file.fileno())
+    if not stat.S_ISREG(info.st_mode):
+        while True:
+            chunk = input_file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    start = input_file.tell()
+    if start >= info.st_size:
+        return
+    mapping = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for offset in xrange(start, info.st_size, chunk_size):
+            yield mapping[offset:offset + chunk_size]
+    finally:
+        mapping.close()
+
+
+class _Stage(threading.Thread):
+    """Pipeline thread that remembers the exception it died with"""
+
+    def __init__(self, target):
+        threading.Thread.__init__(self, target=self._guard, args=(target,))
+        self.daemon = True
+        self.error = None
+
+    def _guard(self, target):
+        try:
+            target()
+        except BaseException:
+            self.error = sys.exc_info()
+
+
+def run_pipeline(chunks, context, write, depth=QUEUE_DEPTH):
+    """Feed chunks through context.update/finalize into write, reader and writer in threads
+
+    chunks:  iterable of raw strings, consumed by the reader thread
+    context: object with update(data) and finalize() returning raw strings
+    write:   called by the writer thread with every non-empty output string
+    Output:  (input bytes, output bytes)"""
+    inputs, outputs = Queue(depth), Queue(depth)
+    stop = threading.Event()
+    counts = {'in': 0, 'out': 0}
+
+    def put(queue, item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            for chunk in chunks:
+                if not put(inputs, chunk):
+                    return
+        finally:
+            put(inputs, _DONE)
+
+    def writer():
+        while True:
+            data = outputs.get()
+            if data is _DONE:
+                return
+            write(data)
+            counts['out'] += len(data)
+
+    reader_thread, writer_thread = _Stage(reader), _Stage(writer)
+    reader_thread.start()
+    writer_thread.start()
+    try:
+        while True:
+            try:
+                chunk = inputs.get(timeout=0.1)
+            except Empty:
+                if writer_thread.error:
+                    break
+                continue
+            if chunk is _DONE:
+                break
+            counts['in'] += len(chunk)
+            output = context.update(chunk)
+            if output and not put(outputs, output):
+                break
+            if writer_thread.error:
+                break
+        for stage in (reader_thread, writer_thread):
+            if stage.error:
+                raise stage.error[0], stage.error[1], stage.error[2]
+        output = context.finalize()
+        if output:
+            put(outputs, output)
+        put(outputs, _DONE)
+        writer_thread.join()
+        if writer_thread.error:
+            raise writer_thread.error[0], writer_thread.error[1], writer_thread.error[2]
+    finally:
+        stop.set()
+        # a reader waiting on a full queue sees stop within one put timeout; one blocked on
+        # a read of stdin is left behind as a daemon thread
+        reader_thread.join(1.0)
+    return counts['in'], counts['out']
+
+
+class _MacContext(object):
+    """update/finalize adapter around a GMACStream, finalize gives the hex tag"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def update(self, data):
+        self._stream.update(data)
+        return ''
+
+    def finalize(self):
+        return self._stream.hexdigest() + '\n'
+
+
+def _open(path, flags):
+    if path == '-':
+        return os.fdopen(os.dup((sys.stdin if 'r' in flags else sys.stdout).fileno()), flags)
+    return open(path, flags)
+
+
+def _cipher_context(args, input_file, output_file):
+    cipher = Present(args.key.decode('hex'), args.rounds)
+    mode = MODES[args.mode]
+    iv = None
+    if mode.needs_iv:
+        if args.iv is not None:
+            iv = args.iv.decode('hex')
+        elif args.command == 'encrypt':
+            iv = os.urandom(cipher.get_block_size())
+            output_file.write(iv)
+        else:
+            iv = input_file.read(cipher.get_block_size())
+    mode = mode(cipher, iv)
+    return mode.encryptor() if args.command == 'encrypt' else mode.decryptor()
+
+
+def _run(args):
+    with _open(args.input, 'rb') as input_file:
+        with _open(args.output, 'wb') as output_file:
+            if args.command == 'mac':
+                from gmac.pyGMAC import GMAC
+                context = _MacContext(GMAC.new(int(args.key, 0), int(args.iv or '0', 0)))
+            else:
+                context = _cipher_context(args, input_file, output_file)
+            chunks = read_chunks(input_file, args.chunk_size)
+            started = time.time()
+            read, written = run_pipeline(chunks, context, output_file.write, args.queue_depth)
+            elapsed = max(time.time() - started, 1e-9)
+    if not args.quiet:
+        sys.stderr.write("%s: %d bytes in, %d bytes out, %.2f s, %.2f MiB/s\n" %
+                         (args.command, read, written, elapsed, read / elapsed / (1 << 20)))
+
+
+def _chunk_size(value):
+    size = int(value)
+    if size <= 0 or size % 8:
+        raise argparse.ArgumentTypeError("chunk size must be a positive multiple of 8")
+    return size
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='present', description="PRESENT file encryption and GMAC")
+    commands = parser.add_subparsers(dest='command')
+    for command in ('encrypt', 'decrypt', 'mac'):
+        if command == 'mac':
+            sub = commands.add_parser(command, help="GMAC tag of the input (MiniPresent, 16-bit key)")
+            sub.add_argument('--key', required=True, help="16-bit key as integer, e.g. 48879 or 0xBEEF")
+            sub.add_argument('--iv', help="IV as integer, 0 by default")
+        else:
+            sub = commands.add_parser(command, help="%s with PRESENT" % command)
+            sub.add_argument('--key', required=True, help="80-bit or 128-bit key as hex")
+            sub.add_argument('--iv', help="IV as 16 hex digits, read from / written to the data by default")
+            sub.add_argument('--mode', choices=sorted(MODES), default='ctr')
+            sub.add_argument('--rounds', type=int, default=32)
+        sub.add_argument('input', nargs='?', default='-', help="input file, '-' for stdin")
+        sub.add_argument('-o', '--output', default='-', help="output file, '-' for stdout")
+        sub.add_argument('--chunk-size', type=_chunk_size, default=CHUNK_SIZE)
+        sub.add_argument('--queue-depth', type=int, default=QUEUE_DEPTH)
+        sub.add_argument('-q', '--quiet', action='store_true', help="no throughput report")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        _run(args)
+    except (ValueError, TypeError, IOError) as error:
+        sys.stderr.write("present: error: %s\n" % error)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Memory-mapped on-disk store of the full MiniPresent codebook
+
+File layout (big-endian header, padded to one page so the tables are page aligned):
+    magic 'MPCB', format version, rounds, key bits, block bits, offsets of both tables
+    encryption table: 2^16 rows (keys) x 2^8 columns (plaintexts), one byte per ciphertext
+    decryption table: 2^16 rows (keys) x 2^8 columns (ciphertexts), one byte per plaintext
+The file is opened read-only with mmap, so lookups only touch the pages they need and every
+process opening the same file shares one page-cached copy. With NumPy the tables are exposed
+as arrays backed by the mapping.
+
+USAGE EXAMPLE:
+---------------
+>>> import os, tempfile
+>>> from present.miniPresent import MiniPresent
+>>> path = os.path.join(tempfile.mkdtemp(), 'codebook.bin')
+>>> store = CodebookStore.create(path)
+>>> store.encrypt(0xBEEF, 42) == MiniPresent(0xBEEF).encrypt(42)
+True
+>>> store.decrypt(0xBEEF, store.encrypt(0xBEEF, 42))
+42
+>>> 0xBEEF in store.keys_mapping(42, store.encrypt(0xBEEF, 42))
+True
+>>> store.close()
+"""
+import mmap
+import os
+import struct
+
+from present._compat import numpy
+from present.miniPresent import MiniPresent, generateRoundkeys16
+
+MAGIC = 'MPCB'
+VERSION = 1
+HEADER = struct.Struct('>4sHHHHQQ')
+HEADER_SIZE = 4096
+
+KEYS_AMOUNT = 1 << 16
+BLOCKS_AMOUNT = 1 << 8
+TABLE_SIZE = KEYS_AMOUNT * BLOCKS_AMOUNT
+
+
+def _tableRows(rounds):
+    """Yield (encryption row, decryption row) raw strings for every key in order"""
+    if numpy is not None:
+        from present import keyspace
+        table = keyspace.codebook(rounds)
+        inverse = keyspace.inverseCodebook(table)
+        step = 4096
+        for start in xrange(0, KEYS_AMOUNT, step):
+            yield table[start:start + step].tostring(), inverse[start:start + step].tostring()
+    else:
+        for key in xrange(KEYS_AMOUNT):
+            codebooks = MiniPresent.from_roundkeys(generateRoundkeys16(key, rounds))._get_codebooks()
+            yield codebooks[2], codebooks[3]
+
+
+def write_codebook(path, rounds=4):
+    """Compute the full codebook for the given number of rounds and write it to path
+
+    The file is written next to path and renamed into place, so readers never see a
+    partial file."""
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    with open(temporary, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, VERSION, rounds, 16, 8, HEADER_SIZE, HEADER_SIZE + TABLE_SIZE)
+                     .ljust(HEADER_SIZE, '\x00'))
+        decryption = []
+        for encryption_rows, decryption_rows in _tableRows(rounds):
+            output.write(encryption_rows)
+            decryption.append(decryption_rows)
+        output.write(''.join(decryption))
+    os.rename(temporary, path)
+
+
+def _checkRange(value, amount, name):
+    if not 0 <= value < amount:
+        raise ValueError("%s must be in range(%d), got %r" % (name, amount, value))
+
+
+class CodebookStore(object):
+    def __init__(self, path):
+        """Open a codebook file written by write_codebook
+
+        path: file name
+        """
+        with open(path, 'rb') as codebook_file:
+            self._mmap = mmap.mmap(codebook_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rounds, key_bits, block_bits, self._encryption, self._decryption = \
+            HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or (key_bits, block_bits) != (16, 8):
+            self._mmap.close()
+            raise ValueError("%s is not a MiniPresent codebook of version %d: found magic %r, version %d"
+                             % (path, VERSION, magic, version))
+        if len(self._mmap) < self._decryption + TABLE_SIZE:
+            self._mmap.close()
+            raise ValueError("%s is truncated" % path)
+        self.encryption_table = self.decryption_table = None
+        if numpy is not None:
+            # numpy.memmap keeps its own mapping alive for as long as the arrays are referenced
+            self.encryption_table = numpy.memmap(path, numpy.uint8, 'r', self._encryption,
+                                                 (KEYS_AMOUNT, BLOCKS_AMOUNT))
+            self.decryption_table = numpy.memmap(path, numpy.uint8, 'r', self._decryption,
+                                                 (KEYS_AMOUNT, BLOCKS_AMOUNT))
+
+    @classmethod
+    def create(cls, path, rounds=4):
+        """Open the codebook at path, computing and writing it first if needed"""
+        if not os.path.exists(path):
+            write_codebook(path, rounds)
+        store = cls(path)
+        if store.rounds != rounds:
+            store.close()
+            raise ValueError("%s holds a %d-round codebook, %d rounds requested" % (path, store.rounds, rounds))
+        return store
+
+    def encrypt(self, key, plaintext):
+        return ord(self._mmap[self._position(self._encryption, key, plaintext)])
+
+    def decrypt(self, key, ciphertext):
+        return ord(self._mmap[self._position(self._decryption, key, ciphertext)])
+
+    def encryption_row(self, key):
+        """Ciphertexts of every plaintext under key, as a raw string of 256 bytes"""
+        start = self._position(self._encryption, key)
+        return self._mmap[start:start + BLOCKS_AMOUNT]
+
+    def decryption_row(self, key):
+        """Plaintexts of every ciphertext under key, as a raw string of 256 bytes"""
+        start = self._position(self._decryption, key)
+        return self._mmap[start:start + BLOCKS_AMOUNT]
+
+    def _position(self, table, key, block=0):
+        """Offset of the entry of (key, block) in the table starting at offset table
+
+        Raises ValueError for keys or blocks out of range, which would read another entry"""
+        _checkRange(key, KEYS_AMOUNT, 'key')
+        _checkRange(block, BLOCKS_AMOUNT, 'block')
+        return table + (key << 8) + block
+
+    def encryption_column(self, plaintext):
+        """Ciphertexts of plaintext under every key, as a raw string of 65536 bytes"""
+        _checkRange(plaintext, BLOCKS_AMOUNT, 'plaintext')
+        if self.encryption_table is not None:
+            return self.encryption_table[:, plaintext].tostring()
+        start = self._encryption + plaintext
+        return self._mmap[start:start + TABLE_SIZE:BLOCKS_AMOUNT]
+
+    def keys_mapping(self, plaintext, ciphertext):
+        """Every key that encrypts plaintext to ciphertext"""
+        _checkRange(plaintext, BLOCKS_AMOUNT, 'plaintext')
+        if self.encryption_table is not None:
+            return numpy.flatnonzero(self.encryption_table[:, plaintext] == ciphertext).tolist()
+        column = self.encryption_column(plaintext)
+        target = chr(ciphertext)
+        keys = []
+        key = column.find(target)
+        while key != -1:
+            keys.append(key)
+            key = column.find(target, key + 1)
+        return keys
+
+    def close(self):
+        self.encryption_table = self.decryption_table = None
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
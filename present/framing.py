@@ -0,0 +1,138 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Encrypted, optionally authenticated frames over a byte stream
+
+Every frame is
+    length (4 bytes, big-endian) | PRESENT-CTR ciphertext | GMAC tag (2 bytes, only with a MAC key)
+One CTR keystream runs across all frames of a direction: frame i is encrypted from the
+counter block following the last block used by frame i - 1, so both ends only have to
+process the frames in order. All blocks of a frame are encrypted in one encrypt_blocks call.
+The tag is a GMAC (MiniPresent) over the length and the ciphertext, its IV is the frame
+number (mod 2^16 - 1, plus 1), counted from the initial counter block.
+
+A (key, iv) pair must never be used for two streams: both would encrypt with the same CTR
+keystream. Connections sharing a configured key and IV derive their own counter block with
+session_iv from a random nonce (new_nonce) the client sends first, as present.aio does.
+
+FrameEncoder and FrameDecoder are plain objects without I/O, see present.aio for the
+asyncio stream adapter.
+
+USAGE EXAMPLE:
+---------------
+>>> key = "00000000000000000000".decode('hex')
+>>> iv = "0000000000000000".decode('hex')
+>>> encoder, decoder = FrameEncoder(key, iv, mac_key=0xBEEF), FrameDecoder(key, iv, mac_key=0xBEEF)
+>>> frame = encoder.seal("attack at dawn")
+>>> decoder.body_length(frame[:HEADER.size])
+16
+>>> decoder.open(frame[:HEADER.size], frame[HEADER.size:])
+'attack at dawn'
+"""
+import os
+import struct
+
+from present.modes import CTR, xorStrings
+from present.pyPresent import Present, string2number, number2string_N
+
+HEADER = struct.Struct('>I')
+# largest accepted frame payload in bytes
+MAX_FRAME_SIZE = 1 << 24
+
+BLOCK_SIZE = 8
+_COUNTER_MODULUS = 1 << (8 * BLOCK_SIZE)
+# bytes of the nonce sent in the clear at the start of a connection
+NONCE_SIZE = BLOCK_SIZE
+
+
+def new_nonce():
+    """Random connection nonce, see session_iv"""
+    return os.urandom(NONCE_SIZE)
+
+
+def session_iv(iv, nonce):
+    """Initial counter block of one connection: the configured iv XOR the connection's random nonce
+
+    Connections with different nonces start their keystreams at unrelated counter blocks."""
+    if len(nonce) != NONCE_SIZE:
+        raise ValueError("Nonce must be a raw string of %d bytes" % NONCE_SIZE)
+    return xorStrings(str(iv), str(nonce))
+
+
+def peer_iv(iv):
+    """Initial counter block of the other direction of a connection: iv with its top bit flipped"""
+    iv = str(iv)
+    return chr(ord(iv[0]) ^ 0x80) + iv[1:]
+
+
+class _FrameCodec(object):
+    def __init__(self, key, iv, mac_key=None, rounds=32, max_frame_size=MAX_FRAME_SIZE):
+        """Shared state of a frame direction
+
+        key:            PRESENT key as 80-bit or 128-bit rawstring
+        iv:             initial counter block as 8-byte rawstring, never reused with the same key
+        mac_key:        16-bit GMAC key as integer, None for frames without tags
+        max_frame_size: largest payload accepted, in bytes
+        """
+        if len(iv) != BLOCK_SIZE:
+            raise ValueError("IV must be a raw string of %d bytes" % BLOCK_SIZE)
+        self.cipher = Present(key, rounds)
+        self.max_frame_size = max_frame_size
+        self._counter = string2number(iv)
+        self._frames = self._counter % 0xFFFF
+        self._gmac = None
+        self.tag_size = 0
+        if mac_key is not None:
+            from gmac.pyGMAC import GMAC
+            self._gmac = GMAC(mac_key)
+            self.tag_size = (self._gmac._field_degree + 7) // 8
+
+    def _crypt(self, data):
+        """CTR over data from the current counter, then move past the blocks used"""
+        output = CTR(self.cipher, number2string_N(self._counter, BLOCK_SIZE)).encrypt(data)
+        self._counter = (self._counter + (len(data) + BLOCK_SIZE - 1) // BLOCK_SIZE) % _COUNTER_MODULUS
+        return output
+
+    def _tag(self, header, ciphertext):
+        from gmac.pyGMAC import GMACStream
+        IV = self._frames % 0xFFFF + 1
+        self._frames += 1
+        return GMACStream(self._gmac, IV, header + ciphertext)
+
+
+class FrameEncoder(_FrameCodec):
+    def seal(self, data):
+        """Encrypt (and tag) one frame
+
+        Input:  payload as raw string (or bytearray/memoryview)
+        Output: the whole frame as raw string"""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        data = str(data)
+        if len(data) > self.max_frame_size:
+            raise ValueError("Frame of %d bytes exceeds the limit of %d" % (len(data), self.max_frame_size))
+        header = HEADER.pack(len(data))
+        ciphertext = self._crypt(data)
+        if self._gmac is None:
+            return header + ciphertext
+        return header + ciphertext + self._tag(header, ciphertext).digest()
+
+
+class FrameDecoder(_FrameCodec):
+    def body_length(self, header):
+        """Bytes following the header of a frame: ciphertext and tag"""
+        length, = HEADER.unpack(header)
+        if length > self.max_frame_size:
+            raise ValueError("Frame of %d bytes exceeds the limit of %d" % (length, self.max_frame_size))
+        return length + self.tag_size
+
+    def open(self, header, body):
+        """Check the tag of and decrypt one frame, raise ValueError if the tag does not match
+
+        Input:  header and body (body_length(header) bytes) as raw strings
+        Output: payload as raw string"""
+        if len(body) != self.body_length(header):
+            raise ValueError("Frame body must be %d bytes, got %d" % (self.body_length(header), len(body)))
+        ciphertext = body[:len(body) - self.tag_size]
+        if self._gmac is not None:
+            self._tag(header, ciphertext).verify(body[len(ciphertext):])
+        return self._crypt(ciphertext)
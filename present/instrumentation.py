@@ -0,0 +1,317 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Counters and timing histograms for PRESENT, MiniPresent and GMAC
+
+enable() replaces the instrumented functions and methods (see TARGETS) with counting
+wrappers, and with timing wrappers when timing=True; disable() puts the originals back.
+While disabled nothing is wrapped, so the instrumented code runs exactly as without
+this module. Module functions are also replaced in every loaded present/gmac module that
+imported them by name (e.g. present.modes imports string2number from pyPresent).
+
+A call made while another instrumented call with the same counter and labels runs on the
+same thread is counted by the outer call only, so encrypt_array falling back to
+encrypt_blocks without NumPy counts its blocks once.
+
+Functions an engine has already bound are not affected: the table and compiled engines
+never call sBoxLayer/pLayer, so those stages only show up with engine='reference'.
+
+USAGE EXAMPLE:
+---------------
+>>> from present.pyPresent import Present
+>>> enable()
+>>> Present("00000000000000000000".decode('hex')).encrypt_blocks(["\\x00" * 8] * 3)[0].encode('hex')
+'5579c1387b228445'
+>>> disable()
+>>> snapshot()['counters']['present_blocks_total{cipher="present",op="encrypt"}']
+3
+>>> 'present_blocks_total{cipher="present",op="encrypt"} 3' in to_prometheus()
+True
+>>> reset()
+"""
+import json
+import sys
+import threading
+import time
+
+# upper bounds of the timing histogram buckets, in seconds
+BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 0.1, 1.0)
+
+STAGE_SECONDS = 'present_stage_seconds'
+
+
+def _blocks(data):
+    """Number of 8-byte blocks in a buffer or NumPy array"""
+    size = getattr(data, 'nbytes', None)
+    if size is None:
+        size = len(data) * getattr(data, 'itemsize', 1)
+    return size // 8
+
+
+# (module, class name or None, attribute, stage, counter, labels, count function of the call arguments or None)
+TARGETS = [
+    ('present.pyPresent', 'Present', 'encrypt', 'present.encrypt', 'present_blocks_total',
+     (('cipher', 'present'), ('op', 'encrypt')), None),
+    ('present.pyPresent', 'Present', 'decrypt', 'present.decrypt', 'present_blocks_total',
+     (('cipher', 'present'), ('op', 'decrypt')), None),
+    ('present.pyPresent', 'Present', 'encrypt_blocks', 'present.encrypt_blocks', 'present_blocks_total',
+     (('cipher', 'present'), ('op', 'encrypt')), lambda self, blocks: len(blocks)),
+    ('present.pyPresent', 'Present', 'decrypt_blocks', 'present.decrypt_blocks', 'present_blocks_total',
+     (('cipher', 'present'), ('op', 'decrypt')), lambda self, blocks: len(blocks)),
+    ('present.pyPresent', 'Present', 'encrypt_into', 'present.encrypt_into', 'present_blocks_total',
+     (('cipher', 'present'), ('op', 'encrypt')), lambda self, src, dst: _blocks(src)),
+    ('present.pyPresent', 'Present', 'decrypt_into', 'present.decrypt_into', 'present_blocks_total',
+     (('cipher', 'present'), ('op', 'decrypt')), lambda self, src, dst: _blocks(src)),
+    ('present.pyPresent', 'Present', 'encrypt_array', 'present.encrypt_array', 'present_blocks_total',
+     (('cipher', 'present'), ('op', 'encrypt')), lambda self, data: _blocks(data)),
+    ('present.pyPresent', 'Present', 'decrypt_array', 'present.decrypt_array', 'present_blocks_total',
+     (('cipher', 'present'), ('op', 'decrypt')), lambda self, data: _blocks(data)),
+    ('present.pyPresent', None, 'sBoxLayer', 'present.sBoxLayer', 'present_layer_calls_total',
+     (('cipher', 'present'), ('layer', 'sBoxLayer')), None),
+    ('present.pyPresent', None, 'pLayer', 'present.pLayer', 'present_layer_calls_total',
+     (('cipher', 'present'), ('layer', 'pLayer')), None),
+    ('present.pyPresent', None, 'sBoxLayer_dec', 'present.sBoxLayer_dec', 'present_layer_calls_total',
+     (('cipher', 'present'), ('layer', 'sBoxLayer_dec')), None),
+    ('present.pyPresent', None, 'pLayer_dec', 'present.pLayer_dec', 'present_layer_calls_total',
+     (('cipher', 'present'), ('layer', 'pLayer_dec')), None),
+    ('present.pyPresent', None, 'string2number', 'string2number', 'present_conversions_total',
+     (('function', 'string2number'),), None),
+    ('present.pyPresent', None, 'number2string_N', 'number2string_N', 'present_conversions_total',
+     (('function', 'number2string_N'),), None),
+    ('present.keycache', 'KeyScheduleCache', 'get', 'key_schedule', None, (), None),
+    ('present.miniPresent', 'MiniPresent', 'encrypt', 'minipresent.encrypt', 'present_blocks_total',
+     (('cipher', 'minipresent'), ('op', 'encrypt')), None),
+    ('present.miniPresent', 'MiniPresent', 'decrypt', 'minipresent.decrypt', 'present_blocks_total',
+     (('cipher', 'minipresent'), ('op', 'decrypt')), None),
+    ('present.miniPresent', 'MiniPresent', 'encrypt_bytes', 'minipresent.encrypt_bytes', 'present_blocks_total',
+     (('cipher', 'minipresent'), ('op', 'encrypt')), lambda self, data: len(data)),
+    ('present.miniPresent', 'MiniPresent', 'decrypt_bytes', 'minipresent.decrypt_bytes', 'present_blocks_total',
+     (('cipher', 'minipresent'), ('op', 'decrypt')), lambda self, data: len(data)),
+    ('present.miniPresent', None, 'sBoxLayer', 'minipresent.sBoxLayer', 'present_layer_calls_total',
+     (('cipher', 'minipresent'), ('layer', 'sBoxLayer')), None),
+    ('present.miniPresent', None, 'pLayer', 'minipresent.pLayer', 'present_layer_calls_total',
+     (('cipher', 'minipresent'), ('layer', 'pLayer')), None),
+    ('gmac.pyGMAC', 'GMAC', 'generate', 'gmac.generate', 'gmac_operations_total',
+     (('operation', 'generate'),), None),
+    ('gmac.pyGMAC', 'GMAC', '_gHash', 'gmac.gHash', 'gmac_operations_total',
+     (('operation', 'gHash'),), None),
+    ('gmac.pyGMAC', 'GMAC', '_GCTR', 'gmac.GCTR', 'gmac_operations_total',
+     (('operation', 'GCTR'),), None),
+    ('gmac.pyGMAC', 'GMACStream', 'update', 'gmac.stream_update', 'gmac_stream_bytes_total',
+     (), lambda self, data: len(data)),
+]
+
+
+def _key(name, labels):
+    if not labels:
+        return name
+    return '%s{%s}' % (name, ','.join('%s="%s"' % label for label in labels))
+
+
+class Registry(object):
+    """Thread-safe counters and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, seconds):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                # one count per bucket plus +Inf, then sum and count
+                histogram = self.histograms[(name, labels)] = [0] * (len(BUCKETS) + 1) + [0.0, 0]
+            bucket = 0
+            while bucket < len(BUCKETS) and seconds > BUCKETS[bucket]:
+                bucket += 1
+            histogram[bucket] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters), dict((key, list(value)) for key, value in self.histograms.items())
+
+
+registry = Registry()
+
+_lock = threading.Lock()
+# (owner, attribute, original value) of every replaced attribute, restored by disable
+_patches = []
+_timing = False
+# per thread: (counter, labels) of the counting wrappers currently running
+_running = threading.local()
+
+
+def _counting(function, counter, labels, count):
+    inc = registry.inc
+    if counter is None:
+        return function
+    key = (counter, labels)
+
+    def wrapper(*args, **kwds):
+        running = getattr(_running, 'keys', None)
+        if running is None:
+            running = _running.keys = set()
+        if key in running:
+            # nested in a call that already counted these operations
+            return function(*args, **kwds)
+        inc(counter, labels, 1 if count is None else count(*args, **kwds))
+        running.add(key)
+        try:
+            return function(*args, **kwds)
+        finally:
+            running.discard(key)
+
+    return wrapper
+
+
+def _keySchedule(function, timing):
+    """Wrapper of KeyScheduleCache.get: key setups are cache misses, labelled by schedule"""
+    inc, observe, clock = registry.inc, registry.observe, time.time
+
+    def wrapper(cache, generator, key, rounds, *args):
+        misses = cache.misses
+        start = clock()
+        roundkeys = function(cache, generator, key, rounds, *args)
+        labels = (('schedule', generator.__name__),)
+        if cache.misses != misses:
+            inc('present_key_setups_total', labels)
+            if timing:
+                observe(STAGE_SECONDS, (('stage', 'key_schedule'),), clock() - start)
+        else:
+            inc('present_key_cache_hits_total', labels)
+        return roundkeys
+
+    return wrapper
+
+
+def _timed(function, stage):
+    observe, clock = registry.observe, time.time
+    labels = (('stage', stage),)
+
+    def wrapper(*args, **kwds):
+        start = clock()
+        try:
+            return function(*args, **kwds)
+        finally:
+            observe(STAGE_SECONDS, labels, clock() - start)
+
+    return wrapper
+
+
+def _replace(owner, attribute, value):
+    _patches.append((owner, attribute, getattr(owner, '__dict__', {}).get(attribute, getattr(owner, attribute))))
+    setattr(owner, attribute, value)
+
+
+def enable(timing=False):
+    """Start counting (and timing with timing=True), replacing every instrumented function"""
+    global _timing
+    with _lock:
+        if _patches:
+            if timing == _timing:
+                return
+            _disable()
+        _timing = timing
+        for module_name, class_name, attribute, stage, counter, labels, count in TARGETS:
+            __import__(module_name)
+            module = sys.modules[module_name]
+            owner = getattr(module, class_name) if class_name else module
+            original = owner.__dict__[attribute]
+            if class_name == 'KeyScheduleCache':
+                wrapper = _keySchedule(original, timing)
+            else:
+                wrapper = _counting(original, counter, labels, count)
+                if timing:
+                    wrapper = _timed(wrapper, stage)
+            _replace(owner, attribute, wrapper)
+            if class_name is None:
+                # modules that imported the function by name
+                for name, other in sys.modules.items():
+                    if other is not None and other is not module and name.split('.')[0] in ('present', 'gmac') \
+                            and getattr(other, attribute, None) is original:
+                        _replace(other, attribute, wrapper)
+
+
+def _disable():
+    while _patches:
+        owner, attribute, original = _patches.pop()
+        setattr(owner, attribute, original)
+
+
+def disable():
+    """Stop instrumenting, restoring the original functions; collected data is kept"""
+    with _lock:
+        _disable()
+
+
+def is_enabled():
+    return bool(_patches)
+
+
+def reset():
+    registry.reset()
+
+
+def snapshot():
+    """Collected data as a dict
+
+    Output: {'counters': {metric: value}, 'histograms': {metric: {'buckets': {le: cumulative count},
+             'sum': seconds, 'count': n}}, 'key_cache': key_schedule_cache.cache_info() as dict}"""
+    from present.keycache import key_schedule_cache
+    counters, histograms = registry.snapshot()
+    result = {
+        'counters': dict((_key(name, labels), value) for (name, labels), value in counters.items()),
+        'histograms': {},
+        'key_cache': dict(key_schedule_cache.cache_info()._asdict()),
+    }
+    for (name, labels), histogram in histograms.items():
+        buckets, total = {}, 0
+        for bound, bucket_count in zip([repr(bound) for bound in BUCKETS] + ['+Inf'], histogram[:-2]):
+            total += bucket_count
+            buckets[bound] = total
+        result['histograms'][_key(name, labels)] = {'buckets': buckets, 'sum': histogram[-2], 'count': histogram[-1]}
+    return result
+
+
+def to_json(data=None):
+    """Snapshot as JSON text"""
+    return json.dumps(snapshot() if data is None else data, indent=2, sort_keys=True)
+
+
+def to_prometheus():
+    """Snapshot in the Prometheus text exposition format"""
+    counters, histograms = registry.snapshot()
+    lines = []
+    for name in sorted(set(name for name, _ in counters)):
+        lines.append('# TYPE %s counter' % name)
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append('%s %s' % (_key(name, labels), value))
+    for name in sorted(set(name for name, _ in histograms)):
+        lines.append('# TYPE %s histogram' % name)
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            total = 0
+            for bound, bucket_count in zip([repr(bound) for bound in BUCKETS] + ['+Inf'], histogram[:-2]):
+                total += bucket_count
+                lines.append('%s %d' % (_key(name + '_bucket', labels + (('le', bound),)), total))
+            lines.append('%s %r' % (_key(name + '_sum', labels), histogram[-2]))
+            lines.append('%s %d' % (_key(name + '_count', labels), histogram[-1]))
+    from present.keycache import key_schedule_cache
+    info = key_schedule_cache.cache_info()
+    lines.append('# TYPE present_key_cache_entries gauge')
+    lines.append('present_key_cache_entries %d' % info.currsize)
+    return '\n'.join(lines) + '\n'
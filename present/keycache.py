@@ -0,0 +1,109 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Bounded, thread-safe LRU cache of key schedules
+
+Present and MiniPresent look their roundkeys up in key_schedule_cache instead of calling
+the key schedule generators every time, so rotating through a working set of keys pays the
+key setup once per key. Schedules are stored in the compact container given by the cipher
+(tuples by default) and shared by every cipher object built from the same (generator, key, rounds).
+Forms prepared from a schedule (decryption roundkeys, compiled round functions) are kept with
+it, see prepared.
+
+USAGE EXAMPLE:
+---------------
+>>> from present.pyPresent import generateRoundkeys80
+>>> cache = KeyScheduleCache(maxsize=2)
+>>> roundkeys = cache.get(generateRoundkeys80, 0, 32)
+>>> roundkeys is cache.get(generateRoundkeys80, 0, 32)
+True
+>>> cache.cache_info()
+CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+DEFAULT_MAXSIZE = 4096
+
+
+class _Entry(object):
+    """A cached schedule and the forms prepared from it, by name"""
+    __slots__ = ('roundkeys', 'prepared')
+
+    def __init__(self, roundkeys):
+        self.roundkeys = roundkeys
+        self.prepared = {}
+
+
+class KeyScheduleCache(object):
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        """Create a key schedule cache
+
+        maxsize: the maximum number of schedules kept, 0 disables caching
+        """
+        self._lock = threading.Lock()
+        self._schedules = OrderedDict()
+        self._maxsize = maxsize
+        self.hits = self.misses = 0
+
+    def get(self, generator, key, rounds, pack=tuple):
+        """Return the roundkeys of key, generating them on a miss
+
+        Input:  key schedule function (e.g. generateRoundkeys80), key as integer, rounds,
+                container the generated roundkeys are stored in (e.g. an array constructor)
+        Output: roundkeys as returned by pack, shared by every caller: do not modify"""
+        return self._entry(generator, key, rounds, pack).roundkeys
+
+    def prepared(self, generator, key, rounds, pack, name, prepare):
+        """Return a form prepared from the roundkeys of key, computing it once per cached schedule
+
+        Input:  generator, key, rounds, pack as for get, name of the prepared form,
+                function computing it from the roundkeys
+        Output: prepare(roundkeys), shared by every caller: do not modify
+        Finding the schedule is not counted as a hit, computing it again counts as a miss."""
+        entry = self._entry(generator, key, rounds, pack, False)
+        value = entry.prepared.get(name)
+        if value is None:
+            value = entry.prepared.setdefault(name, prepare(entry.roundkeys))
+        return value
+
+    def _entry(self, generator, key, rounds, pack, count_hit=True):
+        cache_key = (generator, key, rounds)
+        with self._lock:
+            entry = self._schedules.pop(cache_key, None)
+            if entry is not None:
+                self._schedules[cache_key] = entry
+                self.hits += count_hit
+                return entry
+            self.misses += 1
+        entry = _Entry(pack(generator(key, rounds)))
+        with self._lock:
+            if self._maxsize > 0:
+                self._schedules[cache_key] = entry
+                self._evict()
+        return entry
+
+    def resize(self, maxsize):
+        """Change the maximum number of schedules, evicting the least recently used ones"""
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Drop every schedule and reset the counters"""
+        with self._lock:
+            self._schedules.clear()
+            self.hits = self.misses = 0
+
+    def cache_info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self._maxsize, len(self._schedules))
+
+    def _evict(self):
+        while len(self._schedules) > max(self._maxsize, 0):
+            self._schedules.popitem(last=False)
+
+
+# the cache shared by Present and MiniPresent
+key_schedule_cache = KeyScheduleCache()
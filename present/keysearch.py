@@ -0,0 +1,305 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Known-plaintext key search for reduced-round PRESENT-80
+
+Searches the keys that agree with a base key outside a set of unknown bits and encrypt the
+known plaintexts to the known ciphertexts under the given number of rounds.
+
+The key schedule only mixes key bits non-linearly through the S-box on the top nibble of the
+key register, once per round. A key bit that does not reach that nibble before the last
+roundkey is linear: flipping it flips a fixed set of roundkey bits (its delta) whatever the
+other bits are. The unknown bits are split into
+    - lane bits: up to 2^LANE_BITS candidates encrypted together, one per bitslice lane;
+      the linear ones give constant per-lane key planes
+    - outer linear bits: enumerated in Gray code order, so the roundkeys of the next batch are
+      the roundkeys of the previous one XOR the delta of a single bit
+    - outer non-linear bits: every value gets its roundkeys from generateRoundkeys80
+Every batch encrypts the first plaintext in all lanes with the bitsliced round function and
+keeps the lanes that produce the first ciphertext; these keys are confirmed on the remaining
+pairs with the table engine.
+
+Batches are grouped into shards that run in a process pool. Finished shards and found keys
+are written to a JSON checkpoint periodically, and a restarted search skips the finished
+shards. Progress reports give the throughput in keys/s and the ETA.
+
+USAGE EXAMPLE:
+---------------
+>>> from present.pyPresent import encryptTable, generateRoundkeys80
+>>> key, rounds = 0x0123456789abcdef0123, 5
+>>> pairs = [(p, encryptTable(p, generateRoundkeys80(key, rounds))) for p in (0, 0xffffffffffffffff)]
+>>> search(key & ~0xfffff, 0xfffff, pairs, rounds, processes=1, progress=None) == [key]
+True
+
+    python -m present.keysearch --key 0123456789abcde00000 --unknown fffff --rounds 5 \\
+        --pair 0000000000000000:... --pair ffffffffffffffff:... --checkpoint search.json
+"""
+import argparse
+import sys
+
+from present import sharding
+from present.bitslice import keyPlanes, sBoxPlanes, sliceStates
+from present.pyPresent import PBox_inv, encryptTable, generateRoundkeys80
+
+KEY_BITS = 80
+BLOCK_BITS = 64
+
+# candidates encrypted together: 2^LANE_BITS bitslice lanes
+LANE_BITS = 12
+# candidates per shard handed to a worker
+SHARD_KEYS = 1 << 20
+
+
+def split_key_bits(rounds):
+    """Split the 80 key bits into linear and non-linear bits of the first rounds roundkeys
+
+    Output: (linear, nonlinear) as sorted lists of bit positions (0 is the least significant)"""
+    # original key bits each register position depends on
+    depends = [frozenset([bit]) for bit in xrange(KEY_BITS)]
+    nonlinear = set()
+    for _ in xrange(1, rounds):
+        # register rotated left by 61: new bit p is old bit p + 19
+        depends = [depends[(p + 19) % KEY_BITS] for p in xrange(KEY_BITS)]
+        sboxed = depends[76] | depends[77] | depends[78] | depends[79]
+        nonlinear |= sboxed
+        depends[76:80] = [sboxed] * 4
+    return sorted(set(xrange(KEY_BITS)) - nonlinear), sorted(nonlinear)
+
+
+def roundkey_deltas(bits, rounds):
+    """Roundkey differences of flipping every linear key bit
+
+    Output: {bit: [delta of K1, ..., delta of Kn]}"""
+    zero = generateRoundkeys80(0, rounds)
+    return dict((bit, [a ^ b for a, b in zip(zero, generateRoundkeys80(1 << bit, rounds))]) for bit in bits)
+
+
+def _deposit(value, positions):
+    """Scatter the bits of value to the given key bit positions"""
+    key = 0
+    for i, position in enumerate(positions):
+        if (value >> i) & 1:
+            key |= 1 << position
+    return key
+
+
+def _gray(index):
+    return index ^ (index >> 1)
+
+
+class KeySearch(object):
+    def __init__(self, base_key, unknown, pairs, rounds, lane_bits=LANE_BITS):
+        """Candidate keys and batch encryption of one search
+
+        base_key:  80-bit key as integer, its unknown bits are ignored
+        unknown:   mask of the unknown key bits as integer
+        pairs:     known (plaintext, ciphertext) pairs as 64-bit integers, at least one;
+                   the first filters, the others confirm
+        rounds:    number of rounds (roundkeys) of the cipher
+        lane_bits: up to 2^lane_bits candidates are encrypted together
+        """
+        if not pairs:
+            raise ValueError("At least one known plaintext/ciphertext pair is required")
+        self.rounds = rounds
+        self.pairs = [(int(p), int(c)) for p, c in pairs]
+        self.base_key = base_key & ~unknown & ((1 << KEY_BITS) - 1)
+        unknown_bits = [bit for bit in xrange(KEY_BITS) if (unknown >> bit) & 1]
+        linear, nonlinear = split_key_bits(rounds)
+        linear = [bit for bit in unknown_bits if bit in linear]
+        nonlinear = [bit for bit in unknown_bits if bit in nonlinear]
+        self.lane_linear = linear[:lane_bits]
+        self.lane_nonlinear = nonlinear[:lane_bits - len(self.lane_linear)]
+        self.outer_linear = linear[len(self.lane_linear):]
+        self.outer_nonlinear = nonlinear[len(self.lane_nonlinear):]
+        self.deltas = roundkey_deltas(linear, rounds)
+        self.lanes = 1 << (len(self.lane_linear) + len(self.lane_nonlinear))
+        self.mask = (1 << self.lanes) - 1
+        self.batches = 1 << (len(self.outer_linear) + len(self.outer_nonlinear))
+        self.candidates = self.batches * self.lanes
+
+        # lane j = (lane non-linear value) << len(lane_linear) | (lane linear value)
+        patterns = [sum(1 << j for j in xrange(self.lanes) if (j >> t) & 1) for t in xrange(len(self.lane_linear))]
+        self._lane_planes = []
+        for i in xrange(rounds):
+            planes = [0] * BLOCK_BITS
+            for t, bit in enumerate(self.lane_linear):
+                delta = self.deltas[bit][i]
+                for position in xrange(BLOCK_BITS):
+                    if (delta >> position) & 1:
+                        planes[position] ^= patterns[t]
+            self._lane_planes.append(planes)
+        self._plaintext_planes = keyPlanes(self.pairs[0][0], self.mask, BLOCK_BITS)
+        self._ciphertext = self.pairs[0][1]
+
+    def key(self, batch, lane):
+        """The candidate key of a lane of a batch"""
+        linear_lanes = len(self.lane_linear)
+        outer = batch & ((1 << len(self.outer_linear)) - 1)
+        return (self.base_key |
+                _deposit(lane & ((1 << linear_lanes) - 1), self.lane_linear) |
+                _deposit(lane >> linear_lanes, self.lane_nonlinear) |
+                _deposit(_gray(outer), self.outer_linear) |
+                _deposit(batch >> len(self.outer_linear), self.outer_nonlinear))
+
+    def _schedules(self, batch):
+        """Roundkeys of every lane non-linear value of a batch, with the lane linear bits at 0"""
+        key = self.key(batch, 0)
+        linear_lanes = len(self.lane_linear)
+        return [generateRoundkeys80(self.key(batch, v << linear_lanes) if v else key, self.rounds)
+                for v in xrange(1 << len(self.lane_nonlinear))]
+
+    def _key_planes(self, schedules):
+        """Per-round key planes of all lanes"""
+        if len(schedules) == 1:
+            mask = self.mask
+            return [[lane ^ (mask if (roundkey >> position) & 1 else 0)
+                     for position, lane in enumerate(lane_planes)]
+                    for roundkey, lane_planes in zip(schedules[0], self._lane_planes)]
+        # lane non-linear values: every bit of their planes covers 2^len(lane_linear) lanes
+        repeat = 1 << len(self.lane_linear)
+        planes = []
+        for i, lane_planes in enumerate(self._lane_planes):
+            sliced = sliceStates([schedule[i] for schedule in schedules], BLOCK_BITS)
+            planes.append([lane ^ int(''.join(bit * repeat for bit in format(plane, '0%db' % len(schedules))), 2)
+                           for plane, lane in zip(sliced, lane_planes)])
+        return planes
+
+    def _matches(self, key_planes):
+        """Lanes encrypting the first plaintext to the first ciphertext, as a lane mask"""
+        mask = self.mask
+        planes = self._plaintext_planes
+        for key in key_planes[:-1]:
+            planes = sBoxPlanes([p ^ k for p, k in zip(planes, key)], mask)
+            planes = [planes[i] for i in PBox_inv]
+        ciphertext = self._ciphertext
+        match = mask
+        for position, (plane, key) in enumerate(zip(planes, key_planes[-1])):
+            plane ^= key
+            match &= plane if (ciphertext >> position) & 1 else ~plane
+            if not match:
+                break
+        return match & mask
+
+    def confirm(self, key):
+        """Whether the key encrypts every known plaintext to its ciphertext"""
+        roundkeys = generateRoundkeys80(key, self.rounds)
+        return all(encryptTable(p, roundkeys) == c for p, c in self.pairs)
+
+    def search_range(self, first, last):
+        """Keys of batches [first, last) that match every pair"""
+        found = []
+        schedules = None
+        for batch in xrange(first, last):
+            outer = batch & ((1 << len(self.outer_linear)) - 1)
+            if schedules is None or not outer:
+                schedules = self._schedules(batch)
+            else:
+                # Gray code: exactly one outer linear bit differs from the previous batch
+                delta = self.deltas[self.outer_linear[(outer & -outer).bit_length() - 1]]
+                schedules = [[roundkey ^ d for roundkey, d in zip(schedule, delta)] for schedule in schedules]
+            match = self._matches(self._key_planes(schedules))
+            while match:
+                lane = (match & -match).bit_length() - 1
+                match &= match - 1
+                key = self.key(batch, lane)
+                if self.confirm(key):
+                    found.append(key)
+        return found
+
+
+# worker state set by _init_worker
+_worker = {}
+
+
+def _init_worker(base_key, unknown, pairs, rounds, lane_bits):
+    _worker['search'] = KeySearch(base_key, unknown, pairs, rounds, lane_bits)
+
+
+def _search_shard(task):
+    index, first, last = task
+    return index, last - first, _worker['search'].search_range(first, last)
+
+
+def load_checkpoint(path, parameters):
+    """(shards done as a set, found keys) of a checkpoint written for the same parameters"""
+    checkpoint = sharding.load_checkpoint(path, parameters)
+    if checkpoint is None:
+        return set(), set()
+    done = set(xrange(checkpoint['prefix'])) | set(checkpoint['shards'])
+    return done, set(int(key, 16) for key in checkpoint['keys'])
+
+
+def save_checkpoint(path, parameters, done, keys):
+    """Write the finished shards (as the finished prefix and the shards after it) atomically"""
+    prefix = 0
+    while prefix in done:
+        prefix += 1
+    sharding.save_checkpoint(path, parameters, {'prefix': prefix,
+                                                'shards': sorted(shard for shard in done if shard > prefix),
+                                                'keys': ['%020x' % key for key in sorted(keys)]})
+
+
+def search(base_key, unknown, pairs, rounds, processes=None, checkpoint=None, checkpoint_interval=60.0,
+           progress=sys.stderr, lane_bits=LANE_BITS, shard_keys=SHARD_KEYS):
+    """Find every key matching the known pairs, resuming from checkpoint if it exists
+
+    base_key, unknown, pairs, rounds, lane_bits: see KeySearch
+    processes:           worker count, multiprocessing.cpu_count() by default, 1 runs in this process
+    checkpoint:          JSON file for finished shards and found keys, None to disable checkpointing
+    checkpoint_interval: seconds between checkpoint writes
+    progress:            stream for progress reports, None to disable them
+    shard_keys:          candidates per shard
+    Output: sorted list of keys as 80-bit integers"""
+    plan = KeySearch(base_key, unknown, pairs, rounds, lane_bits)
+    parameters = {'base_key': '%020x' % plan.base_key, 'unknown': '%020x' % unknown, 'rounds': rounds,
+                  'pairs': [['%016x' % p, '%016x' % c] for p, c in plan.pairs],
+                  'lane_bits': lane_bits, 'shard_keys': shard_keys}
+    done, keys = load_checkpoint(checkpoint, parameters)
+    shard_batches = max(1, shard_keys // plan.lanes)
+    shards = (plan.batches + shard_batches - 1) // shard_batches
+    pending = ((index, index * shard_batches, min((index + 1) * shard_batches, plan.batches))
+               for index in xrange(shards) if index not in done)
+    searched = [0]
+
+    def record(result):
+        index, batches, found = result
+        done.add(index)
+        keys.update(found)
+        searched[0] += batches * plan.lanes
+
+    def report(elapsed):
+        remaining = plan.candidates - min(len(done) * shard_batches, plan.batches) * plan.lanes
+        return "shard %d/%d, %.0f keys/s, ETA %.0f s, %d keys found" % (
+            len(done), shards, searched[0] / max(elapsed, 1e-9), sharding.eta(elapsed, searched[0], remaining),
+            len(keys))
+
+    save = None
+    if checkpoint:
+        save = lambda: save_checkpoint(checkpoint, parameters, done, keys)
+    try:
+        sharding.run_shards(_search_shard, pending, record, processes, _init_worker,
+                            (base_key, unknown, plan.pairs, rounds, lane_bits), save, checkpoint_interval,
+                            progress, report)
+    finally:
+        _worker.clear()
+    return sorted(keys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Known-plaintext key search for reduced-round PRESENT-80")
+    parser.add_argument('--key', required=True, help="base key as 20 hex digits, unknown bits are ignored")
+    parser.add_argument('--unknown', required=True, help="mask of the unknown key bits as hex")
+    parser.add_argument('--pair', action='append', required=True, metavar='PLAINTEXT:CIPHERTEXT',
+                        help="known pair as hex, repeat for every pair (the first filters)")
+    parser.add_argument('--rounds', type=int, required=True)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--checkpoint', default=None)
+    parser.add_argument('--checkpoint-interval', type=float, default=60.0)
+    args = parser.parse_args(argv)
+    pairs = [tuple(int(text, 16) for text in pair.split(':')) for pair in args.pair]
+    for key in search(int(args.key, 16), int(args.unknown, 16), pairs, args.rounds, args.processes,
+                      args.checkpoint, args.checkpoint_interval):
+        print '%020x' % key
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Vectorized whole-keyspace evaluation of MiniPresent
+
+The key schedules of all 2^16 keys are computed at once as a (keys, rounds) uint8 array, then
+plaintexts are encrypted under every key in one pass per round. A round is a single lookup in
+the combined 256-entry sBoxLayer+pLayer table. Requires NumPy.
+
+USAGE EXAMPLE:
+---------------
+>>> from present.miniPresent import MiniPresent
+>>> table = codebook()
+>>> table.shape
+(65536, 256)
+>>> int(table[0xBEEF, 42]) == MiniPresent(0xBEEF).encrypt(42)
+True
+"""
+from present._compat import numpy, HAVE_NUMPY, require_numpy
+from present.miniPresent import Sbox, sBoxLayer, pLayer, sBoxLayer_dec, pLayer_dec
+
+KEYS_AMOUNT = 1 << 16
+BLOCKS_AMOUNT = 1 << 8
+
+if HAVE_NUMPY:
+    Sbox_array = numpy.array(Sbox, dtype=numpy.int64)
+    # one MiniPresent round without the key: SP_array[x] = pLayer(sBoxLayer(x))
+    SP_array = numpy.array([pLayer(sBoxLayer(x)) for x in xrange(BLOCKS_AMOUNT)], dtype=numpy.uint8)
+    SP_inv_array = numpy.array([sBoxLayer_dec(pLayer_dec(x)) for x in xrange(BLOCKS_AMOUNT)], dtype=numpy.uint8)
+
+
+def _require_numpy():
+    require_numpy("the MiniPresent keyspace engine")
+
+
+def allKeys():
+    """Every 16-bit key as an int64 array"""
+    _require_numpy()
+    return numpy.arange(KEYS_AMOUNT, dtype=numpy.int64)
+
+
+def roundkeys16All(keys=None, rounds=4):
+    """generateRoundkeys16 for many keys at once
+
+    Input:  array of keys (all 2^16 keys by default), number of rounds
+    Output: (keys, rounds) uint8 array of roundkeys"""
+    _require_numpy()
+    key = allKeys() if keys is None else numpy.array(keys, dtype=numpy.int64).reshape(-1)
+    roundkeys = numpy.empty((len(key), rounds), dtype=numpy.uint8)
+    for i in xrange(1, rounds + 1):
+        roundkeys[:, i - 1] = (key >> 8) & 0xFF
+        key = ((key & (2 ** 9 - 1)) << 7) + (key >> 9)
+        key = (Sbox_array[key >> 15] << 15) + (Sbox_array[(key >> 12) & 0xF] << 12) + (key & (2 ** 12 - 1))
+        key ^= i << 8
+    return roundkeys
+
+
+def encryptAllKeys(plaintexts, roundkeys=None, rounds=4):
+    """Encrypt every plaintext under every key
+
+    Input:  plaintexts as int or array of 8-bit values, roundkeys from roundkeys16All
+            (every 16-bit key with the given number of rounds by default)
+    Output: (keys, plaintexts) uint8 array of ciphertexts"""
+    _require_numpy()
+    if roundkeys is None:
+        roundkeys = roundkeys16All(rounds=rounds)
+    state = numpy.empty((len(roundkeys), numpy.size(plaintexts)), dtype=numpy.uint8)
+    state[:] = numpy.array(plaintexts, dtype=numpy.uint8).reshape(1, -1)
+    for i in xrange(roundkeys.shape[1] - 1):
+        state ^= roundkeys[:, i:i + 1]
+        state = SP_array[state]
+    state ^= roundkeys[:, -1:]
+    return state
+
+
+def decryptAllKeys(ciphertexts, roundkeys=None, rounds=4):
+    """Decrypt every ciphertext under every key
+
+    Input:  ciphertexts as int or array of 8-bit values, roundkeys from roundkeys16All
+    Output: (keys, ciphertexts) uint8 array of plaintexts"""
+    _require_numpy()
+    if roundkeys is None:
+        roundkeys = roundkeys16All(rounds=rounds)
+    state = numpy.empty((len(roundkeys), numpy.size(ciphertexts)), dtype=numpy.uint8)
+    state[:] = numpy.array(ciphertexts, dtype=numpy.uint8).reshape(1, -1)
+    for i in xrange(roundkeys.shape[1] - 1, 0, -1):
+        state ^= roundkeys[:, i:i + 1]
+        state = SP_inv_array[state]
+    state ^= roundkeys[:, :1]
+    return state
+
+
+def encryptPairs(plaintexts, roundkeys):
+    """Encrypt plaintexts[i] under the i-th key schedule
+
+    Input:  array of 8-bit plaintexts, (n, rounds) roundkeys from roundkeys16All
+    Output: uint8 array of n ciphertexts"""
+    _require_numpy()
+    state = numpy.array(plaintexts, dtype=numpy.uint8).reshape(-1)
+    for i in xrange(roundkeys.shape[1] - 1):
+        state = SP_array[state ^ roundkeys[:, i]]
+    return state ^ roundkeys[:, -1]
+
+
+def codebook(rounds=4):
+    """Full codebook: codebook[key, plaintext] = ciphertext, a 65536x256 uint8 array"""
+    _require_numpy()
+    return encryptAllKeys(numpy.arange(BLOCKS_AMOUNT), rounds=rounds)
+
+
+def inverseCodebook(table):
+    """Invert a codebook: inverse[key, ciphertext] = plaintext"""
+    _require_numpy()
+    inverse = numpy.empty_like(table)
+    rows = numpy.arange(len(table)).reshape(-1, 1)
+    inverse[rows, table] = numpy.arange(table.shape[1], dtype=table.dtype).reshape(1, -1)
+    return inverse
+
+
+def ciphertextHistogram(table):
+    """Count how many keys map each plaintext to each ciphertext
+
+    Output: (256, plaintexts) array, histogram[ciphertext, plaintext] = number of keys"""
+    _require_numpy()
+    histogram = numpy.zeros((BLOCKS_AMOUNT, table.shape[1]), dtype=numpy.int64)
+    for plaintext in xrange(table.shape[1]):
+        histogram[:, plaintext] = numpy.bincount(table[:, plaintext], minlength=BLOCKS_AMOUNT)
+    return histogram
@@ -1,27 +1,87 @@
 # coding=utf-8
 
+from array import array
+
+from present.keycache import key_schedule_cache
+from present.pyPresent import string2number, number2string_N, _toString
+
 __author__ = 'Iurii Sergiichuk'
 
+# inputs treated as big-endian raw blocks instead of integers
+BUFFER_TYPES = (basestring, bytearray, memoryview, array)
+
+
+class MiniPresent(object):
+    # the roundkeys live in _schedule[_offset:_offset + rounds]; _schedule is the array of
+    # this key alone, or the one contiguous array shared by all ciphers created by bulk()
+    __slots__ = ('rounds', '_schedule', '_offset', 'codebook', '_codebooks')
+
+    def __init__(self, key, rounds=4, codebook=False):
+        """Create a MiniPresent cipher object
 
-class MiniPresent:
-    def __init__(self, key, rounds=4):
+        key:      the 16-bit key as integer, rawstring or buffer (bytearray, memoryview, array)
+        rounds:   the number of rounds as an integer, 4 by default
+        codebook: compute the full 256-entry encryption and decryption tables on first use
+                  and answer encrypt/decrypt with a single lookup afterwards
+        """
         self.rounds = rounds
-        if isinstance(key, basestring):
-            self.roundkeys = generateRoundkeys16(string2number(key), self.rounds)
+        if isinstance(key, BUFFER_TYPES):
+            key = string2number(key)
+        self._schedule = key_schedule_cache.get(generateRoundkeys16, key, self.rounds, packRoundkeys)
+        self._offset = 0
+        self.codebook = codebook
+        self._codebooks = None
+
+    @classmethod
+    def from_roundkeys(cls, roundkeys):
+        """Create a MiniPresent cipher object from a precomputed key schedule
+
+        roundkeys: sequence of 8-bit roundkeys (K1 ... Kn), n is the number of rounds
+        """
+        return cls._from_schedule(packRoundkeys(roundkeys), 0, len(roundkeys))
+
+    @classmethod
+    def bulk(cls, keys, rounds=4):
+        """Create one cipher object per key, with all key schedules in one contiguous array
+
+        Input:  sequence of keys as integers, number of rounds
+        Output: list of MiniPresent objects, in the order of keys"""
+        keys = list(keys)
+        from present import keyspace
+        if keyspace.HAVE_NUMPY:
+            schedule = array('B', keyspace.roundkeys16All(keys, rounds).tostring())
         else:
-            self.roundkeys = generateRoundkeys16(key, self.rounds)
+            schedule = array('B')
+            for key in keys:
+                schedule.extend(generateRoundkeys16(key, rounds))
+        return [cls._from_schedule(schedule, i * rounds, rounds) for i in xrange(len(keys))]
+
+    @classmethod
+    def _from_schedule(cls, schedule, offset, rounds):
+        cipher = cls.__new__(cls)
+        cipher.rounds = rounds
+        cipher._schedule = schedule
+        cipher._offset = offset
+        cipher.codebook = False
+        cipher._codebooks = None
+        return cipher
+
+    @property
+    def roundkeys(self):
+        if self._offset == 0 and len(self._schedule) == self.rounds:
+            return self._schedule
+        return self._schedule[self._offset:self._offset + self.rounds]
 
     def encrypt(self, block):
         string_input = False
         state = block
-        if isinstance(block, basestring):
+        if isinstance(block, BUFFER_TYPES):
             state = string2number(block)
             string_input = True
-        for i in xrange(self.rounds - 1):
-            state = addRoundKey(state, self.roundkeys[i])
-            state = sBoxLayer(state)
-            state = pLayer(state)
-        cipher = addRoundKey(state, self.roundkeys[-1])
+        if self.codebook and 0 <= state <= 0xFF:
+            cipher = self._get_codebooks()[0][state]
+        else:
+            cipher = self._encrypt_number(state)
         if string_input:
             return number2string_N(cipher, self.get_block_size())
         return cipher
@@ -29,20 +89,60 @@ class MiniPresent:
     def decrypt(self, block):
         string_input = False
         state = block
-        if isinstance(block, basestring):
+        if isinstance(block, BUFFER_TYPES):
             state = string2number(block)
             string_input = True
-        for i in xrange(self.rounds - 1):
-            state = addRoundKey(state, self.roundkeys[-i - 1])
-            state = pLayer_dec(state)
-            state = sBoxLayer_dec(state)
-        decipher = addRoundKey(state, self.roundkeys[0])
+        if self.codebook and 0 <= state <= 0xFF:
+            decipher = self._get_codebooks()[1][state]
+        else:
+            decipher = self._decrypt_number(state)
         if string_input:
             return number2string_N(decipher, self.get_block_size())
         return decipher
 
+    def encrypt_bytes(self, data):
+        """Encrypt every byte of a buffer as one block through the codebook
+
+        Input:  raw string or any buffer: bytearray, memoryview, array
+        Output: raw string"""
+        return _toString(data).translate(self._get_codebooks()[2])
+
+    def decrypt_bytes(self, data):
+        """Decrypt every byte of a buffer as one block through the codebook
+
+        Input:  raw string or any buffer: bytearray, memoryview, array
+        Output: raw string"""
+        return _toString(data).translate(self._get_codebooks()[3])
+
+    def _encrypt_number(self, state):
+        schedule, offset = self._schedule, self._offset
+        for i in xrange(offset, offset + self.rounds - 1):
+            state = addRoundKey(state, schedule[i])
+            state = sBoxLayer(state)
+            state = pLayer(state)
+        return addRoundKey(state, schedule[offset + self.rounds - 1])
+
+    def _decrypt_number(self, state):
+        schedule, offset = self._schedule, self._offset
+        for i in xrange(offset + self.rounds - 1, offset, -1):
+            state = addRoundKey(state, schedule[i])
+            state = pLayer_dec(state)
+            state = sBoxLayer_dec(state)
+        return addRoundKey(state, schedule[offset])
+
+    def _get_codebooks(self):
+        """Encryption and decryption tables of the key, as lists and as str.translate tables"""
+        if self._codebooks is None:
+            encryption = [self._encrypt_number(i) for i in xrange(256)]
+            decryption = [0] * 256
+            for plain, cipher in enumerate(encryption):
+                decryption[cipher] = plain
+            self._codebooks = (encryption, decryption,
+                               ''.join(map(chr, encryption)), ''.join(map(chr, decryption)))
+        return self._codebooks
+
     def get_block_size(self):
-        return 2
+        return 1
 
 # 0   1   2   3   4   5   6   7   8   9   a   b   c   d   e   f
 Sbox = [0xc, 0x5, 0x6, 0xb, 0x9, 0x0, 0xa, 0xd, 0x3, 0xe, 0xf, 0x8, 0x4, 0x7, 0x1, 0x2]
@@ -51,6 +151,11 @@ PBox = [0, 5, 2, 3, 7, 6, 1, 4]
 PBox_inv = [PBox.index(x) for x in xrange(8)]
 
 
+def packRoundkeys(roundkeys):
+    """Compact container of 8-bit roundkeys"""
+    return array('B', roundkeys)
+
+
 def generateRoundkeys16(key, rounds):
     roundkeys = []
     for i in xrange(1, rounds + 1):  # (K1 ... K32)
@@ -96,25 +201,3 @@ def pLayer_dec(state):
     for i in xrange(8):
         output += ((state >> i) & 0x01) << PBox_inv[i]
     return output
-
-
-def string2number(i):
-    """ Convert a string to a number
-
-    Input: string (big-endian)
-    Output: long or integer
-    """
-    return int(i.encode('hex'), 16)
-
-
-def number2string_N(i, N):
-    """Convert a number to a string of fixed size
-
-    i: long or integer
-    N: length of string
-    Output: string (big-endian)
-    """
-    s = '%0*x' % (N * 2, i)
-    return s.decode('hex')
-
-
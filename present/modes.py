@@ -0,0 +1,269 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Block cipher modes of operation over arbitrary-length data
+
+Works with any cipher exposing encrypt(block), decrypt(block) and get_block_size(), e.g.
+Present or MiniPresent. Ciphers with encrypt_blocks/decrypt_blocks (Present) get whole runs
+of blocks in one call wherever the mode allows it (ECB, CTR, CBC and CFB decryption).
+
+USAGE EXAMPLE:
+---------------
+>>> from present.pyPresent import Present
+>>> cipher = Present("00000000000000000000".decode('hex'))
+>>> mode = CBC(cipher, "0000000000000000".decode('hex'))
+>>> encrypted = mode.encrypt("attack at dawn")
+>>> len(encrypted)
+16
+>>> mode.decrypt(encrypted)
+'attack at dawn'
+
+Streaming:
+-----------
+>>> encryptor = CTR(cipher, "0000000000000000".decode('hex')).encryptor()
+>>> encrypted = encryptor.update("attack ") + encryptor.update("at dawn") + encryptor.finalize()
+>>> ''.join(CTR(cipher, "0000000000000000".decode('hex')).decrypt_iter([encrypted[:5], encrypted[5:]]))
+'attack at dawn'
+"""
+from present.pyPresent import string2number, number2string_N, _toString
+
+
+def pad(data, block_size):
+    """PKCS#7 padding
+
+    Input:  raw string, block size in bytes
+    Output: raw string with a length multiple of block_size"""
+    amount = block_size - len(data) % block_size
+    return data + chr(amount) * amount
+
+
+def unpad(data, block_size):
+    """Remove PKCS#7 padding
+
+    Input:  padded raw string, block size in bytes
+    Output: raw string"""
+    if not data or len(data) % block_size:
+        raise ValueError("Padded data length must be a positive multiple of the block size")
+    amount = ord(data[-1])
+    if not 0 < amount <= block_size or data[-amount:] != data[-1] * amount:
+        raise ValueError("Invalid PKCS#7 padding")
+    return data[:-amount]
+
+
+def xorStrings(a, b):
+    """XOR two raw strings of the same length"""
+    if not a:
+        return ''
+    return number2string_N(string2number(a) ^ string2number(b), len(a))
+
+
+def _split(data, block_size):
+    return [data[i:i + block_size] for i in xrange(0, len(data), block_size)]
+
+
+def _encryptBlocks(cipher, blocks):
+    encrypt_blocks = getattr(cipher, 'encrypt_blocks', None)
+    if encrypt_blocks is not None:
+        return encrypt_blocks(blocks)
+    return [cipher.encrypt(block) for block in blocks]
+
+
+def _decryptBlocks(cipher, blocks):
+    decrypt_blocks = getattr(cipher, 'decrypt_blocks', None)
+    if decrypt_blocks is not None:
+        return decrypt_blocks(blocks)
+    return [cipher.decrypt(block) for block in blocks]
+
+
+class _ModeContext(object):
+    """Incremental encryption or decryption: update() any number of times, then finalize()"""
+
+    def __init__(self, mode, encrypting):
+        self._mode = mode
+        self._encrypting = encrypting
+        self._chain = mode._initial_chain()
+        self._buffer = ''
+        self._finalized = False
+
+    def update(self, data):
+        """Process more data
+
+        Input:  raw string (or bytearray/memoryview)
+        Output: raw string with the output of every block completed so far"""
+        if self._finalized:
+            raise ValueError("Context is already finalized")
+        self._buffer += _toString(data)
+        block_size = self._mode.block_size
+        ready = len(self._buffer) - len(self._buffer) % block_size
+        if self._mode.padding and not self._encrypting and ready == len(self._buffer):
+            # the last complete block may hold the padding, keep it for finalize
+            ready -= block_size
+        if ready <= 0:
+            return ''
+        run, self._buffer = self._buffer[:ready], self._buffer[ready:]
+        return self._process(run)
+
+    def finalize(self):
+        """Process the remaining data, applying or removing padding
+
+        Output: raw string"""
+        if self._finalized:
+            raise ValueError("Context is already finalized")
+        self._finalized = True
+        mode, data, self._buffer = self._mode, self._buffer, ''
+        if mode.padding and self._encrypting:
+            return self._process(pad(data, mode.block_size))
+        if len(data) % mode.block_size and not mode.stream:
+            raise ValueError("Data length must be a multiple of the block size")
+        if mode.padding:
+            return unpad(self._process(data), mode.block_size)
+        return self._process(data)
+
+    def _process(self, data):
+        if not data:
+            return ''
+        if self._encrypting:
+            self._chain, output = self._mode._encrypt_run(self._chain, data)
+        else:
+            self._chain, output = self._mode._decrypt_run(self._chain, data)
+        return output
+
+
+class _Mode(object):
+    # whether the mode takes an IV
+    needs_iv = True
+    # whether the mode can handle a final partial block without padding
+    stream = False
+    # whether PKCS#7 padding is applied by default
+    default_padding = False
+
+    def __init__(self, cipher, iv=None, padding=None):
+        """Create a mode of operation over a block cipher
+
+        cipher:  object with encrypt, decrypt and get_block_size
+        iv:      initialization vector (initial counter block for CTR) as raw string of one block
+        padding: apply PKCS#7 padding, by default True for ECB and CBC
+        """
+        self.cipher = cipher
+        self.block_size = cipher.get_block_size()
+        if padding is None:
+            padding = self.default_padding
+        if padding and self.stream:
+            raise ValueError("%s is a stream mode and does not use padding" % self.__class__.__name__)
+        self.padding = padding
+        if self.needs_iv:
+            if iv is None or len(iv) != self.block_size:
+                raise ValueError("IV must be a raw string of %d bytes" % self.block_size)
+            iv = _toString(iv)
+        self.iv = iv
+
+    def encryptor(self):
+        return _ModeContext(self, True)
+
+    def decryptor(self):
+        return _ModeContext(self, False)
+
+    def encrypt(self, data):
+        context = self.encryptor()
+        return context.update(data) + context.finalize()
+
+    def decrypt(self, data):
+        context = self.decryptor()
+        return context.update(data) + context.finalize()
+
+    def encrypt_iter(self, chunks):
+        """Encrypt an iterable of chunks of any size, yielding ciphertext as it becomes available"""
+        return self._iterate(self.encryptor(), chunks)
+
+    def decrypt_iter(self, chunks):
+        """Decrypt an iterable of chunks of any size, yielding plaintext as it becomes available"""
+        return self._iterate(self.decryptor(), chunks)
+
+    @staticmethod
+    def _iterate(context, chunks):
+        for chunk in chunks:
+            output = context.update(chunk)
+            if output:
+                yield output
+        output = context.finalize()
+        if output:
+            yield output
+
+    def _initial_chain(self):
+        return self.iv
+
+
+class ECB(_Mode):
+    default_padding = True
+    needs_iv = False
+
+    def _encrypt_run(self, chain, data):
+        return chain, ''.join(_encryptBlocks(self.cipher, _split(data, self.block_size)))
+
+    def _decrypt_run(self, chain, data):
+        return chain, ''.join(_decryptBlocks(self.cipher, _split(data, self.block_size)))
+
+
+class CBC(_Mode):
+    default_padding = True
+
+    def _encrypt_run(self, chain, data):
+        output = []
+        for block in _split(data, self.block_size):
+            chain = self.cipher.encrypt(xorStrings(block, chain))
+            output.append(chain)
+        return chain, ''.join(output)
+
+    def _decrypt_run(self, chain, data):
+        decrypted = ''.join(_decryptBlocks(self.cipher, _split(data, self.block_size)))
+        previous = chain + data[:-self.block_size]
+        return data[-self.block_size:], xorStrings(decrypted, previous)
+
+
+class CTR(_Mode):
+    """Counter mode, the IV is the initial counter block, incremented as a big-endian integer"""
+    stream = True
+
+    def _initial_chain(self):
+        return string2number(self.iv)
+
+    def _keystream(self, counter, length):
+        count = (length + self.block_size - 1) // self.block_size
+        modulus = 1 << (8 * self.block_size)
+        counters = [number2string_N((counter + i) % modulus, self.block_size) for i in xrange(count)]
+        return (counter + count) % modulus, ''.join(_encryptBlocks(self.cipher, counters))
+
+    def _encrypt_run(self, chain, data):
+        chain, keystream = self._keystream(chain, len(data))
+        return chain, xorStrings(data, keystream[:len(data)])
+
+    _decrypt_run = _encrypt_run
+
+
+class OFB(_Mode):
+    stream = True
+
+    def _encrypt_run(self, chain, data):
+        keystream = []
+        for _ in xrange(0, len(data), self.block_size):
+            chain = self.cipher.encrypt(chain)
+            keystream.append(chain)
+        return chain, xorStrings(data, ''.join(keystream)[:len(data)])
+
+    _decrypt_run = _encrypt_run
+
+
+class CFB(_Mode):
+    """Full-block cipher feedback mode"""
+    stream = True
+
+    def _encrypt_run(self, chain, data):
+        output = []
+        for block in _split(data, self.block_size):
+            chain = xorStrings(block, self.cipher.encrypt(chain)[:len(block)])
+            output.append(chain)
+        return chain, ''.join(output)
+
+    def _decrypt_run(self, chain, data):
+        blocks = _split(data, self.block_size)
+        keystream = ''.join(_encryptBlocks(self.cipher, [chain] + blocks[:-1]))
+        return blocks[-1], xorStrings(data, keystream[:len(data)])
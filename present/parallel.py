@@ -0,0 +1,128 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Multi-core PRESENT for the parallelizable modes (CTR, ECB, CBC decryption)
+
+The input is split into block ranges that are processed by a pool of worker processes.
+Input and output live in shared memory (multiprocessing RawArray) inherited by the workers,
+so only the range boundaries are sent to the workers and nothing but a block count comes
+back. Every worker builds the key schedule once, in the pool initializer. The output is
+byte-identical to the serial present.modes implementation.
+
+USAGE EXAMPLE:
+---------------
+>>> from present.pyPresent import Present
+>>> from present.modes import CTR
+>>> key = "00000000000000000000".decode('hex')
+>>> iv = "0000000000000000".decode('hex')
+>>> data = "x" * 100000
+>>> ctr_parallel(key, iv, data, processes=2) == CTR(Present(key), iv).encrypt(data)
+True
+"""
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+from present.modes import pad, unpad, xorStrings
+from present.pyPresent import Present, string2number, number2string_N
+
+BLOCK_SIZE = 8
+
+# default number of blocks handed to a worker at once
+TASK_BLOCKS = 8192
+
+# worker state set by _init_worker: cipher, shared input and shared output
+_worker = {}
+
+
+def _init_worker(key, rounds, src, dst):
+    _worker['cipher'] = Present(key, rounds)
+    _worker['src'] = src
+    _worker['dst'] = dst
+
+
+def _process_range(task):
+    """Process blocks [first, last) of the shared input into the shared output"""
+    kind, first, last, iv = task
+    cipher, src, dst = _worker['cipher'], _worker['src'], _worker['dst']
+    start, end = first * BLOCK_SIZE, min(last * BLOCK_SIZE, len(src))
+    data = src[start:end]
+    blocks = [data[i:i + BLOCK_SIZE] for i in xrange(0, len(data), BLOCK_SIZE)]
+    if kind == 'ctr':
+        counters = [number2string_N((iv + i) % (1 << 64), BLOCK_SIZE) for i in xrange(first, last)]
+        output = xorStrings(data, ''.join(cipher.encrypt_blocks(counters))[:len(data)])
+    elif kind == 'ecb-encrypt':
+        output = ''.join(cipher.encrypt_blocks(blocks))
+    elif kind == 'ecb-decrypt':
+        output = ''.join(cipher.decrypt_blocks(blocks))
+    elif kind == 'cbc-decrypt':
+        previous = src[start - BLOCK_SIZE:end - BLOCK_SIZE] if first else iv + src[:end - BLOCK_SIZE]
+        output = xorStrings(''.join(cipher.decrypt_blocks(blocks)), previous)
+    else:
+        raise ValueError("Unknown task kind %r" % kind)
+    dst[start:end] = output
+    return last - first
+
+
+def _run(kind, key, data, iv=None, rounds=32, processes=None, task_blocks=TASK_BLOCKS):
+    """Split data into block ranges and process them in a process pool"""
+    data = str(data)
+    if not data:
+        return ''
+    blocks = (len(data) + BLOCK_SIZE - 1) // BLOCK_SIZE
+    tasks = [(kind, first, min(first + task_blocks, blocks), iv) for first in xrange(0, blocks, task_blocks)]
+    src = RawArray('c', len(data))
+    src[:] = data
+    dst = RawArray('c', len(data))
+    if processes == 1 or len(tasks) == 1:
+        _init_worker(key, rounds, src, dst)
+        try:
+            map(_process_range, tasks)
+        finally:
+            _worker.clear()
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker, (key, rounds, src, dst))
+        try:
+            pool.map(_process_range, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    return dst.raw
+
+
+def ctr_parallel(key, iv, data, rounds=32, processes=None, task_blocks=TASK_BLOCKS):
+    """CTR mode encryption/decryption across processes, same output as present.modes.CTR
+
+    key:        PRESENT key as 80-bit or 128-bit rawstring
+    iv:         initial counter block as 8-byte rawstring
+    data:       raw string of any length
+    processes:  worker count, multiprocessing.cpu_count() by default
+    """
+    if len(iv) != BLOCK_SIZE:
+        raise ValueError("IV must be a raw string of %d bytes" % BLOCK_SIZE)
+    return _run('ctr', key, data, string2number(iv), rounds, processes, task_blocks)
+
+
+def ecb_encrypt_parallel(key, data, padding=True, rounds=32, processes=None, task_blocks=TASK_BLOCKS):
+    """ECB mode encryption across processes, same output as present.modes.ECB"""
+    if padding:
+        data = pad(str(data), BLOCK_SIZE)
+    elif len(data) % BLOCK_SIZE:
+        raise ValueError("Data length must be a multiple of the block size")
+    return _run('ecb-encrypt', key, data, None, rounds, processes, task_blocks)
+
+
+def ecb_decrypt_parallel(key, data, padding=True, rounds=32, processes=None, task_blocks=TASK_BLOCKS):
+    """ECB mode decryption across processes, same output as present.modes.ECB"""
+    if len(data) % BLOCK_SIZE:
+        raise ValueError("Data length must be a multiple of the block size")
+    output = _run('ecb-decrypt', key, data, None, rounds, processes, task_blocks)
+    return unpad(output, BLOCK_SIZE) if padding else output
+
+
+def cbc_decrypt_parallel(key, iv, data, padding=True, rounds=32, processes=None, task_blocks=TASK_BLOCKS):
+    """CBC mode decryption across processes, same output as present.modes.CBC"""
+    if len(iv) != BLOCK_SIZE:
+        raise ValueError("IV must be a raw string of %d bytes" % BLOCK_SIZE)
+    if len(data) % BLOCK_SIZE:
+        raise ValueError("Data length must be a multiple of the block size")
+    output = _run('cbc-decrypt', key, data, str(iv), rounds, processes, task_blocks)
+    return unpad(output, BLOCK_SIZE) if padding else output
@@ -20,6 +20,20 @@ Encrypting with a 80-bit key:
 >>> decrypted.encode('hex')
 '0000000000000000'
 
+Encrypting into a preallocated buffer:
+---------------------------------------
+>>> output = bytearray(16)
+>>> cipher.encrypt_into(bytearray(16), output)
+16
+>>> str(output).encode('hex')
+'5579c1387b2284455579c1387b228445'
+
+Selecting the round engine:
+----------------------------
+>>> cipher = Present(key, engine='reference')
+>>> cipher.encrypt(plain).encode('hex')
+'5579c1387b228445'
+
 Encrypting with a 128-bit key:
 -------------------------------
 >>> key = "0123456789abcdef0123456789abcdef".decode('hex')
@@ -35,51 +49,211 @@ Encrypting with a 128-bit key:
 fully based on standard specifications: http://www.crypto.ruhr-uni-bochum.de/imperia/md/content/texte/publications/conferences/present_ches2007.pdf
 test vectors: http://www.crypto.ruhr-uni-bochum.de/imperia/md/content/texte/publications/conferences/slides/present_testvectors.zip
 """
+import binascii
+import struct
+import types
+from array import array
+
+from present.bitslice import encryptStates, decryptStates
+from present.keycache import key_schedule_cache
 
 
-class Present:
-    def __init__(self, key, rounds=32):
+class Present(object):
+    # _schedule_id: (generator, key) of the schedule in key_schedule_cache, None for from_roundkeys
+    __slots__ = ('rounds', 'roundkeys', 'engine', '_encrypt_state', '_decrypt_state', '_decrypt_roundkeys',
+                 '_roundkeys_vectors', '_schedule_id')
+
+    def __init__(self, key, rounds=32, engine='table'):
         """Create a PRESENT cipher object
 
-        key:    the key as a 128-bit or 80-bit rawstring
+        key:    the key as a 128-bit or 80-bit rawstring or buffer (bytearray, memoryview, array)
         rounds: the number of rounds as an integer, 32 by default
+        engine: name of the round engine from ENGINES, 'table' by default
         """
         self.rounds = rounds
-        if len(key) * 8 == 80:
-            self.roundkeys = generateRoundkeys80(string2number(key), self.rounds)
-        elif len(key) * 8 == 128:
-            self.roundkeys = generateRoundkeys128(string2number(key), self.rounds)
+        if _byteLength(key) * 8 == 80:
+            self._schedule_id = (generateRoundkeys80, string2number(key))
+        elif _byteLength(key) * 8 == 128:
+            self._schedule_id = (generateRoundkeys128, string2number(key))
         else:
             raise ValueError, "Key must be a 128-bit or 80-bit rawstring"
+        self.roundkeys = key_schedule_cache.get(self._schedule_id[0], self._schedule_id[1], self.rounds,
+                                                 packRoundkeys)
+        self._roundkeys_vectors = None
+        self.set_engine(engine)
+
+    @classmethod
+    def from_roundkeys(cls, roundkeys, engine='table'):
+        """Create a PRESENT cipher object from a precomputed key schedule
+
+        roundkeys: sequence of 64-bit roundkeys (K1 ... Kn), n is the number of rounds
+        engine:    name of the round engine from ENGINES, 'table' by default
+        """
+        cipher = cls.__new__(cls)
+        cipher.rounds = len(roundkeys)
+        cipher.roundkeys = packRoundkeys(roundkeys)
+        cipher._roundkeys_vectors = None
+        cipher._schedule_id = None
+        cipher.set_engine(engine)
+        return cipher
+
+    def set_engine(self, engine):
+        """Select the round engine used by encrypt/decrypt
+
+        engine: 'reference' (bit-level sBoxLayer/pLayer), 'table' (combined SP lookup tables) or
+                'compiled' (table rounds unrolled into code generated for this key schedule)
+        """
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine %r, expected one of %s" % (engine, ', '.join(sorted(ENGINES))))
+        self.engine = engine
+        self._encrypt_state = ENGINES[engine][0]
+        # decryption is prepared by the first call that needs it, see _prepare_decryption
+        self._decrypt_state = self._decrypt_roundkeys = None
+        specialise = SPECIALISED_ENGINES.get(engine)
+        if specialise is not None:
+            self._encrypt_state = self._prepared((engine, 'encrypt'),
+                                                 lambda roundkeys: specialise(roundkeys, 'encrypt'))
+
+    def _prepare_decryption(self):
+        """Build (or take from the key schedule cache) the decryption roundkeys and round function"""
+        decrypt_state, prepare_decryption = ENGINES[self.engine][1:]
+        specialise = SPECIALISED_ENGINES.get(self.engine)
+
+        def prepare(roundkeys):
+            if prepare_decryption is not None:
+                roundkeys = packRoundkeys(prepare_decryption(roundkeys))
+            if specialise is None:
+                return roundkeys, decrypt_state
+            return roundkeys, specialise(roundkeys, 'decrypt')
+
+        self._decrypt_roundkeys, self._decrypt_state = self._prepared((self.engine, 'decrypt'), prepare)
+
+    def _prepared(self, name, prepare):
+        """prepare(roundkeys), shared through the key schedule cache by the ciphers of the same key"""
+        if self._schedule_id is None:
+            return prepare(self.roundkeys)
+        generator, key = self._schedule_id
+        return key_schedule_cache.prepared(generator, key, self.rounds, packRoundkeys, name, prepare)
 
     def encrypt(self, block):
         """Encrypt 1 block (8 bytes)
 
-        Input:  plaintext block as raw string
+        Input:  plaintext block as raw string or buffer (bytearray, memoryview, array)
         Output: ciphertext block as raw string
         """
         state = string2number(block)
-        for i in xrange(self.rounds - 1):
-            state = addRoundKey(state, self.roundkeys[i])
-            state = sBoxLayer(state)
-            state = pLayer(state)
-        cipher = addRoundKey(state, self.roundkeys[-1])
+        cipher = self._encrypt_state(state, self.roundkeys)
         return number2string_N(cipher, 8)
 
     def decrypt(self, block):
         """Decrypt 1 block (8 bytes)
 
-        Input:  ciphertext block as raw string
+        Input:  ciphertext block as raw string or buffer (bytearray, memoryview, array)
         Output: plaintext block as raw string
         """
+        if self._decrypt_state is None:
+            self._prepare_decryption()
         state = string2number(block)
-        for i in xrange(self.rounds - 1):
-            state = addRoundKey(state, self.roundkeys[-i - 1])
-            state = pLayer_dec(state)
-            state = sBoxLayer_dec(state)
-        decipher = addRoundKey(state, self.roundkeys[0])
+        decipher = self._decrypt_state(state, self._decrypt_roundkeys)
         return number2string_N(decipher, 8)
 
+    def encrypt_blocks(self, blocks):
+        """Encrypt many blocks (8 bytes each) in one bitsliced pass
+
+        Input:  list of plaintext blocks as raw strings
+        Output: list of ciphertext blocks as raw strings
+        """
+        states = [string2number(block) for block in blocks]
+        if len(states) < BITSLICE_THRESHOLD:
+            states = [self._encrypt_state(state, self.roundkeys) for state in states]
+        else:
+            states = encryptStates(states, self.roundkeys, PBox)
+        return [number2string_N(state, 8) for state in states]
+
+    def decrypt_blocks(self, blocks):
+        """Decrypt many blocks (8 bytes each) in one bitsliced pass
+
+        Input:  list of ciphertext blocks as raw strings
+        Output: list of plaintext blocks as raw strings
+        """
+        states = [string2number(block) for block in blocks]
+        if len(states) < BITSLICE_THRESHOLD:
+            if self._decrypt_state is None:
+                self._prepare_decryption()
+            states = [self._decrypt_state(state, self._decrypt_roundkeys) for state in states]
+        else:
+            states = decryptStates(states, self.roundkeys, PBox)
+        return [number2string_N(state, 8) for state in states]
+
+    def encrypt_into(self, src, dst):
+        """Encrypt a buffer of blocks into a caller-supplied buffer
+
+        Input:  src: any buffer of big-endian 8-byte blocks (raw string, bytearray, memoryview, array)
+                dst: writable buffer of the same size (bytearray, memoryview, array), may be src itself
+        Output: number of bytes written
+        """
+        return self._process_into(src, dst, self._encrypt_state, self.roundkeys, encryptStates)
+
+    def decrypt_into(self, src, dst):
+        """Decrypt a buffer of blocks into a caller-supplied buffer, see encrypt_into"""
+        if self._decrypt_state is None:
+            self._prepare_decryption()
+        return self._process_into(src, dst, self._decrypt_state, self._decrypt_roundkeys, decryptStates)
+
+    def _process_into(self, src, dst, process_state, roundkeys, process_states):
+        size = _byteLength(src)
+        if size % 8:
+            raise ValueError("Buffer length must be a multiple of 8 bytes")
+        if _byteLength(dst) < size:
+            raise ValueError("Output buffer is smaller than the input")
+        for offset in xrange(0, size, INTO_CHUNK_BLOCKS * 8):
+            count = min(INTO_CHUNK_BLOCKS, (size - offset) // 8)
+            blocks = struct.Struct('>%dQ' % count)
+            states = blocks.unpack_from(src, offset)
+            if count < BITSLICE_THRESHOLD:
+                states = [process_state(state, roundkeys) for state in states]
+            else:
+                states = process_states(states, self.roundkeys, PBox)
+            blocks.pack_into(dst, offset, *states)
+        return size
+
+    def encrypt_array(self, data):
+        """Encrypt a whole array of blocks in vectorized passes
+
+        Input:  NumPy uint64 array, or any buffer of big-endian 8-byte blocks
+        Output: uint64 array of the same shape, or a raw string for buffer input
+        Without NumPy buffers are encrypted with encrypt_blocks instead.
+        """
+        from present import vectorized
+        if not vectorized.HAVE_NUMPY:
+            return ''.join(self.encrypt_blocks(_splitBlocks(data)))
+        roundkeys = self._get_roundkeys_vectors()[0]
+        if isinstance(data, vectorized.numpy.ndarray) and data.dtype == vectorized.numpy.uint64:
+            return vectorized.encryptArray(data, roundkeys)
+        return vectorized.states2buffer(vectorized.encryptArray(vectorized.buffer2states(data), roundkeys))
+
+    def decrypt_array(self, data):
+        """Decrypt a whole array of blocks in vectorized passes
+
+        Input:  NumPy uint64 array, or any buffer of big-endian 8-byte blocks
+        Output: uint64 array of the same shape, or a raw string for buffer input
+        Without NumPy buffers are decrypted with decrypt_blocks instead.
+        """
+        from present import vectorized
+        if not vectorized.HAVE_NUMPY:
+            return ''.join(self.decrypt_blocks(_splitBlocks(data)))
+        roundkeys = self._get_roundkeys_vectors()[1]
+        if isinstance(data, vectorized.numpy.ndarray) and data.dtype == vectorized.numpy.uint64:
+            return vectorized.decryptArray(data, roundkeys)
+        return vectorized.states2buffer(vectorized.decryptArray(vectorized.buffer2states(data), roundkeys))
+
+    def _get_roundkeys_vectors(self):
+        if self._roundkeys_vectors is None:
+            from present.vectorized import roundkeysVector
+            self._roundkeys_vectors = (roundkeysVector(self.roundkeys),
+                                       roundkeysVector(decryptionRoundkeysTable(self.roundkeys)))
+        return self._roundkeys_vectors
+
     def get_block_size(self):
         return 8
 
@@ -93,6 +267,18 @@ PBox = [0, 16, 32, 48, 1, 17, 33, 49, 2, 18, 34, 50, 3, 19, 35, 51,
 PBox_inv = [PBox.index(x) for x in xrange(64)]
 
 
+# roundkeys are stored in a 64-bit unsigned array where the platform has one ('L' on LP64,
+# Python 2 has no 'Q'), 8 bytes per key instead of a pointer to a long object
+ROUNDKEYS_TYPECODE = 'L' if array('L').itemsize >= 8 else None
+
+
+def packRoundkeys(roundkeys):
+    """Compact container of 64-bit roundkeys: array('L') on 64-bit platforms, tuple otherwise"""
+    if ROUNDKEYS_TYPECODE is None:
+        return tuple(roundkeys)
+    return array(ROUNDKEYS_TYPECODE, roundkeys)
+
+
 def generateRoundkeys80(key, rounds):
     """Generate the roundkeys for a 80-bit key
 
@@ -187,24 +373,250 @@ def pLayer_dec(state):
     return output
 
 
+def encryptReference(state, roundkeys):
+    """Encrypt a 64-bit integer state bit by bit with sBoxLayer/pLayer
+
+    Input:  64-bit integer, list of 64-bit roundkeys
+    Output: 64-bit integer"""
+    for i in xrange(len(roundkeys) - 1):
+        state = addRoundKey(state, roundkeys[i])
+        state = sBoxLayer(state)
+        state = pLayer(state)
+    return addRoundKey(state, roundkeys[-1])
+
+
+def decryptReference(state, roundkeys):
+    """Decrypt a 64-bit integer state bit by bit with pLayer_dec/sBoxLayer_dec
+
+    Input:  64-bit integer, list of 64-bit roundkeys
+    Output: 64-bit integer"""
+    for i in xrange(len(roundkeys) - 1):
+        state = addRoundKey(state, roundkeys[-i - 1])
+        state = pLayer_dec(state)
+        state = sBoxLayer_dec(state)
+    return addRoundKey(state, roundkeys[0])
+
+
+# Lookup tables for the table engine. Both layers act on bytes independently of each other
+# (sBoxLayer on nibbles, pLayer on single bits), so one round is eight byte lookups OR'd together:
+#   SP_table[j][b]     = pLayer(S(b) << 8j)
+#   SP_inv_table[j][b] = pLayer_dec(S_inv(b) << 8j)
+#   P_inv_table[j][b]  = pLayer_dec(b << 8j)
+#   S_inv_bytes[b]     = S_inv(b), applied to both nibbles of b
+S_bytes = [(Sbox[b >> 4] << 4) | Sbox[b & 0xF] for b in xrange(256)]
+S_inv_bytes = [(Sbox_inv[b >> 4] << 4) | Sbox_inv[b & 0xF] for b in xrange(256)]
+SP_table = [[pLayer(S_bytes[b] << (8 * j)) for b in xrange(256)] for j in xrange(8)]
+SP_inv_table = [[pLayer_dec(S_inv_bytes[b] << (8 * j)) for b in xrange(256)] for j in xrange(8)]
+P_inv_table = [[pLayer_dec(b << (8 * j)) for b in xrange(256)] for j in xrange(8)]
+
+
+def encryptTable(state, roundkeys):
+    """Encrypt a 64-bit integer state with the combined SP lookup tables
+
+    Input:  64-bit integer, list of 64-bit roundkeys
+    Output: 64-bit integer"""
+    t0, t1, t2, t3, t4, t5, t6, t7 = SP_table
+    for roundkey in roundkeys[:-1]:
+        state ^= roundkey
+        state = (t0[state & 0xFF] | t1[(state >> 8) & 0xFF] | t2[(state >> 16) & 0xFF] |
+                 t3[(state >> 24) & 0xFF] | t4[(state >> 32) & 0xFF] | t5[(state >> 40) & 0xFF] |
+                 t6[(state >> 48) & 0xFF] | t7[state >> 56])
+    return state ^ roundkeys[-1]
+
+
+def decryptionRoundkeysTable(roundkeys):
+    """Prepare roundkeys for decryptTable
+
+    Decryption rounds are regrouped as S_inv -> addRoundKey -> pLayer_dec, so every inner
+    roundkey is moved through pLayer_dec in advance (pLayer_dec is linear).
+
+    Input:  list of 64-bit roundkeys (K1 ... Kn)
+    Output: list of 64-bit roundkeys in decryption order"""
+    if len(roundkeys) == 1:
+        return list(roundkeys)
+    inner = [_byteLookup(roundkeys[-i - 1], P_inv_table) for i in xrange(1, len(roundkeys) - 1)]
+    return [roundkeys[-1]] + inner + [roundkeys[0]]
+
+
+def _byteLookup(state, tables):
+    return (tables[0][state & 0xFF] | tables[1][(state >> 8) & 0xFF] | tables[2][(state >> 16) & 0xFF] |
+            tables[3][(state >> 24) & 0xFF] | tables[4][(state >> 32) & 0xFF] | tables[5][(state >> 40) & 0xFF] |
+            tables[6][(state >> 48) & 0xFF] | tables[7][state >> 56])
+
+
+def decryptTable(state, roundkeys):
+    """Decrypt a 64-bit integer state with the combined SP lookup tables
+
+    Input:  64-bit integer, roundkeys prepared by decryptionRoundkeysTable
+    Output: 64-bit integer"""
+    if len(roundkeys) == 1:
+        return state ^ roundkeys[0]
+    t0, t1, t2, t3, t4, t5, t6, t7 = SP_inv_table
+    state = _byteLookup(state ^ roundkeys[0], P_inv_table)
+    for roundkey in roundkeys[1:-1]:
+        state = (t0[state & 0xFF] | t1[(state >> 8) & 0xFF] | t2[(state >> 16) & 0xFF] |
+                 t3[(state >> 24) & 0xFF] | t4[(state >> 32) & 0xFF] | t5[(state >> 40) & 0xFF] |
+                 t6[(state >> 48) & 0xFF] | t7[state >> 56]) ^ roundkey
+    s = S_inv_bytes
+    state = (s[state & 0xFF] | s[(state >> 8) & 0xFF] << 8 | s[(state >> 16) & 0xFF] << 16 |
+             s[(state >> 24) & 0xFF] << 24 | s[(state >> 32) & 0xFF] << 32 | s[(state >> 40) & 0xFF] << 40 |
+             s[(state >> 48) & 0xFF] << 48 | s[state >> 56] << 56)
+    return state ^ roundkeys[-1]
+
+
+# S_inv_table[j][b] = S_inv(b) << 8j, the last decryption round of the compiled engine
+S_inv_table = [[S_inv_bytes[b] << (8 * j) for b in xrange(256)] for j in xrange(8)]
+
+# 16-bit versions of SP_table / SP_inv_table for the compiled engine, built on first use:
+# four lookups per round instead of eight, at 4 x 65536 entries (about 9 MB) per direction
+_wide_tables = {}
+
+# (rounds, 'encrypt' / 'decrypt') -> code object of the straight-line round function
+_compiled_code = {}
+
+
+def _wideTables(direction):
+    wide = _wide_tables.get(direction)
+    if wide is None:
+        tables = SP_table if direction == 'encrypt' else SP_inv_table
+        wide = [[tables[2 * j][b & 0xFF] | tables[2 * j + 1][b >> 8] for b in xrange(1 << 16)] for j in xrange(4)]
+        _wide_tables[direction] = wide
+    return wide
+
+
+def _lookupSource(name, bits):
+    """Source of one table round on state: OR of the lookups name0, name1, ... on bits-wide slices"""
+    mask = (1 << bits) - 1
+    count = 64 // bits
+    return ' | '.join(['%s0[state & 0x%X]' % (name, mask)] +
+                      ['%s%d[(state >> %d) & 0x%X]' % (name, j, bits * j, mask) for j in xrange(1, count - 1)] +
+                      ['%s%d[state >> %d]' % (name, count - 1, 64 - bits)])
+
+
+def _compiledCode(rounds, direction):
+    """Generate and compile the round function of a round count and direction
+
+    The function takes (state, roundkeys) like the other engines, but ignores roundkeys:
+    the lookup tables (w0..w3, plus p0..p7 and u0..u7 for decryption) and the roundkeys
+    k0..kn are parameters with default values bound by compileRounds, so every round is one
+    line of local variable lookups without loops or calls."""
+    code = _compiled_code.get((rounds, direction))
+    if code is not None:
+        return code
+    tables = ['w%d' % j for j in xrange(4)]
+    if direction == 'decrypt':
+        tables += ['%s%d' % (name, j) for name in 'pu' for j in xrange(8)]
+    parameters = ['state', 'roundkeys=None'] + ['%s=None' % name for name in tables] + \
+                 ['k%d=None' % i for i in xrange(rounds)]
+    lines = ['def %s(%s):' % (direction, ', '.join(parameters)), '    state ^= k0']
+    if rounds > 1 and direction == 'encrypt':
+        for i in xrange(1, rounds):
+            lines.append('    state = (%s) ^ k%d' % (_lookupSource('w', 16), i))
+    elif rounds > 1:
+        # regrouped like decryptTable: P_inv, then SP_inv and key for the inner rounds, then S_inv
+        lines.append('    state = %s' % _lookupSource('p', 8))
+        for i in xrange(1, rounds - 1):
+            lines.append('    state = (%s) ^ k%d' % (_lookupSource('w', 16), i))
+        lines.append('    state = (%s) ^ k%d' % (_lookupSource('u', 8), rounds - 1))
+    lines.append('    return state')
+    namespace = {}
+    exec compile('\n'.join(lines) + '\n', '<present %s %d rounds>' % (direction, rounds), 'exec') in namespace
+    code = namespace[direction].func_code
+    _compiled_code[(rounds, direction)] = code
+    return code
+
+
+def compileRounds(roundkeys, direction='encrypt'):
+    """Straight-line round function specialised to a key schedule
+
+    Input:  list of 64-bit roundkeys (for decryption as prepared by decryptionRoundkeysTable),
+            'encrypt' or 'decrypt'
+    Output: function(state, roundkeys=None) -> state"""
+    code = _compiledCode(len(roundkeys), direction)
+    tables = _wideTables(direction)
+    if direction == 'decrypt':
+        tables = tables + P_inv_table + S_inv_table
+    return types.FunctionType(code, globals(), direction, tuple([None] + tables + list(roundkeys)))
+
+
+# below this many blocks encrypt_blocks/decrypt_blocks use the instance engine block by block,
+# the fixed cost of the bitsliced circuit is not amortised yet
+BITSLICE_THRESHOLD = 32
+
+# engine name: (encrypt function, decrypt function, decryption roundkeys preparation or None)
+# the functions are None for engines of SPECIALISED_ENGINES, which have no generic form
+ENGINES = {
+    'reference': (encryptReference, decryptReference, None),
+    'table': (encryptTable, decryptTable, decryptionRoundkeysTable),
+    'compiled': (None, None, decryptionRoundkeysTable),
+}
+
+# engines whose round functions Present specialises to its key schedule (once per cached
+# schedule, see Present._prepared): engine name: function(roundkeys, direction) -> function(state, roundkeys)
+SPECIALISED_ENGINES = {
+    'compiled': compileRounds,
+}
+
+
+def _splitBlocks(data):
+    data = _toString(data)
+    if len(data) % 8:
+        raise ValueError("Buffer length must be a multiple of 8 bytes")
+    return [data[i:i + 8] for i in xrange(0, len(data), 8)]
+
+
+# big-endian packers of the common fixed sizes, by length in bytes
+_FIXED_STRUCTS = dict((size, struct.Struct('>' + code)) for size, code in ((1, 'B'), (2, 'H'), (4, 'I'), (8, 'Q')))
+
+# blocks converted per struct call by encrypt_into/decrypt_into
+INTO_CHUNK_BLOCKS = 4096
+
+
+def _toString(data):
+    """Raw string of the bytes of a buffer: raw string, bytearray, memoryview or array"""
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    if isinstance(data, (bytearray, array)):
+        return str(buffer(data))
+    return str(data)
+
+
+def _byteLength(buf):
+    return len(buf) * getattr(buf, 'itemsize', 1)
+
+
 def string2number(i):
     """ Convert a string to a number
 
-    Input: string (big-endian)
+    Input: raw string or any buffer: bytearray, memoryview, array (big-endian)
     Output: long or integer
     """
-    return int(i.encode('hex'), 16)
+    fixed = _FIXED_STRUCTS.get(len(i))
+    if fixed is not None:
+        try:
+            return fixed.unpack(i)[0]
+        except struct.error:
+            # arrays of wider items: len() counts items, not bytes
+            pass
+    return int(binascii.hexlify(i), 16)
 
 
 def number2string_N(i, N):
     """Convert a number to a string of fixed size
 
-    i: long or integer
+    i: long or integer, 0 <= i < 2 ** (8 * N)
     N: length of string
-    Output: string (big-endian)
+    Output: string (big-endian); ValueError if i does not fit in N bytes
     """
-    s = '%0*x' % (N * 2, i)
-    return s.decode('hex')
+    fixed = _FIXED_STRUCTS.get(N)
+    if fixed is not None:
+        try:
+            return fixed.pack(i)
+        except struct.error:
+            raise ValueError("%d does not fit in %d bytes" % (i, N))
+    if i < 0 or i >> (8 * N):
+        raise ValueError("%d does not fit in %d bytes" % (i, N))
+    return binascii.unhexlify('%0*x' % (N * 2, i))
 
 
 def _test():
@@ -0,0 +1,96 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" Resumable sharded runs over a process pool
+
+Long searches and studies (present.keysearch, gmac.n1_study) split their work into shards
+whose results do not depend on the order they finish in. run_shards hands the shards to a
+process pool (or runs them in this process), records every result as it arrives, writes a
+checkpoint periodically and at the end, and reports progress. The checkpoint is a JSON file
+holding the run parameters and the caller's contents; load_checkpoint refuses a checkpoint
+written for other parameters.
+
+USAGE EXAMPLE:
+---------------
+>>> results = []
+>>> run_shards(abs, [-1, -2, 3], results.append, processes=1)
+>>> sorted(results)
+[1, 2, 3]
+"""
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+
+def load_checkpoint(path, parameters):
+    """Contents of the checkpoint at path, None if there is none
+
+    Raises ValueError if the checkpoint was written for other parameters"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    if checkpoint['parameters'] != parameters:
+        raise ValueError("Checkpoint %s was written for %r, not %r" % (path, checkpoint['parameters'], parameters))
+    return checkpoint
+
+
+def save_checkpoint(path, parameters, contents):
+    """Write parameters and contents (a dict of JSON values) to path atomically"""
+    checkpoint = dict(contents)
+    checkpoint['parameters'] = parameters
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.rename(temporary, path)
+
+
+def eta(elapsed, done, remaining):
+    """Seconds left for remaining units of work after done units took elapsed seconds"""
+    return elapsed / done * remaining if done else 0.0
+
+
+def run_shards(function, tasks, record, processes=None, initializer=None, initargs=(), save=None,
+               checkpoint_interval=60.0, progress=None, report=None):
+    """Run function over every task, in a process pool unless processes is 1
+
+    function:            worker function of one task, defined at module level so it can be pickled
+    tasks:               iterable of tasks
+    record:              called in this process with every result, in the order they finish
+    processes:           worker count, multiprocessing.cpu_count() by default, 1 runs in this process
+    initializer:         called with initargs in every worker (in this process with processes=1)
+    save:                writes the checkpoint, every checkpoint_interval seconds and at the end;
+                         None without checkpoint
+    progress:            stream for progress reports, None to disable them
+    report:              function(elapsed seconds) -> progress line, called after every result
+    """
+    started = last_save = time.time()
+    pool = None
+    if processes == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        results = itertools.imap(function, tasks)
+    else:
+        pool = multiprocessing.Pool(processes, initializer, initargs)
+        results = pool.imap_unordered(function, tasks)
+    try:
+        for result in results:
+            record(result)
+            now = time.time()
+            if save is not None and now - last_save >= checkpoint_interval:
+                save()
+                last_save = now
+            if progress is not None:
+                progress.write(report(now - started) + '\n')
+        if pool is not None:
+            pool.close()
+    except BaseException:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
+        if save is not None:
+            save()
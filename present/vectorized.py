@@ -0,0 +1,93 @@
+__author__ = 'Iurii Sergiichuk'
+
+""" NumPy vectorized PRESENT over arrays of 64-bit blocks
+
+Every round runs once over the whole array: the S-box and permutation layers are applied
+together as a gather from the byte-indexed SP tables of the table engine, indexed by the
+uint8 view of the state array. NumPy is optional, HAVE_NUMPY tells whether it is available.
+
+USAGE EXAMPLE:
+---------------
+>>> import numpy
+>>> from present.pyPresent import Present
+>>> cipher = Present("00000000000000000000".decode('hex'))
+>>> encrypted = cipher.encrypt_array(numpy.zeros(2, dtype=numpy.uint64))
+>>> ['%016x' % c for c in encrypted]
+['5579c1387b228445', '5579c1387b228445']
+"""
+import sys
+
+from present._compat import numpy, HAVE_NUMPY, require_numpy
+from present.pyPresent import SP_table, SP_inv_table, P_inv_table, S_inv_bytes, _byteLength
+
+if HAVE_NUMPY:
+    SP_array = numpy.array(SP_table, dtype=numpy.uint64)
+    SP_inv_array = numpy.array(SP_inv_table, dtype=numpy.uint64)
+    P_inv_array = numpy.array(P_inv_table, dtype=numpy.uint64)
+    S_inv_array = numpy.array(S_inv_bytes, dtype=numpy.uint8)
+    # column _BYTE_COLUMN[j] of the (n, 8) uint8 view holds byte j (counted from the least significant byte)
+    _BYTE_COLUMN = range(8) if sys.byteorder == 'little' else range(7, -1, -1)
+
+
+def _require_numpy():
+    require_numpy("the vectorized PRESENT engine")
+
+
+def roundkeysVector(roundkeys):
+    """Convert a list of 64-bit roundkeys into a uint64 vector"""
+    _require_numpy()
+    return numpy.array(roundkeys, dtype=numpy.uint64)
+
+
+def _byteGather(states, tables):
+    """OR together tables[j][byte j of state] for every state"""
+    columns = states.view(numpy.uint8).reshape(-1, 8)
+    output = tables[0].take(columns[:, _BYTE_COLUMN[0]])
+    for j in xrange(1, 8):
+        output |= tables[j].take(columns[:, _BYTE_COLUMN[j]])
+    return output
+
+
+def encryptArray(states, roundkeys):
+    """Encrypt an array of 64-bit states
+
+    Input:  uint64 array, uint64 vector of roundkeys (K1 ... Kn)
+    Output: new uint64 array"""
+    _require_numpy()
+    state = numpy.array(states, dtype=numpy.uint64).reshape(-1)
+    for roundkey in roundkeys[:-1]:
+        state ^= roundkey
+        state = _byteGather(state, SP_array)
+    state ^= roundkeys[-1]
+    return state.reshape(numpy.shape(states))
+
+
+def decryptArray(states, roundkeys):
+    """Decrypt an array of 64-bit states
+
+    Input:  uint64 array, uint64 vector of roundkeys prepared by decryptionRoundkeysTable
+    Output: new uint64 array"""
+    _require_numpy()
+    state = numpy.array(states, dtype=numpy.uint64).reshape(-1)
+    if len(roundkeys) > 1:
+        state ^= roundkeys[0]
+        state = _byteGather(state, P_inv_array)
+        for roundkey in roundkeys[1:-1]:
+            state = _byteGather(state, SP_inv_array)
+            state ^= roundkey
+        state = S_inv_array[state.view(numpy.uint8)].view(numpy.uint64)
+    state ^= roundkeys[-1]
+    return state.reshape(numpy.shape(states))
+
+
+def buffer2states(data):
+    """Read a buffer of big-endian 8-byte blocks into a uint64 array"""
+    _require_numpy()
+    if _byteLength(data) % 8:
+        raise ValueError("Buffer length must be a multiple of 8 bytes")
+    return numpy.frombuffer(data, dtype='>u8').astype(numpy.uint64)
+
+
+def states2buffer(states):
+    """Write a uint64 array as a string of big-endian 8-byte blocks"""
+    return states.astype('>u8').tostring()
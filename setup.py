@@ -4,6 +4,7 @@ setup(
     name='present',
     version='0.0.2',
     packages=['present', 'gmac', 'gmac/util'],
+    scripts=['scripts/present'],
     url='https://github.com/xSAVIKx/present',
     license='Apache License, Version 2.0',
     author='Iurii Sergiichuk',
@@ -50,6 +50,112 @@ def test_n1():
     return (n1_max_average, n1_ghash_max_average)
 
 
+def test_ghash_tables_match_bitwise():
+    for key in (0, 235, 0xFFFF):
+        gmac = GMAC(key)
+        sub_key = gmac._get_subkey(key)
+        for block in xrange(0x10000):
+            assert gmac._gHash(block, sub_key) == gmac._gHash_bitwise(block, sub_key)
+    assert GMAC(235).generate(17927, 21313) == 17230
+
+
+def reference_generate(gmac, open_text, IV):
+    """generate() as originally written: GCTR and gHash recomputed for every 16-bit block"""
+    result = 0
+    sub_key = gmac._get_subkey(gmac._key)
+    while open_text > 0:
+        gctr = gmac._GCTR(IV, gmac._key)
+        result = gmac._gHash_bitwise(open_text & 0xFFFF, sub_key) ^ gctr
+        open_text >>= 16
+    return result
+
+
+def test_generate_matches_reference():
+    rng = random.Random(11)
+    for _ in xrange(200):
+        gmac = GMAC(rng.getrandbits(16))
+        open_text = rng.getrandbits(rng.choice((8, 16, 40, 64)))
+        IV = generate_IV()
+        assert gmac.generate(open_text, IV) == reference_generate(gmac, open_text, IV)
+
+
+def test_stream():
+    rng = random.Random(12)
+    key, IV = 235, 21313
+    gmac = GMAC(key)
+    sub_key = gmac._get_subkey(key)
+    for length in (0, 1, 2, 3, 1000):
+        data = ''.join(chr(rng.getrandbits(8)) for _ in xrange(length))
+        padded = data + '\x00' * (length % 2)
+        state = 0
+        for i in xrange(0, len(padded), 2):
+            state = gmac._gHash_bitwise(state ^ int(padded[i:i + 2].encode('hex'), 16), sub_key)
+        state = gmac._gHash_bitwise(state ^ (length * 8 & 0xFFFF), sub_key)
+        tag = '%04x' % (state ^ gmac._GCTR(IV, key))
+        mac = GMAC.new(key, IV)
+        for i in xrange(0, length, 7):
+            mac.update(memoryview(data[i:i + 7]))
+        assert mac.hexdigest() == tag
+        assert GMAC.new(key, IV, data).hexdigest() == tag
+        mac.verify(tag.decode('hex'))
+        copy = mac.copy()
+        copy.update('x')
+        assert mac.hexdigest() == tag and copy.hexdigest() != tag
+        try:
+            copy.verify(tag.decode('hex'))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("verify accepted a wrong tag")
+
+
+def test_n1_study_resumes_from_checkpoint():
+    import json
+    import os
+    import shutil
+    import tempfile
+    from gmac import n1_study
+    directory = tempfile.mkdtemp()
+    try:
+        checkpoint = os.path.join(directory, 'n1.json')
+        expected = n1_study.merge(dict(((i, j), n1_study.run_shard(i, j, 64, 3)[2:])
+                                       for i in xrange(2) for j in xrange(2)), 2)
+        assert n1_study.run_study(2, 64, 3, 2, checkpoint, progress=None) == expected
+        with open(checkpoint) as checkpoint_file:
+            saved = json.load(checkpoint_file)
+        assert len(saved['shards']) == 4
+        saved['shards'] = saved['shards'][:1]
+        with open(checkpoint, 'w') as checkpoint_file:
+            json.dump(saved, checkpoint_file)
+        assert n1_study.run_study(2, 64, 3, 2, checkpoint, progress=None) == expected
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_state_before_generate():
+    gmac = GMAC(235)
+    assert not hasattr(gmac, '__dict__')
+    assert gmac.get_state() == 0
+    gmac.generate(17927, 21313)
+    assert gmac.get_state() != 0 and GMAC(235).get_state() == 0
+
+
+def test_gmac_batch():
+    from gmac.batch import gmac_batch, _gmac_batch_scalar, DEFAULT_FIELD_POLYNOM
+    rng = random.Random(7)
+    keys = [rng.getrandbits(17) for _ in xrange(500)]
+    messages = [rng.choice([0, 1, 1 << 32, rng.getrandbits(16), rng.getrandbits(48)]) for _ in xrange(500)]
+    IVs = [rng.choice([0, 255, 256, generate_IV(rng)]) for _ in xrange(500)]
+    tags, states = gmac_batch(keys, messages, IVs)
+    expected = _gmac_batch_scalar(keys, messages, IVs, 16, DEFAULT_FIELD_POLYNOM)
+    assert [int(tag) for tag in tags] == expected[0]
+    assert [int(state) for state in states] == expected[1]
+    for key, message, IV, tag, state in zip(keys, messages, IVs, tags, states)[:50]:
+        gmac = GMAC(key)
+        assert gmac.generate(message, IV) == tag
+        assert gmac.get_state() == state
+
+
 if __name__ == "__main__":
     n1_result = test_n1()
     with open('./n1_result.txt', 'w+') as n1_result_file:
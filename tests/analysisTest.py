@@ -0,0 +1,64 @@
+from present import keyspace
+from present.analysis import ddt, lat, TrailSearch, mini_trail_search, empirical_ddt
+from present.miniPresent import pLayer as mini_pLayer
+from present.pyPresent import Sbox, PBox, pLayer
+
+__author__ = 'Iurii Sergiichuk'
+
+
+def test_tables_match_definition():
+    differences = ddt()
+    approximations = lat()
+    for a in xrange(16):
+        for b in xrange(16):
+            assert differences[a, b] == sum(1 for x in xrange(16) if Sbox[x] ^ Sbox[x ^ a] == b)
+            agree = sum(1 for x in xrange(16) if bin(a & x).count('1') % 2 == bin(b & Sbox[x]).count('1') % 2)
+            assert approximations[a, b] == agree - 8
+    assert differences[1:, 1:].max() == 4 and abs(approximations[1:, 1:]).max() == 4
+
+
+def check_trail(search, trail, pbox_layer):
+    weight = 0.0
+    for i, (state, output) in enumerate(trail.rounds):
+        for j in xrange(search.nibbles):
+            a, b = (state >> (4 * j)) & 0xF, (output >> (4 * j)) & 0xF
+            assert (a == 0) == (b == 0)
+            if a:
+                weight += dict((v, w) for w, v in search.transitions[a])[b]
+        if i + 1 < len(trail.rounds):
+            assert pbox_layer(output) == trail.rounds[i + 1][0]
+    assert abs(weight - trail.weight) < 1e-9
+
+
+def test_present_trail_bounds():
+    differential = TrailSearch.differential(PBox)
+    assert [differential.best(rounds).weight for rounds in xrange(1, 5)] == [2.0, 4.0, 8.0, 12.0]
+    linear = TrailSearch.linear(PBox)
+    assert [linear.best(rounds).weight for rounds in xrange(1, 5)] == [1.0, 2.0, 4.0, 6.0]
+    for search in (differential, linear):
+        for rounds in xrange(1, 5):
+            check_trail(search, search.best(rounds), pLayer)
+
+
+def test_mini_trails_bound_the_empirical_differentials():
+    search = mini_trail_search()
+    sp_layer = keyspace.SP_array
+    trail = search.best(2)
+    check_trail(search, trail, mini_pLayer)
+    # one S-box layer: the key does not change differences
+    keys = range(0, 1 << 16, 997)
+    counts = empirical_ddt(rounds=2, keys=keys, processes=1)
+    assert (counts == len(keys) * ddt(list(sp_layer))).all()
+    assert counts[1:, 1:].max() == len(keys) * 256 * 2 ** -search.best(1).weight
+    counts = empirical_ddt(rounds=3, keys=keys, processes=2, shard_keys=16)
+    assert (counts == empirical_ddt(rounds=3, keys=keys, processes=1)).all()
+    assert (counts.sum(axis=1) == len(keys) * 256).all()
+    # the best trail's differential holds with at least the trail's probability on average
+    (a, _), (_, b) = trail.rounds[0], trail.rounds[-1]
+    assert counts[a, mini_pLayer(b)] >= len(keys) * 256 * 2 ** -trail.weight
+
+
+if __name__ == "__main__":
+    test_tables_match_definition()
+    test_present_trail_bounds()
+    test_mini_trails_bound_the_empirical_differentials()
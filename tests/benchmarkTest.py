@@ -0,0 +1,34 @@
+from benchmarks import suite
+from present.keycache import key_schedule_cache
+
+__author__ = 'Iurii Sergiichuk'
+
+
+def test_run_report():
+    report = suite.run('keysetup.generateRoundkeys16|gmac.stream.64B', min_time=0.001, repeat=1, hz=1e9, progress=None)
+    assert sorted(report['results']) == ['gmac.stream.64B', 'keysetup.generateRoundkeys16']
+    assert report['results']['keysetup.generateRoundkeys16']['cycles_per_byte'] is None
+    stream = report['results']['gmac.stream.64B']
+    assert abs(stream['bytes_per_s'] - 64 * stream['ops_per_s']) < 1e-6 * stream['bytes_per_s']
+
+
+def test_fixtures_built_on_demand():
+    info = key_schedule_cache.cache_info()
+    names = [benchmark.name for benchmark in suite.benchmarks()]
+    assert key_schedule_cache.cache_info() == info
+    assert 'keysetup.Present.table' in names and 'keysetup.Present.compiled.uncached' in names
+    report = suite.run(r'keysetup\.Present\.table', min_time=0.001, repeat=1, progress=None)
+    assert sorted(report['results']) == ['keysetup.Present.table', 'keysetup.Present.table.uncached']
+
+
+def test_compare():
+    baseline = {'results': {'a': {'ops_per_s': 100.0}, 'b': {'ops_per_s': 100.0}, 'c': {'ops_per_s': 100.0}}}
+    report = {'results': {'a': {'ops_per_s': 95.0}, 'b': {'ops_per_s': 80.0}, 'd': {'ops_per_s': 1.0}}}
+    assert suite.compare(report, baseline, 0.1) == [('b', 100.0, 80.0, 0.8)]
+    assert suite.compare(report, baseline, 0.25) == []
+
+
+if __name__ == "__main__":
+    test_run_report()
+    test_fixtures_built_on_demand()
+    test_compare()
@@ -0,0 +1,56 @@
+import os
+import random
+import shutil
+import tempfile
+
+from present import cli
+from present.modes import CBC
+from present.pyPresent import Present
+
+__author__ = 'Iurii Sergiichuk'
+
+KEY = "0123456789abcdef0123"
+
+
+def test_encrypt_decrypt_files():
+    directory = tempfile.mkdtemp()
+    try:
+        plain, encrypted, decrypted = [os.path.join(directory, name) for name in ('plain', 'enc', 'dec')]
+        rng = random.Random(8)
+        data = ''.join(chr(rng.getrandbits(8)) for _ in xrange(5000))
+        with open(plain, 'wb') as plain_file:
+            plain_file.write(data)
+        for mode in sorted(cli.MODES):
+            assert cli.main(['encrypt', '--key', KEY, '--mode', mode, '--chunk-size', '64', '-q',
+                             plain, '-o', encrypted]) == 0
+            assert cli.main(['decrypt', '--key', KEY, '--mode', mode, '-q', encrypted, '-o', decrypted]) == 0
+            with open(decrypted, 'rb') as decrypted_file:
+                assert decrypted_file.read() == data
+        iv = "0000000000000001"
+        assert cli.main(['encrypt', '--key', KEY, '--mode', 'cbc', '--iv', iv, '-q', plain, '-o', encrypted]) == 0
+        with open(encrypted, 'rb') as encrypted_file:
+            assert encrypted_file.read() == CBC(Present(KEY.decode('hex')), iv.decode('hex')).encrypt(data)
+        assert cli.main(['encrypt', '--key', 'zz', '-q', plain, '-o', encrypted]) == 1
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_pipeline_propagates_writer_errors():
+    class Failure(Exception):
+        pass
+
+    def write(data):
+        raise Failure()
+
+    context = CBC(Present(KEY.decode('hex')), '\x00' * 8).encryptor()
+    try:
+        cli.run_pipeline(('x' * 64 for _ in xrange(1000)), context, write, depth=2)
+    except Failure:
+        pass
+    else:
+        raise AssertionError("writer error was swallowed")
+
+
+if __name__ == "__main__":
+    test_encrypt_decrypt_files()
+    test_pipeline_propagates_writer_errors()
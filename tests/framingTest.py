@@ -0,0 +1,99 @@
+import random
+import socket
+from unittest import SkipTest
+
+from present.framing import FrameEncoder, FrameDecoder, HEADER, NONCE_SIZE, new_nonce, peer_iv, session_iv
+from present.modes import xorStrings
+
+__author__ = 'Iurii Sergiichuk'
+
+KEY = "0123456789abcdef0123".decode('hex')
+IV = "fedcba9876543210".decode('hex')
+
+
+def test_frames_round_trip():
+    rng = random.Random(9)
+    for mac_key in (None, 0xBEEF):
+        encoder, decoder = FrameEncoder(KEY, IV, mac_key), FrameDecoder(KEY, IV, mac_key)
+        for size in (0, 1, 7, 8, 9, 300, 5000):
+            payload = ''.join(chr(rng.getrandbits(8)) for _ in xrange(size))
+            frame = encoder.seal(payload)
+            header, body = frame[:HEADER.size], frame[HEADER.size:]
+            assert decoder.body_length(header) == len(body)
+            assert decoder.open(header, body) == payload
+    assert FrameEncoder(KEY, IV).seal("x" * 16)[4:12] != FrameEncoder(KEY, peer_iv(IV)).seal("x" * 16)[4:12]
+
+
+def test_frames_reject_tampering():
+    encoder, decoder = FrameEncoder(KEY, IV, 0xBEEF), FrameDecoder(KEY, IV, 0xBEEF)
+    frame = encoder.seal("attack at dawn")
+    tampered = frame[:5] + chr(ord(frame[5]) ^ 1) + frame[6:]
+    try:
+        decoder.open(tampered[:HEADER.size], tampered[HEADER.size:])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("tampered frame accepted")
+
+
+def test_sessions_use_distinct_keystreams():
+    first, second = "attack at dawn!!" * 2, "retreat at noon!" * 2
+    assert len(new_nonce()) == NONCE_SIZE and new_nonce() != new_nonce()
+    nonces = "0011223344556677".decode('hex'), "8899aabbccddeeff".decode('hex')
+    frames = [FrameEncoder(KEY, session_iv(IV, nonce), 0xBEEF).seal(payload)
+              for nonce, payload in zip(nonces, (first, second))]
+    bodies = [frame[HEADER.size:HEADER.size + len(first)] for frame in frames]
+    assert xorStrings(*bodies) != xorStrings(first, second)
+    assert frames[0][-2:] != FrameEncoder(KEY, session_iv(IV, nonces[1]), 0xBEEF).seal(first)[-2:]
+    decoder = FrameDecoder(KEY, session_iv(IV, nonces[1]), 0xBEEF)
+    assert decoder.open(frames[1][:HEADER.size], frames[1][HEADER.size:]) == second
+
+
+def test_asyncio_streams():
+    try:
+        import trollius as asyncio
+        from trollius import From
+        from present import aio
+    except ImportError:
+        raise SkipTest("the asyncio adapter needs the trollius backport")
+    loop = asyncio.new_event_loop()
+    payloads = ["attack at dawn", "", "x" * (aio.OFFLOAD_THRESHOLD + 5)]
+
+    @asyncio.coroutine
+    def echo(reader, writer):
+        while True:
+            frame = yield From(reader.read_frame())
+            if frame is None:
+                break
+            yield From(writer.write_frame(frame))
+        writer.close()
+
+    @asyncio.coroutine
+    def session():
+        server_socket, client_socket = socket.socketpair()
+        server_streams = yield From(asyncio.open_connection(sock=server_socket, loop=loop))
+        reader, writer = yield From(aio.open_secure_connection(KEY, IV, mac_key=0xBEEF, loop=loop,
+                                                               sock=client_socket))
+        accepted = yield From(aio.accept_streams(server_streams[0], server_streams[1], KEY, IV, 0xBEEF, loop))
+        server = asyncio.Task(echo(*accepted), loop=loop)
+        for payload in payloads:
+            yield From(writer.write_frame(payload))
+            echoed = yield From(reader.read_frame())
+            assert echoed == payload
+        writer.close()
+        yield From(server)
+
+    try:
+        loop.run_until_complete(session())
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    test_frames_round_trip()
+    test_frames_reject_tampering()
+    test_sessions_use_distinct_keystreams()
+    try:
+        test_asyncio_streams()
+    except SkipTest as skip:
+        print "test_asyncio_streams skipped: %s" % skip
@@ -0,0 +1,110 @@
+import random
+
+import gmac.util.galue_fields as galue_fields
+from gmac.util.galue_fields import setGF2, getGF2, i2P, multGF2, invGF2, powGF2, GF2Field, int2Poly, poly2Int, \
+    hdMultGF2
+from gmac.util.large_fields import clmul, square
+
+__author__ = 'Iurii Sergiichuk'
+
+GMAC_POLYNOM = 0b10001000000001011
+
+
+def test_log_tables_match_shift_and_add():
+    rng = random.Random(16)
+    setGF2(16, i2P(GMAC_POLYNOM))
+    assert galue_fields.logTable is not None
+    for _ in xrange(10000):
+        a = rng.getrandbits(16)
+        b = rng.getrandbits(16)
+        assert multGF2(a, b) == galue_fields.field._multGF2Loop(a, b)
+    setGF2(8, i2P(0b100011011))
+    for a in xrange(256):
+        for b in xrange(256):
+            assert multGF2(a, b) == galue_fields.field._multGF2Loop(a, b)
+
+
+def test_inverse_and_power():
+    # x^4 + x^3 + x^2 + x + 1 is irreducible, but x is not a primitive element
+    for degree, polynom in ((16, GMAC_POLYNOM), (4, 0b11111)):
+        setGF2(degree, i2P(polynom))
+        for a in xrange(1, min(1 << degree, 5000)):
+            assert multGF2(a, invGF2(a)) == 1
+            assert powGF2(a, 3) == multGF2(a, multGF2(a, a))
+            assert powGF2(a, -1) == invGF2(a)
+
+
+def test_reducible_polynom_has_no_tables():
+    setGF2(8, i2P(0b100000001))
+    assert galue_fields.logTable is None
+    assert multGF2(0b10, 0b10000000) == 1
+
+
+def test_fields_are_independent():
+    small = getGF2(8, i2P(0b100011011))
+    large = getGF2(16, i2P(GMAC_POLYNOM))
+    assert getGF2(8, i2P(0b100011011)) is small
+    setGF2(3, i2P(0b1011))
+    assert small.multGF2(0b10, 0b10000000) == 0b11011
+    assert large.multGF2(0b10, 0b1000000000000000) == 0b1000000001011
+    assert multGF2(0b10, 0b100) == 0b11
+    assert not hasattr(small, '__dict__')
+    assert GF2Field(8, i2P(0b100011011)).logTable == small.logTable
+
+
+def test_large_fields_match_shift_and_add():
+    rng = random.Random(571)
+    # NIST B-571, a trinomial and a dense polynom
+    for degree, polynom in ((571, [571, 10, 5, 2, 0]), (233, [233, 74, 0]),
+                            (100, [100] + sorted(rng.sample(range(1, 100), 30), reverse=True) + [0])):
+        field = GF2Field(degree, polynom)
+        assert field.large is not None
+        for _ in xrange(100):
+            a = rng.getrandbits(degree)
+            b = rng.getrandbits(rng.choice((degree, 2 * degree)))
+            assert field.multGF2(a, b) == field._multGF2Loop(a, b)
+        a = rng.getrandbits(degree) | 1
+        exponent = rng.getrandbits(degree)
+        assert field.powGF2(a, exponent) == field._powGF2Loop(a, exponent % field.mask2)
+        assert field.invGF2(a) == field._powGF2Loop(a, field.mask2 - 1)
+    field = getGF2(571, [571, 10, 5, 2, 0])
+    a = rng.getrandbits(571)
+    assert field.multGF2(a, field.invGF2(a)) == 1
+    setGF2(571, [571, 10, 5, 2, 0])
+    assert int2Poly(hdMultGF2([518, 447, 320, 209, 119, 1, 0], [287, 145, 82, 44])) == \
+        int2Poly(galue_fields.field._multGF2Loop(poly2Int([518, 447, 320, 209, 119, 1, 0]),
+                                                 poly2Int([287, 145, 82, 44])))
+
+
+def test_large_fields_reject_polynoms_divisible_by_x():
+    try:
+        GF2Field(571, [571, 10, 5, 2, 1])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("x^571 + x^10 + x^5 + x^2 + x accepted")
+
+
+def test_carry_less_helpers():
+    rng = random.Random(2)
+    for bits in (1, 64, 571, 3000):
+        a = rng.getrandbits(bits)
+        b = rng.getrandbits(bits)
+        expected = 0
+        for i in xrange(b.bit_length()):
+            if b >> i & 1:
+                expected ^= a << i
+        assert clmul(a, b) == expected
+        assert square(a) == clmul(a, a)
+    assert int2Poly(0) == [] and int2Poly(0b1011) == [3, 1, 0]
+    assert poly2Int(int2Poly(1 << 600 | 5)) == 1 << 600 | 5
+
+
+if __name__ == "__main__":
+    test_log_tables_match_shift_and_add()
+    test_inverse_and_power()
+    test_reducible_polynom_has_no_tables()
+    test_fields_are_independent()
+    test_large_fields_match_shift_and_add()
+    test_large_fields_reject_polynoms_divisible_by_x()
+    test_carry_less_helpers()
@@ -0,0 +1,85 @@
+import json
+
+from gmac import pyGMAC
+from gmac.pyGMAC import GMAC
+from present import instrumentation, modes, pyPresent
+from present.keycache import KeyScheduleCache
+from present.miniPresent import MiniPresent
+from present.pyPresent import Present
+
+__author__ = 'Iurii Sergiichuk'
+
+
+def _originals():
+    return (pyPresent.string2number, modes.string2number, pyGMAC.number2string_N, pyPresent.sBoxLayer,
+            Present.__dict__['encrypt_blocks'], MiniPresent.__dict__['encrypt'], KeyScheduleCache.__dict__['get'],
+            GMAC.__dict__['_gHash'])
+
+
+def test_enable_disable_restores_originals():
+    originals = _originals()
+    instrumentation.enable()
+    try:
+        assert instrumentation.is_enabled()
+        assert modes.string2number is not originals[1] and pyGMAC.number2string_N is not originals[2]
+        instrumentation.enable(timing=True)
+    finally:
+        instrumentation.disable()
+    assert not instrumentation.is_enabled()
+    assert _originals() == originals
+
+
+def test_counters_and_exports():
+    instrumentation.reset()
+    instrumentation.enable(timing=True)
+    try:
+        cipher = Present("fedcba98765432100123".decode('hex'), 3, engine='reference')
+        cipher.encrypt_blocks(["12345678"] * 5)
+        cipher.decrypt("12345678")
+        GMAC(4242).generate(0x1234, 7)
+    finally:
+        instrumentation.disable()
+    counters = instrumentation.snapshot()['counters']
+    assert counters['present_blocks_total{cipher="present",op="encrypt"}'] == 5
+    assert counters['present_blocks_total{cipher="present",op="decrypt"}'] == 1
+    assert counters['present_layer_calls_total{cipher="present",layer="sBoxLayer"}'] == 10
+    assert counters['present_key_setups_total{schedule="generateRoundkeys80"}'] == 1
+    assert counters['gmac_operations_total{operation="generate"}'] == 1
+    histograms = json.loads(instrumentation.to_json())['histograms']
+    generate = histograms['present_stage_seconds{stage="gmac.generate"}']
+    assert generate['count'] == 1 and generate['buckets']['+Inf'] == 1
+    text = instrumentation.to_prometheus()
+    assert '# TYPE present_stage_seconds histogram' in text
+    assert 'present_stage_seconds_count{stage="gmac.generate"} 1' in text
+    instrumentation.reset()
+    assert instrumentation.snapshot()['counters'] == {}
+
+
+def test_nested_calls_counted_once():
+    from present import vectorized
+    cipher = Present("fedcba98765432100123".decode('hex'))
+    have_numpy = vectorized.HAVE_NUMPY
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        cipher.encrypt_array("12345678" * 4)
+        # without NumPy encrypt_array falls back to encrypt_blocks
+        vectorized.HAVE_NUMPY = False
+        cipher.decrypt_array("12345678" * 3)
+        GMAC(4242).generate(0x1234, 7)
+    finally:
+        vectorized.HAVE_NUMPY = have_numpy
+        instrumentation.disable()
+    counters = instrumentation.snapshot()['counters']
+    assert counters['present_blocks_total{cipher="present",op="encrypt"}'] == 4
+    assert counters['present_blocks_total{cipher="present",op="decrypt"}'] == 3
+    # different labels: generate and the gHash it calls are both counted
+    assert counters['gmac_operations_total{operation="generate"}'] == 1
+    assert counters['gmac_operations_total{operation="gHash"}'] >= 1
+    instrumentation.reset()
+
+
+if __name__ == "__main__":
+    test_enable_disable_restores_originals()
+    test_counters_and_exports()
+    test_nested_calls_counted_once()
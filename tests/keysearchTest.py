@@ -0,0 +1,76 @@
+import os
+import random
+import shutil
+import tempfile
+
+from present.keysearch import search, split_key_bits, roundkey_deltas, KeySearch, save_checkpoint
+from present.pyPresent import encryptTable, generateRoundkeys80
+
+__author__ = 'Iurii Sergiichuk'
+
+rng = random.Random(25)
+
+
+def known_pairs(key, rounds, amount=2):
+    roundkeys = generateRoundkeys80(key, rounds)
+    return [(p, encryptTable(p, roundkeys)) for p in (rng.getrandbits(64) for _ in xrange(amount))]
+
+
+def test_key_bit_split():
+    assert split_key_bits(1) == (range(80), [])
+    for rounds in (2, 5, 9):
+        linear, nonlinear = split_key_bits(rounds)
+        assert len(nonlinear) == 4 * (rounds - 1)
+        deltas = roundkey_deltas(linear, rounds)
+        for _ in xrange(20):
+            key = rng.getrandbits(80)
+            bit = rng.choice(linear)
+            flipped = generateRoundkeys80(key ^ (1 << bit), rounds)
+            assert flipped == [a ^ d for a, d in zip(generateRoundkeys80(key, rounds), deltas[bit])]
+
+
+def test_search_finds_the_key():
+    for rounds in (3, 6, 12):
+        key = rng.getrandbits(80)
+        pairs = known_pairs(key, rounds)
+        linear, nonlinear = split_key_bits(rounds)
+        unknown = sum(1 << bit for bit in rng.sample(linear, 7) + rng.sample(nonlinear, 4))
+        expected = [candidate for candidate in (key & ~unknown | KeySearch(key, unknown, pairs, rounds, 0).key(b, 0)
+                                                for b in xrange(1 << 11))
+                    if all(encryptTable(p, generateRoundkeys80(candidate, rounds)) == c for p, c in pairs)]
+        assert expected == [key]
+        for lane_bits in (0, 5, 9):
+            assert search(key, unknown, pairs, rounds, processes=1, progress=None, lane_bits=lane_bits,
+                          shard_keys=64) == [key]
+    # a single pair leaves false positives in a large enough key space
+    assert key in search(key, unknown, pairs[:1], rounds, processes=2, progress=None, shard_keys=256)
+
+
+def test_search_resumes_from_checkpoint():
+    key = rng.getrandbits(80)
+    pairs = known_pairs(key, 4)
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'search.json')
+        assert search(key, 0xfffff, pairs, 4, processes=2, checkpoint=path, progress=None, shard_keys=1 << 14) == [key]
+        # a checkpoint claiming every shard is finished without keys: nothing is searched again
+        parameters = {'base_key': '%020x' % (key & ~0xfffff), 'unknown': '%020x' % 0xfffff, 'rounds': 4,
+                      'pairs': [['%016x' % p, '%016x' % c] for p, c in pairs],
+                      'lane_bits': 12, 'shard_keys': 1 << 14}
+        save_checkpoint(path, parameters, set(xrange(64)), set())
+        assert search(key, 0xfffff, pairs, 4, processes=1, checkpoint=path, progress=None, shard_keys=1 << 14) == []
+        # resuming with a single shard left searches only that shard: exactly one of them finds the key
+        found = []
+        for shard in xrange(64):
+            save_checkpoint(path, parameters, set(xrange(64)) - set([shard]), set())
+            found.append(search(key, 0xfffff, pairs, 4, processes=1, checkpoint=path, progress=None,
+                                shard_keys=1 << 14))
+        assert sorted(found) == [[]] * 63 + [[key]]
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_key_bit_split()
+    test_search_finds_the_key()
+    test_search_resumes_from_checkpoint()
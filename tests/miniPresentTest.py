@@ -1,6 +1,7 @@
 # coding=utf-8
 import pygal
 
+from present import keyspace
 from present.miniPresent import MiniPresent
 
 __author__ = 'Iurii Sergiichuk'
@@ -70,11 +71,17 @@ def test_enc_all_open_texts():
         results[0][init + 1] = init
     results[0][0] = '#'
     print("init ended")
-    for open_text in xrange(0, OPEN_TEXTS_MAX_LENGTH):
-        for key in xrange(0, KEYS_MAX_LENGTH):
-            cipher = MiniPresent(key)
-            encrypted_text = cipher.encrypt(open_text)
-            results[encrypted_text + 1][open_text + 1] += 1
+    if keyspace.HAVE_NUMPY:
+        histogram = keyspace.ciphertextHistogram(keyspace.codebook())
+        for encrypted_text in xrange(0, OPEN_TEXTS_MAX_LENGTH):
+            for open_text in xrange(0, OPEN_TEXTS_MAX_LENGTH):
+                results[encrypted_text + 1][open_text + 1] += int(histogram[encrypted_text, open_text])
+    else:
+        for open_text in xrange(0, OPEN_TEXTS_MAX_LENGTH):
+            for key in xrange(0, KEYS_MAX_LENGTH):
+                cipher = MiniPresent(key)
+                encrypted_text = cipher.encrypt(open_text)
+                results[encrypted_text + 1][open_text + 1] += 1
     print("results received. writing to the file")
     with open('./all_texts.txt', 'w+') as all_texts_file:
         all_texts_file.write('\t\t\tOPEN TEXTS\n')
@@ -0,0 +1,84 @@
+import random
+
+from present.modes import ECB, CBC, CTR, OFB, CFB, pad, unpad, xorStrings
+from present.miniPresent import MiniPresent
+from present.pyPresent import Present, number2string_N, string2number
+
+__author__ = 'Iurii Sergiichuk'
+
+rng = random.Random(1)
+
+
+def random_string(length):
+    return ''.join(chr(rng.getrandbits(8)) for _ in xrange(length))
+
+
+def reference_encrypt(mode, cipher, iv, data):
+    """Straightforward block-by-block implementation of every mode"""
+    size = cipher.get_block_size()
+    if mode in (ECB, CBC):
+        data = pad(data, size)
+    blocks = [data[i:i + size] for i in xrange(0, len(data), size)]
+    output = []
+    chain = iv
+    for i, block in enumerate(blocks):
+        if mode is ECB:
+            output.append(cipher.encrypt(block))
+        elif mode is CBC:
+            chain = cipher.encrypt(xorStrings(block, chain))
+            output.append(chain)
+        elif mode is CTR:
+            counter = number2string_N((string2number(iv) + i) % (1 << 8 * size), size)
+            output.append(xorStrings(block, cipher.encrypt(counter)[:len(block)]))
+        elif mode is OFB:
+            chain = cipher.encrypt(chain)
+            output.append(xorStrings(block, chain[:len(block)]))
+        elif mode is CFB:
+            chain = xorStrings(block, cipher.encrypt(chain)[:len(block)])
+            output.append(chain)
+    return ''.join(output)
+
+
+def test_modes_match_reference():
+    ciphers = [Present(random_string(10)), Present(random_string(16)), MiniPresent(rng.getrandbits(16))]
+    for cipher in ciphers:
+        size = cipher.get_block_size()
+        for mode in (ECB, CBC, CTR, OFB, CFB):
+            iv = '\xff' * size
+            for length in (0, 1, size, 3 * size + 1, 100):
+                data = random_string(length)
+                encrypted = mode(cipher, iv).encrypt(data)
+                assert encrypted == reference_encrypt(mode, cipher, iv, data)
+                assert mode(cipher, iv).decrypt(encrypted) == data
+
+
+def test_streaming_matches_one_shot():
+    cipher = Present(random_string(10))
+    data = random_string(1000)
+    for mode in (ECB, CBC, CTR, OFB, CFB):
+        iv = random_string(8)
+        encrypted = mode(cipher, iv).encrypt(data)
+        cuts = sorted(rng.randrange(len(data)) for _ in xrange(20))
+        chunks = [data[i:j] for i, j in zip([0] + cuts, cuts + [len(data)])]
+        assert ''.join(mode(cipher, iv).encrypt_iter(chunks)) == encrypted
+        decryptor = mode(cipher, iv).decryptor()
+        decrypted = ''.join(decryptor.update(bytearray(encrypted[i:i + 7])) for i in xrange(0, len(encrypted), 7))
+        assert decrypted + decryptor.finalize() == data
+
+
+def test_padding():
+    assert pad('', 8) == '\x08' * 8
+    assert unpad(pad('abc', 8), 8) == 'abc'
+    for bad in ('', 'abc', 'abcdefg\x00', 'abcdefg\x09', 'abcdef\x01\x02'):
+        try:
+            unpad(bad, 8)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("unpad accepted %r" % bad)
+
+
+if __name__ == "__main__":
+    test_modes_match_reference()
+    test_streaming_matches_one_shot()
+    test_padding()
@@ -0,0 +1,42 @@
+import random
+
+from present.modes import CTR, ECB, CBC
+from present.parallel import ctr_parallel, ecb_encrypt_parallel, ecb_decrypt_parallel, cbc_decrypt_parallel
+from present.pyPresent import Present
+
+__author__ = 'Iurii Sergiichuk'
+
+rng = random.Random(5)
+
+
+def random_string(length):
+    return ''.join(chr(rng.getrandbits(8)) for _ in xrange(length))
+
+
+def test_parallel_matches_serial():
+    key = random_string(10)
+    iv = random_string(8)
+    cipher = Present(key)
+    for length in (0, 5, 8 * 50, 8 * 50 + 3):
+        data = random_string(length)
+        for processes in (1, 3):
+            encrypted = CTR(cipher, iv).encrypt(data)
+            assert ctr_parallel(key, iv, data, processes=processes, task_blocks=7) == encrypted
+            assert ctr_parallel(key, iv, encrypted, processes=processes, task_blocks=7) == data
+            encrypted = ECB(cipher).encrypt(data)
+            assert ecb_encrypt_parallel(key, data, processes=processes, task_blocks=7) == encrypted
+            assert ecb_decrypt_parallel(key, encrypted, processes=processes, task_blocks=7) == data
+            encrypted = CBC(cipher, iv).encrypt(data)
+            assert cbc_decrypt_parallel(key, iv, encrypted, processes=processes, task_blocks=7) == data
+
+
+def test_counter_wraps():
+    key = random_string(16)
+    iv = '\xff' * 7 + '\xfe'
+    data = random_string(8 * 40)
+    assert ctr_parallel(key, iv, data, processes=2, task_blocks=3) == CTR(Present(key), iv).encrypt(data)
+
+
+if __name__ == "__main__":
+    test_parallel_matches_serial()
+    test_counter_wraps()
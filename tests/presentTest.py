@@ -0,0 +1,313 @@
+import random
+from unittest import SkipTest
+
+from present.keycache import KeyScheduleCache, key_schedule_cache
+from present.miniPresent import MiniPresent, generateRoundkeys16
+from present.pyPresent import Present, ENGINES, BITSLICE_THRESHOLD, generateRoundkeys80
+
+__author__ = 'Iurii Sergiichuk'
+
+TEST_VECTORS_80 = [
+    ("00000000000000000000", "0000000000000000", "5579c1387b228445"),
+    ("ffffffffffffffffffff", "0000000000000000", "e72c46c0f5945049"),
+    ("00000000000000000000", "ffffffffffffffff", "a112ffc72f68417b"),
+    ("ffffffffffffffffffff", "ffffffffffffffff", "3333dcd3213210d2"),
+]
+
+
+def test_vectors_all_engines():
+    for engine in ENGINES:
+        for key, plain, encrypted in TEST_VECTORS_80:
+            cipher = Present(key.decode('hex'), engine=engine)
+            assert cipher.encrypt(plain.decode('hex')).encode('hex') == encrypted
+            assert cipher.decrypt(encrypted.decode('hex')).encode('hex') == plain
+
+
+def test_engines_identical():
+    rng = random.Random(2015)
+    for key_bytes in (10, 16):
+        for rounds in (1, 2, 3, 32):
+            key = ''.join(chr(rng.getrandbits(8)) for _ in xrange(key_bytes))
+            reference = Present(key, rounds, engine='reference')
+            table = Present(key, rounds, engine='table')
+            for _ in xrange(20):
+                block = ''.join(chr(rng.getrandbits(8)) for _ in xrange(8))
+                encrypted = reference.encrypt(block)
+                assert table.encrypt(block) == encrypted
+                assert table.decrypt(encrypted) == block
+                assert reference.decrypt(block) == table.decrypt(block)
+
+
+def test_decryption_prepared_on_first_use():
+    key, plain, encrypted = TEST_VECTORS_80[1]
+    for engine in ENGINES:
+        cipher = Present(key.decode('hex'), engine=engine)
+        assert cipher._decrypt_roundkeys is None
+        assert cipher.decrypt_blocks([encrypted.decode('hex')]) == [plain.decode('hex')]
+        assert cipher._decrypt_roundkeys is not None
+
+
+def test_encrypt_blocks():
+    rng = random.Random(42)
+    key = ''.join(chr(rng.getrandbits(8)) for _ in xrange(10))
+    cipher = Present(key)
+    for count in (0, 1, BITSLICE_THRESHOLD - 1, BITSLICE_THRESHOLD, 200):
+        blocks = [''.join(chr(rng.getrandbits(8)) for _ in xrange(8)) for _ in xrange(count)]
+        encrypted = cipher.encrypt_blocks(blocks)
+        assert encrypted == [cipher.encrypt(block) for block in blocks]
+        assert cipher.decrypt_blocks(encrypted) == blocks
+
+
+def test_encrypt_array():
+    from present import vectorized
+    rng = random.Random(7)
+    data = ''.join(chr(rng.getrandbits(8)) for _ in xrange(8 * 100))
+    blocks = [data[i:i + 8] for i in xrange(0, len(data), 8)]
+    for key_bytes in (10, 16):
+        key = ''.join(chr(rng.getrandbits(8)) for _ in xrange(key_bytes))
+        for rounds in (1, 2, 32):
+            cipher = Present(key, rounds)
+            encrypted = cipher.encrypt_array(data)
+            assert encrypted == ''.join(cipher.encrypt(block) for block in blocks)
+            assert cipher.decrypt_array(bytearray(encrypted)) == data
+            if vectorized.HAVE_NUMPY:
+                states = vectorized.buffer2states(data).reshape(10, 10)
+                encrypted_states = cipher.encrypt_array(states)
+                assert encrypted_states.shape == (10, 10)
+                assert vectorized.states2buffer(encrypted_states) == encrypted
+                assert (cipher.decrypt_array(encrypted_states) == states).all()
+    # buffers of wider items: the length in bytes counts, not the number of items
+    from array import array
+    cipher = Present(key)
+    have_numpy = vectorized.HAVE_NUMPY
+    try:
+        for vectorize in sorted(set([False, have_numpy])):
+            vectorized.HAVE_NUMPY = vectorize
+            assert cipher.encrypt_array(array('H', [0] * 4)) == cipher.encrypt('\x00' * 8)
+            assert cipher.decrypt_array(array('H', data[:16])) == cipher.decrypt(data[:8]) + cipher.decrypt(data[8:16])
+    finally:
+        vectorized.HAVE_NUMPY = have_numpy
+
+
+def test_key_schedule_cache():
+    cache = KeyScheduleCache(maxsize=2)
+    first = cache.get(generateRoundkeys16, 1, 4)
+    assert first == tuple(generateRoundkeys16(1, 4))
+    cache.get(generateRoundkeys16, 2, 4)
+    assert cache.get(generateRoundkeys16, 1, 4) is first
+    cache.get(generateRoundkeys16, 3, 4)
+    assert cache.cache_info() == (1, 3, 2, 2)
+    assert cache.get(generateRoundkeys16, 1, 4) is first
+    cache.get(generateRoundkeys16, 2, 4)
+    assert cache.cache_info() == (2, 4, 2, 2)
+    cache.resize(0)
+    assert cache.cache_info().currsize == 0
+    assert cache.get(generateRoundkeys16, 1, 4) == first
+    assert cache.cache_info().currsize == 0
+
+
+def test_shared_cache_and_from_roundkeys():
+    key = '\x01' * 10
+    hits = key_schedule_cache.cache_info().hits
+    cipher = Present(key)
+    assert Present(key).roundkeys is cipher.roundkeys
+    assert MiniPresent(77).roundkeys is MiniPresent(77).roundkeys
+    assert key_schedule_cache.cache_info().hits >= hits + 2
+    rebuilt = Present.from_roundkeys(generateRoundkeys80(int(key.encode('hex'), 16), 32))
+    assert rebuilt.rounds == 32
+    assert rebuilt.encrypt('abcdefgh') == cipher.encrypt('abcdefgh')
+    assert MiniPresent.from_roundkeys(generateRoundkeys16(77, 4)).encrypt(200) == MiniPresent(77).encrypt(200)
+
+
+def test_prepared_schedules_cached():
+    rng = random.Random(11)
+    for engine in ENGINES:
+        key = ''.join(chr(rng.getrandbits(8)) for _ in xrange(10))
+        info = key_schedule_cache.cache_info()
+        first = Present(key, engine=engine)
+        first.decrypt('abcdefgh')
+        # one key setup, and looking up prepared forms does not count as reuse
+        assert key_schedule_cache.cache_info()[:2] == (info.hits, info.misses + 1)
+        second = Present(key, engine=engine)
+        assert key_schedule_cache.cache_info()[:2] == (info.hits + 1, info.misses + 1)
+        assert second._encrypt_state is first._encrypt_state
+        assert first.decrypt(second.encrypt('abcdefgh')) == 'abcdefgh'
+        second.decrypt('abcdefgh')
+        assert second._decrypt_roundkeys is first._decrypt_roundkeys
+        assert second._decrypt_state is first._decrypt_state
+
+
+def test_mini_present_codebook():
+    data = ''.join(chr(i) for i in xrange(256))
+    for key in (0, 0xBEEF, 0xFFFF):
+        for rounds in (1, 4):
+            reference = MiniPresent(key, rounds)
+            codebook = MiniPresent(key, rounds, codebook=True)
+            for block in xrange(300):
+                assert codebook.encrypt(block) == reference.encrypt(block)
+                assert codebook.decrypt(block) == reference.decrypt(block)
+            encrypted = codebook.encrypt_bytes(data)
+            assert encrypted == ''.join(reference.encrypt(c) for c in data)
+            assert reference.decrypt_bytes(bytearray(encrypted)) == data
+
+
+def test_keyspace_engine():
+    from present import keyspace
+    if not keyspace.HAVE_NUMPY:
+        raise SkipTest("the keyspace engine needs NumPy")
+    rng = random.Random(3)
+    for rounds in (1, 4):
+        table = keyspace.codebook(rounds)
+        inverse = keyspace.inverseCodebook(table)
+        assert (keyspace.decryptAllKeys(range(256), rounds=rounds) == inverse).all()
+        for key in rng.sample(xrange(1 << 16), 20):
+            cipher = MiniPresent(key, rounds)
+            assert [cipher.encrypt(block) for block in xrange(256)] == table[key].tolist()
+            assert [cipher.decrypt(block) for block in xrange(256)] == inverse[key].tolist()
+    keys = [0x10000, 0x1FFFF]
+    assert keyspace.roundkeys16All(keys).tolist() == [generateRoundkeys16(key, 4) for key in keys]
+
+
+def test_codebook_store():
+    import os
+    import shutil
+    import tempfile
+    from present.codebook_store import CodebookStore
+    directory = tempfile.mkdtemp()
+    try:
+        with CodebookStore.create(os.path.join(directory, 'codebook.bin'), rounds=3) as store:
+            for key in random.Random(4).sample(xrange(1 << 16), 5):
+                cipher = MiniPresent(key, 3)
+                assert store.encryption_row(key) == ''.join(chr(cipher.encrypt(block)) for block in xrange(256))
+                assert store.decryption_row(key) == ''.join(chr(cipher.decrypt(block)) for block in xrange(256))
+                assert store.encrypt(key, 7) == cipher.encrypt(7) and store.decrypt(key, 7) == cipher.decrypt(7)
+                keys = store.keys_mapping(7, cipher.encrypt(7))
+                assert key in keys and all(MiniPresent(k, 3).encrypt(7) == cipher.encrypt(7) for k in keys)
+            for lookup, args in ((store.encrypt, (1 << 16, 0)), (store.decrypt, (-1, 0)), (store.encrypt, (0, 256)),
+                                 (store.decrypt, (0, -1)), (store.encryption_row, (1 << 16,)),
+                                 (store.decryption_row, (-1,)), (store.encryption_column, (256,))):
+                try:
+                    lookup(*args)
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError("%s%r out of range accepted" % (lookup.__name__, args))
+        # a codebook of another format version: the error names the version found
+        from present.codebook_store import HEADER, HEADER_SIZE, MAGIC, VERSION
+        path = os.path.join(directory, 'other.bin')
+        with open(path, 'wb') as other:
+            other.write(HEADER.pack(MAGIC, VERSION + 1, 3, 16, 8, 0, 0).ljust(HEADER_SIZE, '\x00'))
+        try:
+            CodebookStore(path)
+        except ValueError as error:
+            assert 'version %d' % (VERSION + 1) in str(error)
+        else:
+            raise AssertionError("codebook of version %d accepted" % (VERSION + 1))
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_compiled_engine():
+    from present import pyPresent
+    rng = random.Random(10)
+    for rounds in (1, 2, 3, 31, 32):
+        key = ''.join(chr(rng.getrandbits(8)) for _ in xrange(16))
+        reference = Present(key, rounds, engine='reference')
+        compiled = Present(key, rounds, engine='compiled')
+        for _ in xrange(20):
+            block = ''.join(chr(rng.getrandbits(8)) for _ in xrange(8))
+            assert compiled.encrypt(block) == reference.encrypt(block)
+            assert compiled.decrypt(block) == reference.decrypt(block)
+        assert (rounds, 'encrypt') in pyPresent._compiled_code and (rounds, 'decrypt') in pyPresent._compiled_code
+    first, second = Present("0" * 10, engine='compiled'), Present("1" * 10, engine='compiled')
+    assert first._encrypt_state.func_code is second._encrypt_state.func_code
+    assert first.encrypt("8 bytes!") != second.encrypt("8 bytes!")
+
+
+def test_compact_objects():
+    cipher = Present("0123456789abcdef0123".decode('hex'))
+    for obj in (cipher, MiniPresent(77)):
+        assert not hasattr(obj, '__dict__')
+    assert list(Present.from_roundkeys(cipher.roundkeys).roundkeys) == list(cipher.roundkeys)
+    keys = random.Random(11).sample(xrange(1 << 17), 300)
+    ciphers = MiniPresent.bulk(keys, 3)
+    assert len(set(id(c._schedule) for c in ciphers)) == 1
+    for key, bulk_cipher in zip(keys, ciphers):
+        assert list(bulk_cipher.roundkeys) == list(MiniPresent(key, 3).roundkeys)
+        assert bulk_cipher.encrypt(0x5A) == MiniPresent(key, 3).encrypt(0x5A)
+        assert bulk_cipher.decrypt(0x5A) == MiniPresent(key, 3).decrypt(0x5A)
+
+
+def test_buffer_conversions():
+    from array import array
+    from present.pyPresent import string2number, number2string_N
+    rng = random.Random(5)
+    for size in (1, 2, 3, 8, 10, 16, 33):
+        raw = ''.join(chr(rng.getrandbits(8)) for _ in xrange(size))
+        number = int(raw.encode('hex'), 16)
+        for buf in (raw, bytearray(raw), memoryview(raw), array('B', raw)):
+            assert string2number(buf) == number
+        assert number2string_N(number, size) == raw
+        for value in (-1, 1 << (8 * size)):
+            try:
+                number2string_N(value, size)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("%d packed into %d bytes" % (value, size))
+    key = "0123456789abcdef0123".decode('hex')
+    assert Present(bytearray(key)).roundkeys == Present(key).roundkeys
+    assert MiniPresent(bytearray('\xbe\xef')).encrypt(bytearray('*')) == MiniPresent(0xBEEF).encrypt('*')
+    mini = MiniPresent(0xBEEF, codebook=True)
+    data = ''.join(chr(rng.getrandbits(8)) for _ in xrange(16))
+    encrypted = mini.encrypt_bytes(data)
+    assert encrypted == ''.join(chr(mini.encrypt(ord(byte))) for byte in data)
+    for buf in (bytearray(data), memoryview(data), array('B', data), array('H', data)):
+        assert mini.encrypt_bytes(buf) == encrypted
+    for buf in (bytearray(encrypted), memoryview(encrypted), array('B', encrypted), array('H', encrypted)):
+        assert mini.decrypt_bytes(buf) == data
+
+
+def test_encrypt_into():
+    from array import array
+    cipher = Present("0123456789abcdef0123".decode('hex'))
+    rng = random.Random(6)
+    for count in (0, 1, BITSLICE_THRESHOLD - 1, BITSLICE_THRESHOLD, 5000):
+        data = ''.join(chr(rng.getrandbits(8)) for _ in xrange(8 * count))
+        expected = ''.join(cipher.encrypt(data[i:i + 8]) for i in xrange(0, len(data), 8))
+        output = bytearray(len(data))
+        assert cipher.encrypt_into(data, output) == len(data)
+        assert str(output) == expected
+        in_place = bytearray(data)
+        cipher.encrypt_into(in_place, in_place)
+        assert in_place == output
+        decrypted = array('B', [0] * len(data))
+        cipher.decrypt_into(memoryview(output), decrypted)
+        assert decrypted.tostring() == data
+    try:
+        cipher.encrypt_into('1234567', bytearray(7))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("encrypt_into accepted a partial block")
+
+
+if __name__ == "__main__":
+    test_vectors_all_engines()
+    test_engines_identical()
+    test_decryption_prepared_on_first_use()
+    test_encrypt_blocks()
+    test_encrypt_array()
+    test_key_schedule_cache()
+    test_shared_cache_and_from_roundkeys()
+    test_prepared_schedules_cached()
+    test_mini_present_codebook()
+    try:
+        test_keyspace_engine()
+    except SkipTest as skip:
+        print "test_keyspace_engine skipped: %s" % skip
+    test_codebook_store()
+    test_compiled_engine()
+    test_compact_objects()
+    test_buffer_conversions()
+    test_encrypt_into()